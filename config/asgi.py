@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
 application = get_asgi_application()
+
+# Прогрев до первого запроса (config/warmup.py), отключается STARTUP_WARMUP=0
+if settings.STARTUP_WARMUP:
+    from config.warmup import warm_up
+
+    warm_up()
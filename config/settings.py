@@ -2,6 +2,14 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+from .startup import (
+    WEB_ONLY_APPS,
+    WEB_ONLY_CONTEXT_PROCESSORS,
+    WEB_ONLY_MIDDLEWARE,
+    is_light_startup,
+    without,
+)
+
 load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -35,6 +43,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "networknode.middleware.PrimaryPinMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -57,6 +66,17 @@ TEMPLATES = [
     },
 ]
 
+# Облегченный запуск фоновых команд без админки и статики (config/startup.py)
+if is_light_startup():
+    INSTALLED_APPS = without(INSTALLED_APPS, WEB_ONLY_APPS)
+    MIDDLEWARE = without(MIDDLEWARE, WEB_ONLY_MIDDLEWARE)
+    TEMPLATES[0]["OPTIONS"]["context_processors"] = without(
+        TEMPLATES[0]["OPTIONS"]["context_processors"], WEB_ONLY_CONTEXT_PROCESSORS
+    )
+
+# Прогрев URL, сериализаторов и запросов при загрузке WSGI/ASGI (config/warmup.py)
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+
 # Database configuration
 DATABASES = {
     "default": {
@@ -69,6 +89,106 @@ DATABASES = {
     }
 }
 
+# Read-реплики: DB_REPLICA_HOSTS=host1,host2:5433
+# Каждая реплика получает алиас replica_N с теми же учетными данными.
+# В тестах реплики зеркалируют основную БД.
+DATABASE_REPLICAS = []
+for _index, _host in enumerate(
+    filter(None, (h.strip() for h in os.getenv("DB_REPLICA_HOSTS", "").split(","))),
+    start=1,
+):
+    _replica_host, _, _replica_port = _host.partition(":")
+    DATABASES[f"replica_{_index}"] = {
+        **DATABASES["default"],
+        "HOST": _replica_host,
+        "PORT": _replica_port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{_index}")
+
+DATABASE_ROUTERS = ["networknode.db_routers.PrimaryReplicaRouter"]
+
+# Сколько секунд после записи пользователь читает с основной БД
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS") or 5)
+
+# Фоновые задачи (python manage.py run_workers)
+JOB_WORKER_THREADS = int(os.getenv("JOB_WORKER_THREADS") or 1)
+JOB_WORKER_PROCESSES = int(os.getenv("JOB_WORKER_PROCESSES") or 1)
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL") or 1.0)
+JOB_EXPORT_DIR = os.getenv("JOB_EXPORT_DIR") or BASE_DIR / "exports"
+# Аренда задач: воркер продлевает ее раз в JOB_HEARTBEAT_INTERVAL секунд;
+# задача без продления дольше JOB_LEASE_TIMEOUT возвращается в очередь,
+# после JOB_MAX_ATTEMPTS запусков помечается ошибкой
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL") or 30)
+JOB_LEASE_TIMEOUT = int(os.getenv("JOB_LEASE_TIMEOUT") or 300)
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS") or 3)
+# Выборки админки больше этого размера обрабатываются в фоне
+JOBS_SYNC_LIMIT = int(os.getenv("JOBS_SYNC_LIMIT") or 1000)
+
+# Пакетные массовые изменения (команды clear_debt, delete_nodes и фоновые задачи)
+MASS_UPDATE_BATCH_SIZE = int(os.getenv("MASS_UPDATE_BATCH_SIZE") or 1000)
+MASS_UPDATE_SLEEP = float(os.getenv("MASS_UPDATE_SLEEP") or 0.0)
+
+# Лента изменений и доставка webhooks (python manage.py deliver_webhooks)
+CHANGE_FEED_MAX_PAGE_SIZE = int(os.getenv("CHANGE_FEED_MAX_PAGE_SIZE") or 1000)
+# Сколько секунд ждать заполнения пропуска в id событий (незафиксированная
+# транзакция), прежде чем считать его откатом
+CHANGE_FEED_COMMIT_LAG = float(os.getenv("CHANGE_FEED_COMMIT_LAG") or 30)
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE") or 500)
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT") or 10)
+WEBHOOK_POLL_INTERVAL = float(os.getenv("WEBHOOK_POLL_INTERVAL") or 2.0)
+
+# Максимальный размер порции дельта-синхронизации (?modified_since=)
+SYNC_MAX_PAGE_SIZE = int(os.getenv("SYNC_MAX_PAGE_SIZE") or 1000)
+
+# Продукты старше этого срока переносятся в архив (python manage.py archive_products)
+PRODUCT_ARCHIVE_AFTER_DAYS = int(os.getenv("PRODUCT_ARCHIVE_AFTER_DAYS") or 5 * 365)
+
+# Кэш: locmem по умолчанию (в пределах процесса). Для общего кэша
+# нескольких процессов задайте REDIS_URL (нужен пакет redis)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "networknode",
+    }
+}
+if os.getenv("REDIS_URL"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL"),
+    }
+
+# Объединение одновременных одинаковых GET-запросов к узлам сети (single-flight)
+REQUEST_COALESCING = os.getenv("REQUEST_COALESCING", "1") == "1"
+COALESCE_RESULT_TTL = float(os.getenv("COALESCE_RESULT_TTL") or 1.0)
+COALESCE_WAIT_TIMEOUT = float(os.getenv("COALESCE_WAIT_TIMEOUT") or 5.0)
+COALESCE_LOCK_TIMEOUT = int(os.getenv("COALESCE_LOCK_TIMEOUT") or 30)
+COALESCE_POLL_INTERVAL = float(os.getenv("COALESCE_POLL_INTERVAL") or 0.01)
+
+# Токены API (POST /api/auth/token/): срок действия и время жизни
+# in-process кэша пользователей для проверки токена (секунды)
+API_TOKEN_MAX_AGE = int(os.getenv("API_TOKEN_MAX_AGE") or 12 * 60 * 60)
+API_USER_CACHE_TTL = float(os.getenv("API_USER_CACHE_TTL") or 30)
+
+# Максимальное число id в одном запросе /api/network-nodes/batch_get/
+BATCH_GET_MAX_IDS = int(os.getenv("BATCH_GET_MAX_IDS") or 2000)
+
+# In-memory индекс графа поставок: полная перезагрузка не реже MAX_AGE секунд,
+# сверка с outbox ChangeEvent не чаще MAX_STALENESS секунд
+SUPPLY_GRAPH_MAX_AGE = int(os.getenv("SUPPLY_GRAPH_MAX_AGE") or 300)
+SUPPLY_GRAPH_MAX_STALENESS = float(os.getenv("SUPPLY_GRAPH_MAX_STALENESS") or 2.0)
+SUPPLY_GRAPH_PATCH_LIMIT = int(os.getenv("SUPPLY_GRAPH_PATCH_LIMIT") or 10000)
+
+# Read-only снимок узлов в памяти процесса для названий поставщиков,
+# уровней иерархии и списка городов (NODE_SNAPSHOT=1 - включить).
+# MAX_STALENESS - как часто снимок сверяется с outbox ChangeEvent,
+# MAX_AGE - как часто загружается заново, PATCH_LIMIT - сколько событий
+# применяется точечно, прежде чем выгоднее полная загрузка
+NODE_SNAPSHOT = os.getenv("NODE_SNAPSHOT", "0") == "1"
+NODE_SNAPSHOT_MAX_STALENESS = float(os.getenv("NODE_SNAPSHOT_MAX_STALENESS") or 2.0)
+NODE_SNAPSHOT_MAX_AGE = int(os.getenv("NODE_SNAPSHOT_MAX_AGE") or 3600)
+NODE_SNAPSHOT_PATCH_LIMIT = int(os.getenv("NODE_SNAPSHOT_PATCH_LIMIT") or 10000)
+
 # Django REST Framework configuration
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
@@ -77,12 +197,23 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.SessionAuthentication",
         "rest_framework.authentication.BasicAuthentication",
+        # Подписанные токены для сервисных вызовов (POST /api/auth/token/)
+        "networknode.authentication.SignedTokenAuthentication",
     ],
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
+    # Квоты запросов пользователя к NetworkNodeViewSet по группам actions
+    "DEFAULT_THROTTLE_RATES": {
+        "network_nodes": os.getenv("THROTTLE_RATE_NETWORK_NODES") or "600/min",
+        "network_nodes_heavy": os.getenv("THROTTLE_RATE_NETWORK_NODES_HEAVY")
+        or "120/min",
+        "network_nodes_jobs": os.getenv("THROTTLE_RATE_NETWORK_NODES_JOBS")
+        or "30/hour",
+        "auth_token": os.getenv("THROTTLE_RATE_AUTH_TOKEN") or "20/min",
+    },
 }
 # Internationalization
 LANGUAGE_CODE = "ru-ru"
@@ -0,0 +1,60 @@
+"""
+Настройки облегченного запуска для команд, не обслуживающих веб-запросы.
+
+Фоновые и сервисные команды (воркеры, доставка webhooks, пакетные
+операции) не используют админку, flash-сообщения и статику, поэтому
+при их запуске эти приложения не загружаются: django.setup() не
+импортирует admin.py всех приложений, шаблоны и storage статики.
+"""
+
+import os
+
+# Переменная окружения, включающая облегченный запуск (1 - да, 0 - нет)
+LIGHT_STARTUP_ENV = "DJANGO_LIGHT_STARTUP"
+
+# Приложения, нужные только веб-процессу
+WEB_ONLY_APPS = [
+    "django.contrib.admin",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+]
+WEB_ONLY_MIDDLEWARE = ["django.contrib.messages.middleware.MessageMiddleware"]
+WEB_ONLY_CONTEXT_PROCESSORS = [
+    "django.contrib.messages.context_processors.messages",
+]
+
+# Команды manage.py, которым не нужны WEB_ONLY_APPS.
+# migrate, makemigrations, test, shell и check сюда не входят:
+# им нужен полный набор приложений.
+LIGHT_COMMANDS = {
+    "archive_products",
+    "clear_debt",
+    "delete_nodes",
+    "deliver_webhooks",
+    "refresh_node_stats",
+    "run_workers",
+}
+
+
+def configure_light_startup(argv):
+    """
+    Включает облегченный запуск для команд из LIGHT_COMMANDS.
+
+    Явно заданное значение DJANGO_LIGHT_STARTUP не переопределяется.
+    Вызывается из manage.py до загрузки настроек.
+    """
+    command = argv[1] if len(argv) > 1 else None
+    if command in LIGHT_COMMANDS:
+        os.environ.setdefault(LIGHT_STARTUP_ENV, "1")
+
+
+def is_light_startup():
+    """Проверяет, включен ли облегченный запуск."""
+
+    return os.getenv(LIGHT_STARTUP_ENV) == "1"
+
+
+def without(items, excluded):
+    """Возвращает список без исключенных элементов, сохраняя порядок."""
+
+    return [item for item in items if item not in excluded]
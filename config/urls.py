@@ -1,16 +1,21 @@
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 
 """
 Корневой URL configuration для проекта Electronics_retail_chain.
 
 URL patterns:
-- admin/: Админ-панель Django
+- admin/: Админ-панель Django (если приложение admin установлено)
 - api/: API endpoints приложения networknode
 - api-auth/: Аутентификация для DRF
 """
 urlpatterns = [
-    path("admin/", admin.site.urls),
     path("api/", include("networknode.urls")),
     path("api-auth/", include("rest_framework.urls")),
 ]
+
+if apps.is_installed("django.contrib.admin"):
+    # При облегченном запуске (config/startup.py) админка не загружается
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path("admin/", admin.site.urls))
@@ -0,0 +1,117 @@
+"""
+Прогрев веб-процесса до первого запроса.
+
+Вызывается из config/wsgi.py и config/asgi.py после создания приложения
+(отключается STARTUP_WARMUP=0). Без прогрева первый запрос каждого
+воркера платит за импорт URLconf и views, построение полей
+сериализаторов и первую компиляцию SQL. С gunicorn --preload прогрев
+выполняется один раз в мастер-процессе до fork.
+"""
+
+import logging
+import time
+
+from django.db import connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+# Пути, которые разрешаются при прогреве (импортируют URLconf и views)
+WARMUP_PATHS = [
+    "/api/network-nodes/",
+    "/api/network-nodes/1/",
+    "/api/jobs/",
+    "/api/changes/",
+    "/api/stats/geo/",
+]
+
+
+def warm_up_urls():
+    """Загружает URLconf и разрешает основные пути API."""
+
+    resolver = get_resolver()
+    for path in WARMUP_PATHS:
+        resolver.resolve(path)
+
+
+def warm_up_serializers():
+    """Строит поля сериализаторов API (интроспекция моделей DRF)."""
+
+    from networknode import serializer
+
+    for serializer_class in [
+        serializer.NetworkNodeSerializer,
+        serializer.NetworkNodeUpdateSerializer,
+        serializer.JobSerializer,
+        serializer.ChangeEventSerializer,
+        serializer.GeoStatsSerializer,
+    ]:
+        serializer_class().fields
+
+
+def warm_up_querysets():
+    """
+    Компилирует SQL основных запросов без их выполнения.
+
+    Заполняет кэши _meta моделей и прогревает компилятор ORM.
+    """
+    from networknode.models import ChangeEvent, NetworkNode, NodeStats
+
+    querysets = [
+        NetworkNode.objects.select_related("supplier").filter(country="", city=""),
+        NetworkNode.objects.filter(supplier_id=0).order_by("updated_at", "id"),
+        ChangeEvent.objects.filter(id__gt=0).order_by("id"),
+        NodeStats.objects.filter(node_count__gt=0).values("country"),
+    ]
+    for queryset in querysets:
+        queryset.query.get_compiler(using=queryset.db).as_sql()
+
+
+def warm_up_node_snapshot():
+    """
+    Загружает снимок узлов, если он включен (NODE_SNAPSHOT).
+
+    С gunicorn --preload массивы снимка загружаются до fork и
+    разделяются воркерами copy-on-write.
+    """
+    from networknode.snapshot import get_node_snapshot
+
+    get_node_snapshot()
+
+
+WARMUP_STEPS = [
+    ("urls", warm_up_urls),
+    ("serializers", warm_up_serializers),
+    ("querysets", warm_up_querysets),
+    ("node_snapshot", warm_up_node_snapshot),
+]
+
+
+def warm_up():
+    """
+    Выполняет шаги прогрева и возвращает их длительность в секундах.
+
+    Ошибка прогрева только логируется: процесс все равно начинает
+    обслуживать запросы. Соединения с БД, открытые при прогреве,
+    закрываются, чтобы не унаследоваться воркерами после fork.
+    """
+    timings = {}
+    try:
+        for name, step in WARMUP_STEPS:
+            started = time.perf_counter()
+            try:
+                step()
+            except Exception:
+                logger.warning(
+                    "Шаг прогрева %s завершился с ошибкой", name, exc_info=True
+                )
+            timings[name] = time.perf_counter() - started
+    finally:
+        connections.close_all()
+    logger.info(
+        "Прогрев завершен: %s",
+        ", ".join(
+            f"{name} {seconds * 1000:.1f} мс" for name, seconds in timings.items()
+        ),
+    )
+    return timings
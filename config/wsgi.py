@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
 application = get_wsgi_application()
+
+# Прогрев до первого запроса (config/warmup.py), отключается STARTUP_WARMUP=0
+if settings.STARTUP_WARMUP:
+    from config.warmup import warm_up
+
+    warm_up()
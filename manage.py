@@ -23,6 +23,11 @@ def main():
 
     load_dotenv()
 
+    # Фоновые команды запускаются без админки и статики
+    from config.startup import configure_light_startup
+
+    configure_light_startup(sys.argv)
+
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
     try:
         from django.core.management import execute_from_command_line
@@ -1,7 +1,28 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import (
+    ERROR_FLAG,
+    IGNORED_PARAMS,
+    PAGE_VAR,
+    SEARCH_VAR,
+)
+from django.core.exceptions import FieldError, ValidationError
 from django.urls import reverse
 from django.utils.html import format_html
-from .models import NetworkNode, Product
+from django.conf import settings
+from .batching import batched_delete_nodes, batched_update
+from .archive import restore_products
+from .filters import filter_nodes
+from .jobs import enqueue
+from .snapshot import get_node_snapshot
+from .models import (
+    ArchivedProduct,
+    ChangeEvent,
+    Job,
+    NetworkNode,
+    NodeStats,
+    Product,
+    Webhook,
+)
 
 
 class ProductInline(admin.TabularInline):
@@ -28,8 +49,24 @@ class CityFilter(admin.SimpleListFilter):
     parameter_name = "city"
 
     def lookups(self, request, model_admin):
-        """Возвращает список доступных значений для фильтра."""
-        cities = NetworkNode.objects.values_list("city", flat=True).distinct()
+        """
+        Возвращает список доступных значений для фильтра.
+
+        Города берутся из снимка узлов (NODE_SNAPSHOT) или из сводной
+        таблицы NodeStats (с учетом страны, выбранной фильтром country:
+        в Django 5 он передает параметр ?country= без __exact), а не
+        сканированием всех узлов.
+        """
+        country = request.GET.get("country")
+        snapshot = get_node_snapshot()
+        if snapshot is not None:
+            cities = snapshot.get_cities(country or None)
+            return [(city, city) for city in cities if city]
+
+        stats = NodeStats.objects.filter(node_count__gt=0)
+        if country:
+            stats = stats.filter(country=country)
+        cities = stats.order_by("city").values_list("city", flat=True).distinct()
         return [(city, city) for city in cities if city]
 
     def queryset(self, request, queryset):
@@ -57,23 +94,34 @@ class NetworkNodeAdmin(admin.ModelAdmin):
     list_filter = ["node_type", "country", CityFilter, "created_at"]
     search_fields = ["name", "email", "city"]
     inlines = [ProductInline]
-    actions = ["clear_debt"]
+    actions = ["clear_debt", "delete_in_batches"]
 
     def supplier_link(self, obj):
-        """Создает HTML-ссылку на страницу поставщика в админке."""
+        """
+        Создает HTML-ссылку на страницу поставщика в админке.
 
-        if obj.supplier:
-            url = reverse(
-                "admin:networknode_networknode_change", args=[obj.supplier.id]
-            )
-            return format_html('<a href="{}">{}</a>', url, obj.supplier.name)
-        return "-"
+        Название берется из снимка узлов, если он включен.
+        """
+
+        if obj.supplier_id is None:
+            return "-"
+        snapshot = get_node_snapshot()
+        name = snapshot.get_name(obj.supplier_id) if snapshot is not None else None
+        if name is None:
+            name = obj.supplier.name
+        url = reverse("admin:networknode_networknode_change", args=[obj.supplier_id])
+        return format_html('<a href="{}">{}</a>', url, name)
 
     supplier_link.short_description = "Поставщик"
 
     def hierarchy_level_display(self, obj):
-        """Отображает уровень иерархии в админке."""
+        """Отображает уровень иерархии в админке (из снимка узлов, если включен)."""
 
+        snapshot = get_node_snapshot()
+        if snapshot is not None:
+            level = snapshot.get_hierarchy_level(obj.pk)
+            if level is not None:
+                return level
         return obj.hierarchy_level
 
     hierarchy_level_display.short_description = "Уровень иерархии"
@@ -85,16 +133,120 @@ class NetworkNodeAdmin(admin.ModelAdmin):
 
     dependent_nodes_count.short_description = "Зависимые узлы"
 
+    def delete_model(self, request, obj):
+        """Удаляет узел, отвязывая зависимые узлы и продукты пакетами."""
+
+        batched_delete_nodes(NetworkNode.objects.filter(pk=obj.pk), sleep=0)
+
+    def delete_queryset(self, request, queryset):
+        """Удаляет выборку узлов пакетами вместо неограниченного каскада."""
+
+        batched_delete_nodes(queryset, sleep=0)
+
+    def get_actions(self, request):
+        """
+        Убирает встроенное действие delete_selected.
+
+        Оно удаляет выборку одним каскадом без ограничения размера;
+        вместо него используется delete_in_batches.
+        """
+        actions = super().get_actions(request)
+        actions.pop("delete_selected", None)
+        return actions
+
+    def get_selection_params(self, request):
+        """
+        Возвращает фильтры текущего списка как параметры фоновой задачи.
+
+        Большие выборки в админке получаются только через "выбрать все",
+        то есть совпадают с отфильтрованным списком: вместо id задача
+        получает параметры фильтров (lookups) и строку поиска (см.
+        filter_nodes). Если параметры не удается применить к модели,
+        возвращается None.
+        """
+        ignored = {*IGNORED_PARAMS, PAGE_VAR, ERROR_FLAG}
+        params = {
+            "lookups": {
+                key: request.GET.getlist(key)
+                for key in request.GET
+                if key not in ignored
+            },
+            "search": {
+                "term": request.GET.get(SEARCH_VAR, ""),
+                "fields": list(self.get_search_fields(request)),
+            },
+        }
+        for lookup, values in params["lookups"].items():
+            if not self.lookup_allowed(lookup, values[-1], request):
+                return None
+        try:
+            # Lookup и значения проверяются уже при построении queryset
+            filter_nodes(**params)
+        except (FieldError, ValidationError, ValueError):
+            return None
+        return params
+
+    def _run_mass_action(self, request, queryset, kind, run_now):
+        """
+        Выполняет массовое действие над выборкой.
+
+        Небольшие выборки (до JOBS_SYNC_LIMIT) обрабатываются сразу пакетами
+        по первичному ключу, большие ставятся в очередь фоновых задач
+        с фильтрами списка вместо перечня id.
+
+        Returns:
+            tuple[int, Job | None]: Количество объектов и задача (если создана)
+        """
+
+        limit = getattr(settings, "JOBS_SYNC_LIMIT", 1000)
+        ids = list(queryset.values_list("pk", flat=True)[: limit + 1])
+        if len(ids) <= limit:
+            return run_now(NetworkNode.objects.filter(pk__in=ids)), None
+
+        params = self.get_selection_params(request)
+        if params is None:
+            params = {"ids": list(queryset.values_list("pk", flat=True))}
+        return queryset.count(), enqueue(kind, params, request.user)
+
     def clear_debt(self, request, queryset):
         """Admin action для очистки задолженности у выбранных объектов."""
 
-        updated_count = queryset.update(debt=0)
-        self.message_user(
-            request, f"Задолженность очищена для {updated_count} объектов"
+        count, job = self._run_mass_action(
+            request,
+            queryset,
+            "clear_debt",
+            lambda selected: batched_update(selected, {"debt": 0}, sleep=0),
         )
+        if job is None:
+            self.message_user(request, f"Задолженность очищена для {count} объектов")
+        else:
+            self.message_user(
+                request,
+                f"Очистка задолженности для {count} объектов поставлена в очередь "
+                f"(задача #{job.pk})",
+            )
 
     clear_debt.short_description = "Очистить задолженность перед поставщиком"
 
+    def delete_in_batches(self, request, queryset):
+        """Admin action для пакетного удаления выбранных узлов."""
+
+        count, job = self._run_mass_action(
+            request,
+            queryset,
+            "delete_nodes",
+            lambda selected: batched_delete_nodes(selected, sleep=0),
+        )
+        if job is None:
+            self.message_user(request, f"Удалено узлов: {count}")
+        else:
+            self.message_user(
+                request,
+                f"Удаление {count} узлов поставлено в очередь (задача #{job.pk})",
+            )
+
+    delete_in_batches.short_description = "Удалить выбранные узлы пакетами"
+
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -103,3 +255,98 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ["name", "model", "release_date", "network_node"]
     list_filter = ["release_date", "network_node"]
     search_fields = ["name", "model"]
+
+
+@admin.register(ArchivedProduct)
+class ArchivedProductAdmin(admin.ModelAdmin):
+    """
+    Админ-класс для модели ArchivedProduct (только просмотр и восстановление).
+
+    Архив вынесен на отдельную страницу: страницы узлов и продуктов
+    работают только с рабочим набором.
+    """
+
+    list_display = ["name", "model", "release_date", "network_node", "archived_at"]
+    list_filter = ["release_date", "archived_at"]
+    search_fields = ["name", "model"]
+    list_select_related = ["network_node"]
+    readonly_fields = [field.name for field in ArchivedProduct._meta.fields]
+    actions = ["restore"]
+
+    def has_add_permission(self, request):
+        """Архивные продукты создаются только командой archive_products."""
+
+        return False
+
+    def restore(self, request, queryset):
+        """Admin action для возврата продуктов в рабочую таблицу."""
+
+        restored = restore_products(queryset)
+        self.message_user(request, f"Восстановлено продуктов: {restored}")
+
+    restore.short_description = "Вернуть выбранные продукты в рабочую таблицу"
+
+
+@admin.register(NodeStats)
+class NodeStatsAdmin(admin.ModelAdmin):
+    """Админ-класс для модели NodeStats (только просмотр)."""
+
+    list_display = [
+        "country",
+        "city",
+        "node_type",
+        "node_count",
+        "product_count",
+        "total_debt",
+        "updated_at",
+    ]
+    list_filter = ["node_type", "country"]
+    search_fields = ["country", "city"]
+    readonly_fields = [field.name for field in NodeStats._meta.fields]
+
+    def has_add_permission(self, request):
+        """Статистика обновляется только приложением."""
+
+        return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Админ-класс для модели Job."""
+
+    list_display = [
+        "id",
+        "kind",
+        "status",
+        "progress_done",
+        "progress_total",
+        "attempts",
+        "created_by",
+        "created_at",
+        "finished_at",
+    ]
+    list_filter = ["status", "kind"]
+    readonly_fields = [field.name for field in Job._meta.fields]
+
+
+@admin.register(ChangeEvent)
+class ChangeEventAdmin(admin.ModelAdmin):
+    """Админ-класс для модели ChangeEvent (только просмотр)."""
+
+    list_display = ["id", "model", "object_id", "action", "created_at"]
+    list_filter = ["model", "action"]
+    readonly_fields = [field.name for field in ChangeEvent._meta.fields]
+
+    def has_add_permission(self, request):
+        """События создаются только приложением."""
+
+        return False
+
+
+@admin.register(Webhook)
+class WebhookAdmin(admin.ModelAdmin):
+    """Админ-класс для модели Webhook."""
+
+    list_display = ["url", "is_active", "last_event_id", "last_delivered_at"]
+    list_filter = ["is_active"]
+    readonly_fields = ["last_delivered_at", "last_error", "created_at"]
@@ -7,3 +7,8 @@ class NetworknodeConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "networknode"
     verbose_name = "Узлы сети электроники"
+
+    def ready(self):
+        """Подключает обработчики сигналов приложения."""
+
+        from . import signals  # noqa: F401
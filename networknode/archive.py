@@ -0,0 +1,77 @@
+import time
+
+from django.db import transaction
+
+from .batching import get_batch_options, iter_pk_batches
+from .changes import ARCHIVE, RESTORE, archive_action
+from .models import ArchivedProduct, Product
+
+ARCHIVED_FIELDS = ["name", "model", "release_date", "network_node_id"]
+
+
+def archive_products(queryset, batch_size=None, sleep=None, progress=None):
+    """
+    Переносит продукты в архивную таблицу пакетами по первичному ключу.
+
+    Каждый пакет копируется в ArchivedProduct и удаляется из Product
+    в одной короткой транзакции, поэтому продукт всегда находится
+    ровно в одной из таблиц.
+
+    Перенос пишет события archive вместо delete и не меняет NodeStats
+    (см. changes.archive_action).
+
+    Returns:
+        int: Количество перенесенных продуктов
+    """
+    batch_size, sleep = get_batch_options(batch_size, sleep)
+    total = queryset.count()
+    if progress:
+        progress(0, total)
+    archived = 0
+    for pks in iter_pk_batches(queryset, batch_size):
+        with transaction.atomic(), archive_action(ARCHIVE):
+            rows = Product.objects.filter(pk__in=pks).values("pk", *ARCHIVED_FIELDS)
+            ArchivedProduct.objects.bulk_create(
+                [
+                    ArchivedProduct(
+                        original_id=row.pop("pk"),
+                        **row,
+                    )
+                    for row in rows
+                ],
+                ignore_conflicts=True,
+            )
+            Product.objects.filter(pk__in=pks).bulk_delete()
+        archived += len(pks)
+        if progress:
+            progress(archived, total)
+        if sleep:
+            time.sleep(sleep)
+    return archived
+
+
+def restore_products(queryset):
+    """
+    Возвращает архивные продукты в рабочую таблицу с прежними id.
+
+    Пишет события restore вместо create и обновляет updated_at узлов
+    для дельта-синхронизации; NodeStats не меняется.
+
+    Returns:
+        int: Количество восстановленных продуктов
+    """
+    with transaction.atomic(), archive_action(RESTORE):
+        archived = list(queryset)
+        Product.objects.bulk_create(
+            [
+                Product(
+                    pk=item.original_id,
+                    **{field: getattr(item, field) for field in ARCHIVED_FIELDS},
+                )
+                for item in archived
+            ]
+        )
+        ArchivedProduct.objects.filter(
+            pk__in=[item.pk for item in archived]
+        ).bulk_delete()
+    return len(archived)
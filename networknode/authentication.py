@@ -0,0 +1,121 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework import authentication, exceptions
+
+# Соль подписи токенов API (отделяет их от других подписей SECRET_KEY)
+TOKEN_SALT = "networknode.api-token"
+
+# In-process кэш пользователей: pk -> (время истечения, пользователь)
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
+
+def get_password_fingerprint(user):
+    """
+    Возвращает отпечаток хэша пароля пользователя для токена.
+
+    Смена пароля меняет отпечаток, и ранее выданные токены перестают
+    приниматься без отдельного хранилища отозванных токенов.
+    """
+    return salted_hmac(TOKEN_SALT, user.password).hexdigest()[:16]
+
+
+def create_token(user):
+    """Создает подписанный токен API для пользователя."""
+
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(
+        f"{user.pk}:{get_password_fingerprint(user)}"
+    )
+
+
+def get_cached_user(pk):
+    """
+    Возвращает пользователя из in-process кэша или загружает его из БД.
+
+    Записи живут API_USER_CACHE_TTL секунд и сбрасываются сигналами
+    при изменении или удалении пользователя в этом процессе.
+    Возвращается копия, чтобы запросы не изменяли общий объект.
+
+    Returns:
+        User | None: Пользователь или None, если он не найден
+    """
+    now = time.monotonic()
+    with _user_cache_lock:
+        cached = _user_cache.get(pk)
+    if cached is None or cached[0] <= now:
+        user = get_user_model()._default_manager.filter(pk=pk).first()
+        cached = (now + settings.API_USER_CACHE_TTL, user)
+        with _user_cache_lock:
+            _user_cache[pk] = cached
+    return copy.copy(cached[1])
+
+
+def invalidate_user(pk):
+    """Удаляет пользователя из in-process кэша."""
+
+    with _user_cache_lock:
+        _user_cache.pop(pk, None)
+
+
+def clear_user_cache():
+    """Очищает in-process кэш пользователей."""
+
+    with _user_cache_lock:
+        _user_cache.clear()
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    """
+    Аутентификация по подписанному токену без состояния на сервере.
+
+    Заголовок: Authorization: Bearer <токен из /api/auth/token/>.
+    Токен проверяется по HMAC-подписи и сроку API_TOKEN_MAX_AGE, без
+    хэширования пароля и без обращения к таблице сессий; пользователь
+    берется из короткоживущего in-process кэша.
+    """
+
+    keyword = "Bearer"
+
+    def authenticate(self, request):
+        """Проверяет токен из заголовка Authorization."""
+
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed(
+                "Некорректный заголовок Authorization"
+            )
+
+        try:
+            token = header[1].decode()
+            value = signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+                token, max_age=settings.API_TOKEN_MAX_AGE
+            )
+            pk, fingerprint = value.split(":", 1)
+            pk = get_user_model()._meta.pk.to_python(pk)
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed("Срок действия токена истек")
+        except (signing.BadSignature, UnicodeDecodeError, ValueError, ValidationError):
+            raise exceptions.AuthenticationFailed("Недействительный токен")
+
+        user = get_cached_user(pk)
+        if (
+            user is None
+            or not user.is_active
+            or not constant_time_compare(fingerprint, get_password_fingerprint(user))
+        ):
+            raise exceptions.AuthenticationFailed("Недействительный токен")
+        return user, token
+
+    def authenticate_header(self, request):
+        """Возвращает значение WWW-Authenticate для ответа 401."""
+
+        return f'{self.keyword} realm="api"'
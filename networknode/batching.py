@@ -0,0 +1,107 @@
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import ArchivedProduct, NetworkNode, Product
+
+
+def get_batch_options(batch_size=None, sleep=None):
+    """Подставляет размер пакета и паузу из настроек, если они не заданы."""
+
+    if batch_size is None:
+        batch_size = getattr(settings, "MASS_UPDATE_BATCH_SIZE", 1000)
+    if sleep is None:
+        sleep = getattr(settings, "MASS_UPDATE_SLEEP", 0.0)
+    return max(1, batch_size), max(0.0, sleep)
+
+
+def iter_pk_batches(queryset, batch_size):
+    """
+    Итерирует первичные ключи queryset пакетами (keyset-пагинация по pk).
+
+    Каждый пакет выбирается отдельным коротким запросом pk > последний,
+    поэтому итерация не держит курсор и не зависит от OFFSET.
+    """
+    queryset = queryset.order_by("pk").values_list("pk", flat=True)
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        pks = list(page[:batch_size])
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+def batched_update(queryset, values, batch_size=None, sleep=None, progress=None):
+    """
+    Обновляет записи queryset пакетами по первичному ключу.
+
+    Каждый пакет обновляется в отдельной короткой транзакции, между
+    пакетами делается пауза, чтобы не блокировать рабочую нагрузку.
+
+    Args:
+        queryset: Выборка обновляемых записей
+        values: Словарь полей для update()
+        batch_size: Размер пакета (MASS_UPDATE_BATCH_SIZE по умолчанию)
+        sleep: Пауза между пакетами в секундах (MASS_UPDATE_SLEEP по умолчанию)
+        progress: Функция progress(done, total), вызываемая после каждого пакета
+
+    Returns:
+        int: Количество обновленных записей
+    """
+    batch_size, sleep = get_batch_options(batch_size, sleep)
+    model = queryset.model
+    total = queryset.count()
+    if progress:
+        progress(0, total)
+    done = updated = 0
+    for pks in iter_pk_batches(queryset, batch_size):
+        with transaction.atomic():
+            updated += model.objects.filter(pk__in=pks).update(**values)
+        done += len(pks)
+        if progress:
+            progress(done, total)
+        if sleep:
+            time.sleep(sleep)
+    return updated
+
+
+def batched_delete_nodes(queryset, batch_size=None, sleep=None, progress=None):
+    """
+    Удаляет узлы сети пакетами, разбивая каскадные операции.
+
+    Для каждого пакета узлов зависимые узлы отвязываются (аналог SET_NULL),
+    продукты и архивные продукты удаляются (аналог CASCADE), а затем
+    удаляются сами узлы. Каждый шаг ограничен batch_size строк, выполняется
+    постоянным числом запросов (bulk_delete вместо посигнального удаления)
+    и фиксируется отдельной короткой транзакцией. Шаги идемпотентны:
+    если удаление прервано, узел остается с частью продуктов или
+    потребителей, и повторный запуск для той же выборки его дочищает.
+
+    Returns:
+        int: Количество удаленных узлов
+    """
+    batch_size, sleep = get_batch_options(batch_size, sleep)
+    total = queryset.count()
+    if progress:
+        progress(0, total)
+    done = deleted = 0
+    for pks in iter_pk_batches(queryset, batch_size):
+        for dependent_pks in iter_pk_batches(
+            NetworkNode.objects.filter(supplier_id__in=pks), batch_size
+        ):
+            NetworkNode.objects.filter(pk__in=dependent_pks).update(supplier=None)
+        for model in (Product, ArchivedProduct):
+            for related_pks in iter_pk_batches(
+                model.objects.filter(network_node_id__in=pks), batch_size
+            ):
+                model.objects.filter(pk__in=related_pks).bulk_delete()
+        deleted += NetworkNode.objects.filter(pk__in=pks).bulk_delete()
+        done += len(pks)
+        if progress:
+            progress(done, total)
+        if sleep:
+            time.sleep(sleep)
+    return deleted
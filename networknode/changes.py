@@ -0,0 +1,246 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, router, transaction
+from django.utils import timezone
+
+from .coalescing import invalidate
+
+CREATE = "create"
+UPDATE = "update"
+DELETE = "delete"
+ARCHIVE = "archive"
+RESTORE = "restore"
+
+_archive_action = ContextVar("archive_action", default=None)
+
+
+@contextmanager
+def archive_action(action):
+    """
+    Помечает блок переноса продуктов между рабочей и архивной таблицами.
+
+    Внутри блока события create/delete продуктов записываются с действием
+    action (ARCHIVE или RESTORE), а счетчики NodeStats не меняются:
+    продукт переносится, а не создается и не удаляется.
+    """
+    token = _archive_action.set(action)
+    try:
+        yield
+    finally:
+        _archive_action.reset(token)
+
+
+def get_archive_action():
+    """Возвращает действие текущего блока archive_action или None."""
+
+    return _archive_action.get()
+
+
+def serialize_instance(instance):
+    """Возвращает значения конкретных полей объекта для payload события."""
+
+    return {
+        field.attname: field.value_from_object(instance)
+        for field in instance._meta.concrete_fields
+    }
+
+
+def record_changes(instances, action, using="default"):
+    """
+    Записывает события изменения объектов в outbox-таблицу ChangeEvent.
+
+    Вызывается внутри транзакции, изменяющей данные, поэтому событие
+    фиксируется тогда и только тогда, когда фиксируется само изменение.
+    В блоке archive_action действие заменяется на archive/restore. Заодно сбрасываются общие результаты объединенных GET-запросов.
+    """
+    from .models import ChangeEvent
+
+    if action in (CREATE, DELETE):
+        action = get_archive_action() or action
+    events = [
+        ChangeEvent(
+            model=instance._meta.model_name,
+            object_id=instance.pk,
+            action=action,
+            payload=serialize_instance(instance),
+        )
+        for instance in instances
+    ]
+    if events:
+        ChangeEvent.objects.using(using).bulk_create(events)
+        invalidate(using)
+
+
+def get_commit_lag_start():
+    """
+    Возвращает момент, раньше которого пропуски в id событий окончательны.
+
+    Id событий выделяются при вставке, а видимыми они становятся при
+    фиксации транзакции, поэтому событие с меньшим id может появиться
+    позже события с большим. Пропуск, за которым есть события старше
+    CHANGE_FEED_COMMIT_LAG секунд, считается откатом транзакции.
+    """
+    return timezone.now() - timedelta(seconds=settings.CHANGE_FEED_COMMIT_LAG)
+
+
+def get_safe_cursor(since, limit, using="default"):
+    """
+    Возвращает курсор, до которого события можно читать без пропусков.
+
+    Просматривает не более limit событий после since и останавливается
+    перед первым свежим пропуском в id: на его месте может оказаться
+    событие еще не зафиксированной транзакции. Потребители читают
+    события с id в (since, курсор] и продолжают с возвращенного курсора.
+    """
+    from .models import ChangeEvent
+
+    lag_start = get_commit_lag_start()
+    cursor = since
+    rows = (
+        ChangeEvent.objects.using(using)
+        .filter(id__gt=since)
+        .order_by("id")
+        .values_list("id", "created_at")[:limit]
+    )
+    for event_id, created_at in rows:
+        if event_id != cursor + 1 and created_at > lag_start:
+            break
+        cursor = event_id
+    return cursor
+
+
+def read_model_events(model, cursor, limit, using="default"):
+    """
+    Читает события модели после cursor до безопасного курсора.
+
+    Курсор и события читаются из одной базы using. Возвращает не больше
+    limit + 1 событий (больше limit - повод загрузить данные заново)
+    и курсор, до которого прочитаны события всех моделей.
+
+    Returns:
+        tuple: (список ChangeEvent, курсор)
+    """
+    from .models import ChangeEvent
+
+    safe_cursor = get_safe_cursor(cursor, limit + 1, using)
+    events = list(
+        ChangeEvent.objects.using(using)
+        .filter(id__gt=cursor, id__lte=safe_cursor, model=model._meta.model_name)
+        .only("id", "object_id", "action", "payload")
+        .order_by("id")[: limit + 1]
+    )
+    return events, safe_cursor
+
+
+def get_settled_cursor(using="default"):
+    """
+    Возвращает курсор для данных, прочитанных из таблиц после вызова.
+
+    Это id последнего события старше CHANGE_FEED_COMMIT_LAG: более
+    свежие события применяются повторно, что безопасно, так как payload
+    содержит полное состояние объекта.
+    """
+    from .models import ChangeEvent
+
+    cursor = (
+        ChangeEvent.objects.using(using)
+        .filter(created_at__lte=get_commit_lag_start())
+        .order_by("-id")
+        .values_list("id", flat=True)
+        .first()
+    )
+    return cursor or 0
+
+
+def get_auto_now_fields(model):
+    """Возвращает поля модели с auto_now, которые не обновляются в update()."""
+
+    return [
+        field
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False)
+    ]
+
+
+def record_updated_rows(model, pks, using="default"):
+    """Записывает события update с актуальным состоянием строк после UPDATE."""
+
+    if pks:
+        record_changes(
+            model._base_manager.using(using).filter(pk__in=pks).order_by("pk"),
+            UPDATE,
+            using,
+        )
+
+
+class ChangeTrackedQuerySet(models.QuerySet):
+    """
+    QuerySet, который пишет события в outbox при массовых изменениях.
+
+    update(), bulk_create() и bulk_update() не вызывают save() и сигналы,
+    поэтому события для них записываются здесь, в той же транзакции.
+    """
+
+    def update(self, **kwargs):
+        """Массовое обновление с записью событий update и обновлением auto_now."""
+
+        now = timezone.now()
+        for field in get_auto_now_fields(self.model):
+            kwargs.setdefault(field.name, now)
+        with transaction.atomic(using=self.db, savepoint=False):
+            pks = list(self.values_list("pk", flat=True))
+            updated = super().update(**kwargs)
+            record_updated_rows(self.model, pks, self.db)
+        return updated
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Массовое создание с записью событий create."""
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            created = super().bulk_create(objs, *args, **kwargs)
+            record_changes([obj for obj in created if obj.pk], CREATE, self.db)
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        """Массовое обновление объектов с записью событий update."""
+
+        objs = list(objs)
+        fields = list(fields)
+        now = timezone.now()
+        for field in get_auto_now_fields(self.model):
+            for obj in objs:
+                setattr(obj, field.attname, now)
+            if field.name not in fields:
+                fields.append(field.name)
+        with transaction.atomic(using=self.db, savepoint=False):
+            updated = super().bulk_update(objs, fields, *args, **kwargs)
+            record_updated_rows(self.model, [obj.pk for obj in objs], self.db)
+        return updated
+
+
+class ChangeTrackedModel(models.Model):
+    """
+    Абстрактная модель, записывающая события create/update при save().
+
+    Сохранение и запись события выполняются в одной транзакции.
+    События delete пишутся обработчиками сигналов удаления.
+    """
+
+    objects = ChangeTrackedQuerySet.as_manager()
+
+    class Meta:
+        """Мета-класс для настроек модели."""
+
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        """Сохраняет объект и записывает событие в outbox."""
+
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        action = CREATE if self._state.adding else UPDATE
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+            record_changes([self], action, using)
@@ -0,0 +1,76 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Поколение данных: меняется при каждой записи, старые результаты не читаются
+GENERATION_KEY = "networknode:coalesce:generation"
+
+_MISSING = object()
+
+
+def get_generation():
+    """Возвращает текущее поколение данных для ключей объединения запросов."""
+
+    return cache.get_or_set(GENERATION_KEY, lambda: uuid.uuid4().hex, None)
+
+
+def bump_generation():
+    """Начинает новое поколение данных, делая прежние результаты недоступными."""
+
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def invalidate(using="default"):
+    """
+    Сбрасывает общие результаты запросов при записи.
+
+    Поколение меняется сразу и еще раз после коммита: результат, вычисленный
+    параллельным запросом до коммита по старым данным, не будет прочитан.
+    """
+    bump_generation()
+    transaction.on_commit(bump_generation, using=using)
+
+
+def make_key(*parts):
+    """Строит ключ объединения из частей запроса и текущего поколения."""
+
+    raw = "|".join(str(part) for part in (get_generation(), *parts))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def coalesce(key, compute, cacheable=lambda result: True):
+    """
+    Выполняет compute() один раз для одновременных одинаковых запросов.
+
+    Первый запрос (лидер) захватывает блокировку в кэше и вычисляет
+    результат, остальные ждут его появления в кэше и получают готовый
+    результат. Результат хранится COALESCE_RESULT_TTL секунд. Если лидер
+    не успел за COALESCE_WAIT_TIMEOUT секунд, запрос вычисляет результат сам.
+
+    Args:
+        key: Ключ запроса (см. make_key)
+        compute: Функция без аргументов, вычисляющая результат
+        cacheable: Функция, решающая, можно ли отдать результат другим запросам
+    """
+    result_key = f"networknode:coalesce:{key}:result"
+    lock_key = f"networknode:coalesce:{key}:lock"
+    deadline = time.monotonic() + settings.COALESCE_WAIT_TIMEOUT
+    while True:
+        result = cache.get(result_key, _MISSING)
+        if result is not _MISSING:
+            return result
+        if cache.add(lock_key, True, settings.COALESCE_LOCK_TIMEOUT):
+            try:
+                result = compute()
+                if cacheable(result):
+                    cache.set(result_key, result, settings.COALESCE_RESULT_TTL)
+                return result
+            finally:
+                cache.delete(lock_key)
+        if time.monotonic() >= deadline:
+            return compute()
+        time.sleep(settings.COALESCE_POLL_INTERVAL)
@@ -0,0 +1,163 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY_DB_ALIAS = "default"
+
+# Реплика, выбранная для чтения в текущем запросе/потоке (None - основная БД)
+_replica_reads = ContextVar("replica_reads", default=None)
+
+
+def get_replica_aliases():
+    """Возвращает список алиасов баз данных-реплик из настроек."""
+
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+def activate_replica_reads():
+    """
+    Разрешает маршрутизацию чтения на реплики в текущем контексте.
+
+    Реплика выбирается один раз на контекст и используется для всех
+    чтений в нем: реплики отстают от мастера по-разному, и чтение
+    списка с одной реплики, а связанных строк с другой дало бы
+    несогласованную картину. Вложенный контекст сохраняет уже
+    выбранную реплику.
+
+    Returns:
+        Token: Токен для последующего вызова deactivate_replica_reads
+    """
+    alias = _replica_reads.get()
+    if alias is None:
+        replicas = get_replica_aliases()
+        alias = random.choice(replicas) if replicas else None
+    return _replica_reads.set(alias)
+
+
+def deactivate_replica_reads(token):
+    """Восстанавливает состояние маршрутизации, сохраненное в токене."""
+
+    _replica_reads.reset(token)
+
+
+@contextmanager
+def replica_reads():
+    """
+    Контекстный менеджер для безопасного чтения с реплик.
+
+    Используется для read-only операций (выгрузки, отчеты), которым
+    не требуется read-your-writes.
+    """
+    token = activate_replica_reads()
+    try:
+        yield
+    finally:
+        deactivate_replica_reads(token)
+
+
+# Подписанная cookie привязки клиента к основной БД (read-your-writes)
+PRIMARY_PIN_COOKIE = "primary_pin"
+PRIMARY_PIN_SALT = "networknode.primary-pin"
+
+
+def _pin_cache_key(user):
+    """Формирует ключ кэша для привязки пользователя к основной БД."""
+
+    return f"networknode:primary-pin:{user.pk}"
+
+
+def pin_to_primary(request, response):
+    """
+    Привязывает чтения пользователя к основной БД после записи.
+
+    Пока привязка действует (REPLICA_STICKY_SECONDS), пользователь
+    читает с основной базы и видит собственные изменения, даже если
+    реплика еще не догнала мастер. Привязка хранится в подписанной
+    cookie ответа, поэтому действует в любом воркере; для клиентов
+    без cookie она дублируется в кэше (общем для воркеров только
+    при REDIS_URL).
+    """
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return
+    timeout = getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+    response.set_signed_cookie(
+        PRIMARY_PIN_COOKIE,
+        str(user.pk),
+        salt=PRIMARY_PIN_SALT,
+        max_age=timeout,
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite="Lax",
+    )
+    cache.set(_pin_cache_key(user), True, timeout)
+
+
+def mark_read_only(request):
+    """
+    Помечает запрос как чтение, даже если он выполнен POST.
+
+    Такой запрос (например, batch_get с id в теле) не привязывает
+    пользователя к основной БД (см. PrimaryPinMiddleware).
+    """
+    request.read_only = True
+
+
+def is_pinned_to_primary(request):
+    """Проверяет, должен ли пользователь запроса читать с основной БД."""
+
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return False
+    pinned_pk = request.get_signed_cookie(
+        PRIMARY_PIN_COOKIE,
+        default=None,
+        salt=PRIMARY_PIN_SALT,
+        max_age=getattr(settings, "REPLICA_STICKY_SECONDS", 5),
+    )
+    if pinned_pk == str(user.pk):
+        return True
+    return bool(cache.get(_pin_cache_key(user)))
+
+
+class PrimaryReplicaRouter:
+    """
+    Роутер баз данных: запись в основную БД, безопасное чтение с реплик.
+
+    Чтение уходит на реплику только для моделей приложения networknode
+    и только внутри явно разрешенного контекста (replica_reads или
+    ReplicaReadMixin во ViewSet). Все остальные запросы, включая
+    аутентификацию и админку, обслуживаются основной базой.
+    """
+
+    route_app_labels = {"networknode"}
+
+    def db_for_read(self, model, **hints):
+        """Возвращает реплику, выбранную для текущего контекста чтения."""
+
+        if model._meta.app_label not in self.route_app_labels:
+            return None
+        return _replica_reads.get()
+
+    def db_for_write(self, model, **hints):
+        """Все записи направляются в основную БД."""
+
+        return PRIMARY_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Разрешает связи между объектами основной БД и ее реплик."""
+
+        dbs = {PRIMARY_DB_ALIAS, *get_replica_aliases()}
+        if obj1._state.db in dbs and obj2._state.db in dbs:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Запрещает миграции на репликах: схема приходит с мастера."""
+
+        if db in get_replica_aliases():
+            return False
+        return None
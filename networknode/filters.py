@@ -1,4 +1,11 @@
+from functools import reduce
+from operator import or_
+
 import django_filters
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.text import smart_split, unescape_string_literal
+
 from .models import NetworkNode
 
 
@@ -21,3 +28,70 @@ class NetworkNodeFilter(django_filters.FilterSet):
 
         model = NetworkNode
         fields = ["country", "city", "node_type"]
+
+
+def validate_node_filters(filters):
+    """
+    Проверяет параметры NetworkNodeFilter для массовых операций.
+
+    django-filter молча пропускает неизвестные параметры и некорректные
+    значения, и выборка расширяется до всех узлов. Здесь такие
+    параметры, как и пустые значения, считаются ошибкой.
+
+    Returns:
+        dict: Проверенные фильтры
+
+    Raises:
+        ValidationError: Ошибки по параметрам
+    """
+    filters = dict(filters or {})
+    errors = {}
+    for name, value in filters.items():
+        if name not in NetworkNodeFilter.base_filters:
+            errors[name] = ["Неизвестный фильтр"]
+        elif value in (None, ""):
+            errors[name] = ["Пустое значение фильтра"]
+    if not errors:
+        filterset = NetworkNodeFilter(filters, queryset=NetworkNode.objects.none())
+        if not filterset.is_valid():
+            errors = filterset.errors
+    if errors:
+        raise ValidationError(errors)
+    return filters
+
+
+def filter_nodes(ids=None, filters=None, lookups=None, search=None):
+    """
+    Строит queryset узлов по списку id и/или параметрам NetworkNodeFilter.
+
+    Используется фоновыми задачами и командами управления, которые
+    принимают ту же выборку, что и API. Выборка из админки передается
+    как lookups (параметры фильтров списка: {lookup: [значения]}, значения
+    одного lookup объединяются через OR) и search ({"term": строка поиска,
+    "fields": поля search_fields}), как это делает ChangeList.
+
+    Некорректные filters вызывают ValidationError (validate_node_filters),
+    чтобы сохраненная задача не обработала всю таблицу.
+    """
+    queryset = NetworkNode.objects.all()
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    if filters:
+        queryset = NetworkNodeFilter(
+            validate_node_filters(filters), queryset=queryset
+        ).qs
+    for lookup, values in (lookups or {}).items():
+        queryset = queryset.filter(
+            reduce(or_, (Q((lookup, value)) for value in values))
+        )
+    if search and search.get("term"):
+        for word in smart_split(search["term"]):
+            if word.startswith(('"', "'")) and word[0] == word[-1]:
+                word = unescape_string_literal(word)
+            queryset = queryset.filter(
+                reduce(
+                    or_,
+                    (Q((f"{field}__icontains", word)) for field in search["fields"]),
+                )
+            )
+    return queryset
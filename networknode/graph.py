@@ -0,0 +1,719 @@
+import heapq
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db import connections
+
+from .changes import DELETE, get_settled_cursor, read_model_events
+from .db_routers import PRIMARY_DB_ALIAS
+
+logger = logging.getLogger(__name__)
+
+NO_PARENT = -1
+CYCLE_DEPTH = -1
+UNKNOWN_DEPTH = -2
+UNKNOWN_NODE_TYPE = 255
+
+
+class SupplyGraph:
+    """
+    In-memory индекс графа поставок на основе пар (id, supplier_id).
+
+    Хранение компактное и колоночное (модуль array):
+    - _ids: id узлов (8 байт на узел); первые _sorted_size отсортированы,
+      узлы, добавленные не по порядку id, дописываются в хвост с индексом
+      в словаре _tail;
+    - _parents: индекс поставщика в _ids или NO_PARENT (8 байт на узел);
+    - _types: код типа узла (1 байт на узел);
+    - _alive: признак, что узел не удален (1 байт на узел);
+    - CSR-представление детей (_offsets, _children) строится пакетно.
+
+    Изменения из outbox-таблицы ChangeEvent (события узлов после курсора
+    cursor) применяются инкрементально: родительские ссылки
+    правятся на месте, а новые связи попадают в небольшой overlay поверх
+    CSR, который периодически уплотняется. Агрегаты (глубины, размеры
+    поддеревьев, циклы) вычисляются за O(n) один раз и затем
+    поддерживаются при изменениях за O(размер поддерева + глубина);
+    полный пересчет нужен, только если изменение затрагивает цикл.
+    """
+
+    def __init__(self, node_types=None):
+        self._lock = threading.RLock()
+        self._type_codes = {
+            code: index for index, (code, _) in enumerate(node_types or [])
+        }
+        self._type_names = {index: code for code, index in self._type_codes.items()}
+        self._sync_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Сбрасывает индекс; при следующем обращении он будет загружен заново."""
+
+        with self._lock:
+            self.cursor = 0
+            self._synced_at = None
+            self._ids = array("q")
+            self._sorted_size = 0
+            self._tail = {}
+            self._parents = array("q")
+            self._types = bytearray()
+            self._alive = bytearray()
+            self._size = 0
+            self._loaded_at = None
+            self._reset_children()
+            self._stats = None
+
+    @property
+    def is_loaded(self):
+        """Был ли индекс загружен из базы данных."""
+
+        return self._loaded_at is not None
+
+    def __len__(self):
+        return self._size
+
+    # Загрузка и инкрементальное обновление
+
+    def load(self, rows, cursor=None):
+        """
+        Строит индекс из итерируемого набора (id, supplier_id, node_type).
+
+        Строки должны быть упорядочены по id. cursor - id последнего
+        события ChangeEvent, уже отраженного в строках (None - не менять).
+        Колонки строятся без блокировки и подменяются под ней, поэтому
+        читатели во время загрузки работают с прежним индексом.
+        """
+        ids = array("q")
+        supplier_ids = array("q")
+        types = bytearray()
+        for node_id, supplier_id, node_type in rows:
+            ids.append(node_id)
+            supplier_ids.append(supplier_id or 0)
+            types.append(self._type_codes.get(node_type, UNKNOWN_NODE_TYPE))
+
+        parents = array("q", bytes(8 * len(ids)))
+        for index, supplier_id in enumerate(supplier_ids):
+            parents[index] = self._bisect(ids, supplier_id)
+
+        with self._lock:
+            self._ids = ids
+            self._sorted_size = len(ids)
+            self._tail = {}
+            self._parents = parents
+            self._types = types
+            self._alive = bytearray(b"\x01") * len(ids)
+            self._size = len(ids)
+            self._loaded_at = self._synced_at = time.monotonic()
+            if cursor is not None:
+                self.cursor = cursor
+            self._reset_children()
+            self._stats = None
+
+    def apply_events(self, events, cursor=None):
+        """
+        Применяет события ChangeEvent узлов и сдвигает курсор.
+
+        cursor - курсор, до которого прочитаны события всех моделей.
+        Payload события содержит полное состояние узла, поэтому
+        повторное применение ничего не меняет.
+        """
+        with self._lock:
+            for event in events:
+                if event.action == DELETE:
+                    self.remove(event.object_id)
+                elif event.payload:
+                    self.upsert(
+                        event.object_id,
+                        event.payload.get("supplier_id"),
+                        event.payload.get("node_type"),
+                    )
+                self.cursor = max(self.cursor, event.id)
+            if cursor is not None:
+                self.cursor = max(self.cursor, cursor)
+            self._synced_at = time.monotonic()
+
+    def needs_sync(self, max_staleness):
+        """Проверяет, что индекс не сверялся с outbox max_staleness секунд."""
+
+        if self._synced_at is None:
+            return True
+        return time.monotonic() - self._synced_at > max_staleness
+
+    def is_stale(self, max_age):
+        """Проверяет, что индекс не загружен или старше max_age секунд."""
+
+        if self._loaded_at is None:
+            return True
+        return max_age is not None and time.monotonic() - self._loaded_at > max_age
+
+    def upsert(self, node_id, supplier_id, node_type=None):
+        """Добавляет узел или меняет его поставщика."""
+
+        with self._lock:
+            index = self._find(node_id)
+            if index == NO_PARENT:
+                index = self._append(node_id)
+                self._stats_add_root(index)
+            elif not self._alive[index]:
+                self._alive[index] = 1
+                self._size += 1
+                self._stats_add_root(index)
+
+            if node_type is not None:
+                self._types[index] = self._type_codes.get(node_type, UNKNOWN_NODE_TYPE)
+            parent = self._find(supplier_id or 0)
+            if parent != NO_PARENT and not self._alive[parent]:
+                parent = NO_PARENT
+            if parent != self._parents[index]:
+                self._stats_move(index, parent)
+                self._set_parent(index, parent)
+            if len(self._tail) > max(1024, len(self._ids) // 16):
+                self._compact()
+
+    def remove(self, node_id):
+        """
+        Удаляет узел из индекса.
+
+        Зависимые узлы становятся корнями, как при on_delete=SET_NULL.
+        """
+        with self._lock:
+            index = self._find(node_id)
+            if index == NO_PARENT or not self._alive[index]:
+                return
+            for child in self._children_of(index):
+                self._stats_move(child, NO_PARENT)
+                self._set_parent(child, NO_PARENT)
+            self._stats_remove_leaf(index)
+            self._alive[index] = 0
+            self._parents[index] = NO_PARENT
+            self._size -= 1
+
+    # Обходы
+
+    def contains(self, node_id):
+        """Проверяет наличие узла в индексе."""
+
+        index = self._find(node_id)
+        return index != NO_PARENT and bool(self._alive[index])
+
+    def bfs(self, node_id, max_depth=None, node_type=None):
+        """
+        Обходит потребителей узла в ширину.
+
+        Args:
+            node_id: id стартового узла
+            max_depth: максимальное число шагов (None - без ограничения)
+            node_type: вернуть только узлы этого типа
+
+        Returns:
+            list[tuple[int, int]]: Пары (id, глубина относительно node_id)
+        """
+        with self._lock:
+            start = self._require(node_id)
+            type_code = self._type_codes.get(node_type) if node_type else None
+            visited = {start}
+            queue = deque([(start, 0)])
+            result = []
+            while queue:
+                index, depth = queue.popleft()
+                if max_depth is not None and depth >= max_depth:
+                    continue
+                for child in self._children_of(index):
+                    if child in visited:
+                        continue
+                    visited.add(child)
+                    queue.append((child, depth + 1))
+                    if type_code is None or self._types[child] == type_code:
+                        result.append((self._ids[child], depth + 1))
+            return result
+
+    def dfs(self, node_id):
+        """Возвращает id потребителей узла в порядке обхода в глубину (preorder)."""
+
+        with self._lock:
+            start = self._require(node_id)
+            visited = {start}
+            stack = list(reversed(self._children_of(start)))
+            result = []
+            while stack:
+                index = stack.pop()
+                if index in visited:
+                    continue
+                visited.add(index)
+                result.append(self._ids[index])
+                stack.extend(reversed(self._children_of(index)))
+            return result
+
+    def ancestors(self, node_id):
+        """Возвращает id поставщиков узла от ближайшего к корню."""
+
+        with self._lock:
+            index = self._parents[self._require(node_id)]
+            result = []
+            seen = set()
+            while index != NO_PARENT and index not in seen:
+                seen.add(index)
+                result.append(self._ids[index])
+                index = self._parents[index]
+            return result
+
+    # Агрегаты
+
+    def depth(self, node_id):
+        """Глубина узла (0 для корня, CYCLE_DEPTH для узлов в цикле или ниже него)."""
+
+        with self._lock:
+            return self._get_stats()["depths"][self._require(node_id)]
+
+    def subtree_size(self, node_id):
+        """Число потребителей узла на всех уровнях (без самого узла)."""
+
+        with self._lock:
+            return self._get_stats()["subtree_sizes"][self._require(node_id)] - 1
+
+    def depth_histogram(self):
+        """Распределение узлов по глубине иерархии."""
+
+        with self._lock:
+            return dict(self._get_stats()["histogram"])
+
+    def find_cycles(self):
+        """Возвращает список циклов поставок (списки id узлов)."""
+
+        with self._lock:
+            return [list(cycle) for cycle in self._get_stats()["cycles"]]
+
+    def longest_chains(self, limit=10):
+        """
+        Возвращает самые длинные цепочки поставок.
+
+        Returns:
+            list[list[int]]: Цепочки id от корня до самого глубокого узла
+        """
+        with self._lock:
+            stats = self._get_stats()
+            depths = stats["depths"]
+            deepest = heapq.nlargest(
+                limit,
+                (index for index in range(len(depths)) if self._alive[index]),
+                key=depths.__getitem__,
+            )
+            chains = []
+            for index in deepest:
+                chain = [self._ids[index]]
+                chain.extend(self.ancestors(self._ids[index]))
+                chains.append(list(reversed(chain)))
+            return chains
+
+    def summary(self, chains_limit=10):
+        """Сводная статистика графа для аналитического endpoint."""
+
+        with self._lock:
+            stats = self._get_stats()
+            return {
+                "nodes": self._size,
+                "roots": stats["roots"],
+                "max_depth": max(stats["histogram"], default=0),
+                "depth_histogram": dict(stats["histogram"]),
+                "cycles": self.find_cycles(),
+                "longest_chains": self.longest_chains(chains_limit),
+            }
+
+    # Внутренние методы
+
+    @staticmethod
+    def _bisect(ids, node_id):
+        """Бинарный поиск индекса id в отсортированном массиве."""
+
+        if not node_id:
+            return NO_PARENT
+        index = bisect_left(ids, node_id)
+        if index < len(ids) and ids[index] == node_id:
+            return index
+        return NO_PARENT
+
+    def _find(self, node_id):
+        """Ищет индекс узла по id: в отсортированной части, затем в хвосте."""
+
+        if not node_id:
+            return NO_PARENT
+        index = bisect_left(self._ids, node_id, 0, self._sorted_size)
+        if index < self._sorted_size and self._ids[index] == node_id:
+            return index
+        return self._tail.get(node_id, NO_PARENT)
+
+    def _require(self, node_id):
+        index = self._find(node_id)
+        if index == NO_PARENT or not self._alive[index]:
+            raise KeyError(node_id)
+        return index
+
+    def _append(self, node_id):
+        """
+        Дописывает новый узел в конец колонок без сдвига индексов.
+
+        id больше последнего продолжает отсортированную часть, остальные
+        попадают в хвост; хвост уплотняется в _compact.
+        """
+        index = len(self._ids)
+        if self._sorted_size == index and (not index or node_id > self._ids[-1]):
+            self._sorted_size += 1
+        else:
+            self._tail[node_id] = index
+        self._ids.append(node_id)
+        self._parents.append(NO_PARENT)
+        self._types.append(UNKNOWN_NODE_TYPE)
+        self._alive.append(1)
+        self._size += 1
+        return index
+
+    def _compact(self):
+        """Перестраивает индекс, сортируя хвост и удаляя удаленные узлы."""
+
+        rows = sorted(
+            (
+                self._ids[index],
+                (
+                    self._ids[self._parents[index]]
+                    if self._parents[index] != NO_PARENT
+                    else None
+                ),
+                self._type_names.get(self._types[index]),
+            )
+            for index in range(len(self._ids))
+            if self._alive[index]
+        )
+        loaded_at, synced_at = self._loaded_at, self._synced_at
+        self.load(rows)
+        self._loaded_at, self._synced_at = loaded_at, synced_at
+
+    def _reset_children(self):
+        self._offsets = array("q", [0])
+        self._children = array("q")
+        self._base_parents = array("q")
+        self._extra_children = {}
+        self._overlay_size = 0
+        self._children_dirty = True
+
+    def _set_parent(self, index, parent):
+        self._parents[index] = parent
+        if self._children_dirty:
+            return
+        base_parent = (
+            self._base_parents[index] if index < len(self._base_parents) else NO_PARENT
+        )
+        if parent != NO_PARENT and parent != base_parent:
+            self._extra_children.setdefault(parent, set()).add(index)
+            self._overlay_size += 1
+            if self._overlay_size > max(1024, len(self._ids) // 16):
+                self._children_dirty = True
+
+    def _build_children(self):
+        """Строит CSR-представление детей по текущим родительским ссылкам."""
+
+        count = len(self._ids)
+        offsets = array("q", bytes(8 * (count + 1)))
+        for index in range(count):
+            parent = self._parents[index]
+            if parent != NO_PARENT and self._alive[index]:
+                offsets[parent + 1] += 1
+        for index in range(count):
+            offsets[index + 1] += offsets[index]
+        children = array("q", bytes(8 * offsets[count]))
+        cursor = array("q", offsets[:count])
+        for index in range(count):
+            parent = self._parents[index]
+            if parent != NO_PARENT and self._alive[index]:
+                children[cursor[parent]] = index
+                cursor[parent] += 1
+        self._offsets = offsets
+        self._children = children
+        self._base_parents = array("q", self._parents)
+        self._extra_children = {}
+        self._overlay_size = 0
+        self._children_dirty = False
+
+    def _children_of(self, index):
+        if self._children_dirty:
+            self._build_children()
+        result = []
+        if index < len(self._offsets) - 1:
+            for child in self._children[
+                self._offsets[index] : self._offsets[index + 1]
+            ]:
+                if self._alive[child] and self._parents[child] == index:
+                    result.append(child)
+        for child in sorted(self._extra_children.get(index, ())):
+            if self._alive[child] and self._parents[child] == index:
+                result.append(child)
+        return result
+
+    # Инкрементальное поддержание агрегатов
+
+    def _stats_add_root(self, index):
+        """Учитывает в агрегатах новый (или восстановленный) корневой узел."""
+
+        stats = self._stats
+        if stats is None:
+            return
+        if index == len(stats["depths"]):
+            stats["depths"].append(0)
+            stats["subtree_sizes"].append(1)
+        else:
+            stats["depths"][index] = 0
+            stats["subtree_sizes"][index] = 1
+        stats["histogram"][0] += 1
+        stats["roots"] = stats["histogram"][0]
+
+    def _subtree(self, index):
+        """Возвращает индексы узла и всех его потребителей."""
+
+        result = [index]
+        seen = {index}
+        position = 0
+        while position < len(result):
+            for child in self._children_of(result[position]):
+                if child not in seen:
+                    seen.add(child)
+                    result.append(child)
+            position += 1
+        return result
+
+    def _stats_move(self, index, parent):
+        """
+        Переносит узел с поддеревом к новому поставщику в агрегатах.
+
+        Вызывается до изменения ссылки. Глубины поддерева сдвигаются,
+        размеры поддеревьев старых и новых поставщиков корректируются.
+        Если узел в цикле или перенос создает цикл, агрегаты сбрасываются
+        и будут пересчитаны при следующем чтении.
+        """
+        stats = self._stats
+        if stats is None:
+            return
+        depths = stats["depths"]
+        sizes = stats["subtree_sizes"]
+        old_depth = depths[index]
+        if old_depth == CYCLE_DEPTH or (
+            parent != NO_PARENT and depths[parent] == CYCLE_DEPTH
+        ):
+            self._stats = None
+            return
+        subtree = self._subtree(index)
+        if parent != NO_PARENT and parent in set(subtree):
+            self._stats = None
+            return
+
+        new_depth = depths[parent] + 1 if parent != NO_PARENT else 0
+        histogram = stats["histogram"]
+        if new_depth != old_depth:
+            delta = new_depth - old_depth
+            for node in subtree:
+                histogram[depths[node]] -= 1
+                if not histogram[depths[node]]:
+                    del histogram[depths[node]]
+                depths[node] += delta
+                histogram[depths[node]] += 1
+        size = sizes[index]
+        ancestor = self._parents[index]
+        while ancestor != NO_PARENT:
+            sizes[ancestor] -= size
+            ancestor = self._parents[ancestor]
+        ancestor = parent
+        while ancestor != NO_PARENT:
+            sizes[ancestor] += size
+            ancestor = self._parents[ancestor]
+        stats["roots"] = histogram.get(0, 0)
+
+    def _stats_remove_leaf(self, index):
+        """Убирает из агрегатов узел без потребителей перед его удалением."""
+
+        stats = self._stats
+        if stats is None:
+            return
+        depth = stats["depths"][index]
+        if depth == CYCLE_DEPTH:
+            self._stats = None
+            return
+        histogram = stats["histogram"]
+        histogram[depth] -= 1
+        if not histogram[depth]:
+            del histogram[depth]
+        ancestor = self._parents[index]
+        while ancestor != NO_PARENT:
+            stats["subtree_sizes"][ancestor] -= 1
+            ancestor = self._parents[ancestor]
+        stats["roots"] = histogram.get(0, 0)
+
+    def _get_stats(self):
+        if self._stats is None:
+            self._stats = self._compute_stats()
+        return self._stats
+
+    def _compute_stats(self):
+        """Вычисляет глубины, циклы и размеры поддеревьев за O(n)."""
+
+        count = len(self._ids)
+        parents = self._parents
+        depths = array("q", [UNKNOWN_DEPTH]) * count
+        cycles = []
+
+        for start in range(count):
+            if not self._alive[start] or depths[start] != UNKNOWN_DEPTH:
+                continue
+            path = []
+            positions = {}
+            index = start
+            while (
+                index != NO_PARENT
+                and depths[index] == UNKNOWN_DEPTH
+                and index not in positions
+            ):
+                positions[index] = len(path)
+                path.append(index)
+                index = parents[index]
+
+            if index != NO_PARENT and index in positions:
+                cycle = path[positions[index] :]
+                cycles.append([self._ids[node] for node in cycle])
+                for node in cycle:
+                    depths[node] = CYCLE_DEPTH
+                path = path[: positions[index]]
+                in_cycle = True
+            elif index == NO_PARENT:
+                in_cycle, base = False, -1
+            else:
+                in_cycle, base = depths[index] == CYCLE_DEPTH, depths[index]
+
+            for node in reversed(path):
+                if in_cycle:
+                    depths[node] = CYCLE_DEPTH
+                else:
+                    base += 1
+                    depths[node] = base
+
+        histogram = Counter(
+            depths[index]
+            for index in range(count)
+            if self._alive[index] and depths[index] != CYCLE_DEPTH
+        )
+
+        # Размеры поддеревьев: проходим узлы от самых глубоких к корням
+        buckets = {}
+        for index in range(count):
+            if self._alive[index] and depths[index] > 0:
+                buckets.setdefault(depths[index], []).append(index)
+        subtree_sizes = array("q", [1]) * count
+        for depth in sorted(buckets, reverse=True):
+            for index in buckets[depth]:
+                subtree_sizes[parents[index]] += subtree_sizes[index]
+
+        return {
+            "depths": depths,
+            "histogram": histogram,
+            "cycles": cycles,
+            "roots": histogram.get(0, 0),
+            "subtree_sizes": subtree_sizes,
+        }
+
+
+def _create_graph():
+    from .models import NetworkNode
+
+    return SupplyGraph(node_types=NetworkNode.NODE_TYPES)
+
+
+def _load(graph):
+    """
+    Загружает индекс из основной БД.
+
+    Курсор читается до строк и отстает на CHANGE_FEED_COMMIT_LAG, поэтому
+    свежие события будут применены повторно, что безопасно.
+    """
+    from .models import NetworkNode
+
+    cursor = get_settled_cursor(PRIMARY_DB_ALIAS)
+    graph.load(
+        NetworkNode.objects.using(PRIMARY_DB_ALIAS)
+        .order_by("id")
+        .values_list("id", "supplier_id", "node_type")
+        .iterator(chunk_size=10000),
+        cursor=cursor,
+    )
+
+
+def _sync(graph):
+    """
+    Применяет к индексу новые события узлов из outbox основной БД.
+
+    Если событий больше SUPPLY_GRAPH_PATCH_LIMIT, индекс загружается заново.
+    """
+    from .models import NetworkNode
+
+    limit = settings.SUPPLY_GRAPH_PATCH_LIMIT
+    events, safe_cursor = read_model_events(
+        NetworkNode, graph.cursor, limit, PRIMARY_DB_ALIAS
+    )
+    if len(events) > limit:
+        _load(graph)
+    else:
+        graph.apply_events(events, cursor=safe_cursor)
+
+
+def _reload_in_background(graph):
+    """Перезагружает индекс в отдельном потоке, не задерживая запрос."""
+
+    def reload():
+        try:
+            _load(graph)
+        except Exception:
+            logger.exception("Не удалось перезагрузить индекс графа поставок")
+        finally:
+            graph._sync_lock.release()
+            connections.close_all()
+
+    threading.Thread(target=reload, name="supply-graph-reload", daemon=True).start()
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_supply_graph():
+    """
+    Возвращает процессный индекс графа поставок, загружая его при необходимости.
+
+    Не чаще раза в SUPPLY_GRAPH_MAX_STALENESS секунд индекс сверяется
+    с outbox ChangeEvent (один запрос), поэтому видит любые изменения
+    узлов, включая массовые update() и изменения других процессов.
+    Не реже раза в SUPPLY_GRAPH_MAX_AGE секунд он загружается заново
+    в фоновом потоке; до конца загрузки запросы читают прежний индекс.
+    Ждать приходится только первой загрузки.
+    """
+    global _graph
+    with _graph_lock:
+        if _graph is None:
+            _graph = _create_graph()
+        graph = _graph
+    if not graph.needs_sync(settings.SUPPLY_GRAPH_MAX_STALENESS):
+        return graph
+    if not graph.is_loaded:
+        with graph._sync_lock:
+            if not graph.is_loaded:
+                _load(graph)
+        return graph
+    if graph._sync_lock.acquire(blocking=False):
+        if graph.is_stale(settings.SUPPLY_GRAPH_MAX_AGE):
+            # Блокировка освобождается фоновым потоком
+            _reload_in_background(graph)
+            return graph
+        try:
+            _sync(graph)
+        finally:
+            graph._sync_lock.release()
+    return graph
@@ -0,0 +1,263 @@
+from django.core.exceptions import ValidationError
+from django.db import connections
+
+# Сеть имеет 3 уровня иерархии: 0 (завод), 1 и 2
+MAX_HIERARCHY_LEVEL = 2
+
+# Ограничение рекурсии на случай уже существующих в БД циклов
+_RECURSION_LIMIT = 64
+
+# Ключ advisory-блокировки PostgreSQL для изменений иерархии
+_HIERARCHY_LOCK_KEY = 720_301
+
+_CHAIN_SQL = """
+WITH RECURSIVE
+    ancestors(id, supplier_id, depth) AS (
+        SELECT id, supplier_id, 0 FROM {table} WHERE id = %s
+        UNION ALL
+        SELECT n.id, n.supplier_id, a.depth + 1
+        FROM {table} n JOIN ancestors a ON n.id = a.supplier_id
+        WHERE a.depth < {limit}
+    ),
+    descendants(id, depth) AS (
+        SELECT id, 0 FROM {table} WHERE id = %s
+        UNION ALL
+        SELECT n.id, d.depth + 1
+        FROM {table} n JOIN descendants d ON n.supplier_id = d.id
+        WHERE d.depth < {limit}
+    )
+SELECT
+    (SELECT MAX(depth) FROM ancestors),
+    (SELECT COUNT(*) FROM ancestors WHERE id = %s),
+    (SELECT MAX(depth) FROM descendants)
+"""
+
+_BATCH_EDGES_SQL = """
+WITH RECURSIVE
+    ancestors(id, supplier_id, depth) AS (
+        SELECT id, supplier_id, 0 FROM {table} WHERE id IN ({ancestor_roots})
+        UNION ALL
+        SELECT n.id, n.supplier_id, a.depth + 1
+        FROM {table} n JOIN ancestors a ON n.id = a.supplier_id
+        WHERE a.depth < {limit}
+    ),
+    descendants(id, supplier_id, depth) AS (
+        SELECT id, supplier_id, 0 FROM {table} WHERE id IN ({descendant_roots})
+        UNION ALL
+        SELECT n.id, n.supplier_id, d.depth + 1
+        FROM {table} n JOIN descendants d ON n.supplier_id = d.id
+        WHERE d.depth < {limit}
+    )
+SELECT id, supplier_id FROM ancestors
+UNION
+SELECT id, supplier_id FROM descendants
+"""
+
+_SUPPLY_CHAINS_SQL = """
+WITH RECURSIVE chain(node_id, ancestor_id, depth) AS (
+    SELECT id, supplier_id, 1 FROM {table}
+    WHERE id IN ({placeholders}) AND supplier_id IS NOT NULL
+    UNION ALL
+    SELECT c.node_id, n.supplier_id, c.depth + 1
+    FROM chain c JOIN {table} n ON n.id = c.ancestor_id
+    WHERE n.supplier_id IS NOT NULL AND c.depth < {limit}
+)
+SELECT c.node_id, c.depth, a.id, a.name, a.node_type
+FROM chain c JOIN {table} a ON a.id = c.ancestor_id
+ORDER BY c.node_id, c.depth DESC
+"""
+
+
+def lock_hierarchy(using="default"):
+    """
+    Сериализует изменения поставщиков внутри текущей транзакции.
+
+    В PostgreSQL берется транзакционная advisory-блокировка, поэтому две
+    конкурентные смены поставщика не могут одновременно пройти проверку
+    и вместе образовать цикл. SQLite и так сериализует запись.
+    Должна вызываться внутри transaction.atomic().
+    """
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [_HIERARCHY_LOCK_KEY])
+
+
+def get_supplier_chain_info(node_id, supplier_id, using="default"):
+    """
+    Одним рекурсивным запросом получает данные для проверки смены поставщика.
+
+    Args:
+        node_id: id изменяемого узла (None для нового узла)
+        supplier_id: id нового поставщика
+
+    Returns:
+        tuple[int | None, bool, int]: Уровень поставщика (None, если он не
+        найден или его цепочка не заканчивается корнем), признак того, что
+        узел входит в цепочку поставщика (цикл), и высота поддерева узла
+    """
+    from .models import NetworkNode
+
+    sql = _CHAIN_SQL.format(
+        table=connections[using].ops.quote_name(NetworkNode._meta.db_table),
+        limit=_RECURSION_LIMIT,
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [supplier_id, node_id, node_id])
+        supplier_level, cycle_hits, subtree_height = cursor.fetchone()
+    if supplier_level is not None and supplier_level >= _RECURSION_LIMIT:
+        supplier_level = None
+    return supplier_level, bool(cycle_hits), subtree_height or 0
+
+
+def validate_supplier(node_id, supplier_id, using="default"):
+    """
+    Проверяет, что узел можно подключить к поставщику.
+
+    Запрещает циклы (включая поставщика-самого-себя) и превышение
+    MAX_HIERARCHY_LEVEL для узла и всех его потребителей.
+
+    Raises:
+        ValidationError: Если смена поставщика нарушает иерархию
+    """
+    if supplier_id is None:
+        return
+    if node_id is not None and node_id == supplier_id:
+        raise ValidationError(
+            {"supplier": "Узел не может быть поставщиком самому себе"}
+        )
+
+    supplier_level, creates_cycle, subtree_height = get_supplier_chain_info(
+        node_id, supplier_id, using=using
+    )
+    if creates_cycle:
+        raise ValidationError(
+            {
+                "supplier": "Поставщик не может быть потребителем этого узла (цикл поставок)"
+            }
+        )
+    if supplier_level is None:
+        raise ValidationError({"supplier": "Цепочка поставщика повреждена"})
+    if supplier_level + 1 + subtree_height > MAX_HIERARCHY_LEVEL:
+        raise ValidationError(
+            {
+                "supplier": (
+                    f"Превышена глубина иерархии: допустимо не более "
+                    f"{MAX_HIERARCHY_LEVEL + 1} уровней"
+                )
+            }
+        )
+
+
+def validate_supplier_changes(changes, using="default"):
+    """
+    Проверяет набор смен поставщиков как одно изменение.
+
+    В отличие от validate_supplier для каждого узла по отдельности,
+    учитывает другие изменения того же набора: пара A -> B и B -> A
+    или цепочка из нескольких переносов, превышающая допустимую глубину,
+    отклоняются. Одним рекурсивным запросом загружаются предки новых
+    поставщиков и изменяемых узлов и все потребители изменяемых узлов.
+
+    Args:
+        changes: Словарь {id узла: id нового поставщика или None}
+
+    Raises:
+        ValidationError: Если набор изменений нарушает иерархию
+    """
+    from .models import NetworkNode
+
+    if not changes:
+        return
+    for node_id, supplier_id in changes.items():
+        if node_id is not None and node_id == supplier_id:
+            raise ValidationError(
+                {"supplier": "Узел не может быть поставщиком самому себе"}
+            )
+
+    node_ids = [node_id for node_id in changes if node_id is not None]
+    ancestor_roots = list(
+        dict.fromkeys(
+            [*node_ids, *(value for value in changes.values() if value is not None)]
+        )
+    )
+    if not ancestor_roots:
+        return
+    connection = connections[using]
+    sql = _BATCH_EDGES_SQL.format(
+        table=connection.ops.quote_name(NetworkNode._meta.db_table),
+        ancestor_roots=", ".join(["%s"] * len(ancestor_roots)),
+        descendant_roots=", ".join(["%s"] * len(node_ids)) or "NULL",
+        limit=_RECURSION_LIMIT,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*ancestor_roots, *node_ids])
+        parents = dict(cursor.fetchall())
+    parents.update(changes)
+
+    for node_id in parents:
+        level = 0
+        seen = {node_id}
+        current = parents[node_id]
+        while current is not None:
+            if current in seen:
+                raise ValidationError(
+                    {
+                        "supplier": "Поставщик не может быть потребителем этого узла (цикл поставок)"
+                    }
+                )
+            if current not in parents or level >= _RECURSION_LIMIT:
+                raise ValidationError({"supplier": "Цепочка поставщика повреждена"})
+            seen.add(current)
+            level += 1
+            current = parents[current]
+        if level > MAX_HIERARCHY_LEVEL:
+            raise ValidationError(
+                {
+                    "supplier": (
+                        f"Превышена глубина иерархии: допустимо не более "
+                        f"{MAX_HIERARCHY_LEVEL + 1} уровней"
+                    )
+                }
+            )
+
+
+def get_supply_chains(node_ids, using="default"):
+    """
+    Одним рекурсивным запросом получает цепочки поставщиков для набора узлов.
+
+    Args:
+        node_ids: id узлов (например, текущей страницы списка)
+
+    Returns:
+        dict[int, list[dict]]: Для каждого узла список предков (id, name,
+        node_type) от завода до непосредственного поставщика. Узлы без
+        поставщика в словарь не попадают.
+    """
+    from .models import NetworkNode
+
+    node_ids = list(dict.fromkeys(node_ids))
+    if not node_ids:
+        return {}
+    connection = connections[using]
+    sql = _SUPPLY_CHAINS_SQL.format(
+        table=connection.ops.quote_name(NetworkNode._meta.db_table),
+        placeholders=", ".join(["%s"] * len(node_ids)),
+        limit=_RECURSION_LIMIT,
+    )
+    chains = {}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, node_ids)
+        for node_id, _, ancestor_id, name, node_type in cursor.fetchall():
+            chains.setdefault(node_id, []).append(
+                {"id": ancestor_id, "name": name, "node_type": node_type}
+            )
+    for node_id, chain in chains.items():
+        # В поврежденных данных с циклом оставляем цепочку до первого повтора
+        seen = {node_id}
+        for index in range(len(chain) - 1, -1, -1):
+            if chain[index]["id"] in seen:
+                chains[node_id] = chain[index + 1 :]
+                break
+            seen.add(chain[index]["id"])
+    return chains
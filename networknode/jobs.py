@@ -0,0 +1,259 @@
+import csv
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .batching import batched_delete_nodes, batched_update
+from .db_routers import replica_reads
+from .filters import filter_nodes
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Реестр обработчиков задач: тип задачи -> функция(job, **params)
+JOB_HANDLERS = {}
+
+# Сколько кандидатов просматривать при захвате задачи
+_CLAIM_CANDIDATES = 10
+
+
+def job_handler(kind):
+    """Декоратор для регистрации обработчика фоновой задачи."""
+
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+
+    return decorator
+
+
+def enqueue(kind, params=None, user=None):
+    """
+    Ставит задачу в очередь.
+
+    Args:
+        kind: Тип задачи (ключ JOB_HANDLERS)
+        params: JSON-сериализуемые параметры обработчика
+        user: Пользователь, создавший задачу
+
+    Returns:
+        Job: Созданная задача в статусе pending
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Неизвестный тип задачи: {kind}")
+    if user is not None and not user.is_authenticated:
+        user = None
+    return Job.objects.create(kind=kind, params=params or {}, created_by=user)
+
+
+def get_worker_name():
+    """Формирует имя воркера: хост, процесс и поток."""
+
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def requeue_stale_jobs():
+    """
+    Возвращает в очередь задачи, чей воркер перестал продлевать аренду.
+
+    Задача RUNNING без heartbeat дольше JOB_LEASE_TIMEOUT секунд
+    (воркер упал или был убит) снова становится pending; после
+    JOB_MAX_ATTEMPTS запусков она помечается ошибкой, чтобы задача,
+    роняющая воркер, не выполнялась бесконечно.
+
+    Returns:
+        tuple[int, int]: Количество возвращенных в очередь и проваленных задач
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.JOB_LEASE_TIMEOUT)
+    stale = Job.objects.filter(status=Job.RUNNING).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+    failed = stale.filter(attempts__gte=settings.JOB_MAX_ATTEMPTS).update(
+        status=Job.FAILED,
+        error="Воркер перестал отвечать: истек срок аренды задачи",
+        finished_at=now,
+    )
+    requeued = stale.update(status=Job.PENDING, worker="", heartbeat_at=None)
+    if requeued or failed:
+        logger.warning(
+            "Задачи без heartbeat: возвращено в очередь %s, провалено %s",
+            requeued,
+            failed,
+        )
+    return requeued, failed
+
+
+def claim_next_job(worker=None):
+    """
+    Захватывает следующую задачу из очереди.
+
+    Захват выполняется условным UPDATE ... WHERE status='pending', поэтому
+    одну задачу не возьмут два воркера, даже без SELECT FOR UPDATE.
+    Перед захватом в очередь возвращаются задачи с истекшей арендой.
+
+    Returns:
+        Job | None: Захваченная задача или None, если очередь пуста
+    """
+    requeue_stale_jobs()
+    candidates = Job.objects.filter(status=Job.PENDING).order_by("id")
+    for job_id in candidates.values_list("id", flat=True)[:_CLAIM_CANDIDATES]:
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=job_id, status=Job.PENDING).update(
+            status=Job.RUNNING,
+            started_at=now,
+            heartbeat_at=now,
+            attempts=F("attempts") + 1,
+            worker=(worker or get_worker_name())[:100],
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def _heartbeat(job, stop_event, interval):
+    """Продлевает аренду задачи, пока обработчик не завершится."""
+
+    try:
+        while not stop_event.wait(interval):
+            Job.objects.filter(pk=job.pk, status=Job.RUNNING, worker=job.worker).update(
+                heartbeat_at=timezone.now()
+            )
+    finally:
+        connections.close_all()
+
+
+def _finish_job(job, **fields):
+    """
+    Сохраняет итог задачи, только если она все еще принадлежит воркеру.
+
+    Если аренда истекла и задачу уже забрал другой воркер, итог
+    не записывается поверх его работы.
+    """
+    for name, value in fields.items():
+        setattr(job, name, value)
+    finished = Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING, worker=job.worker
+    ).update(finished_at=timezone.now(), **fields)
+    if not finished:
+        logger.warning(
+            "Задача %s была возвращена в очередь до завершения; итог не сохранен",
+            job.pk,
+        )
+
+
+def run_job(job):
+    """
+    Выполняет захваченную задачу и сохраняет результат или ошибку.
+
+    Пока обработчик работает, отдельный поток раз в JOB_HEARTBEAT_INTERVAL
+    секунд продлевает аренду задачи.
+    """
+
+    handler = JOB_HANDLERS.get(job.kind)
+    stop_heartbeat = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat,
+        args=(job, stop_heartbeat, settings.JOB_HEARTBEAT_INTERVAL),
+        daemon=True,
+    )
+    heartbeat.start()
+    try:
+        if handler is None:
+            raise ValueError(f"Неизвестный тип задачи: {job.kind}")
+        result = handler(job, **job.params)
+    except Exception as exc:
+        logger.exception("Задача %s завершилась с ошибкой", job.pk)
+        stop_heartbeat.set()
+        heartbeat.join()
+        _finish_job(job, status=Job.FAILED, error=f"{type(exc).__name__}: {exc}")
+        return job
+
+    stop_heartbeat.set()
+    heartbeat.join()
+    _finish_job(job, status=Job.DONE, result=result)
+    return job
+
+
+def get_export_path(job):
+    """Возвращает путь к файлу выгрузки задачи."""
+
+    return Path(settings.JOB_EXPORT_DIR) / f"network-nodes-{job.pk}.csv"
+
+
+@job_handler("clear_debt")
+def clear_debt_job(
+    job, ids=None, filters=None, lookups=None, search=None, batch_size=None, sleep=None
+):
+    """Очищает задолженность у выбранных узлов пакетами по первичному ключу."""
+
+    updated = batched_update(
+        filter_nodes(ids, filters, lookups, search),
+        {"debt": 0},
+        batch_size=batch_size,
+        sleep=sleep,
+        progress=job.report_progress,
+    )
+    return {"updated": updated}
+
+
+@job_handler("delete_nodes")
+def delete_nodes_job(
+    job, ids=None, filters=None, lookups=None, search=None, batch_size=None, sleep=None
+):
+    """Удаляет выбранные узлы пакетами вместе с каскадными операциями."""
+
+    deleted = batched_delete_nodes(
+        filter_nodes(ids, filters, lookups, search),
+        batch_size=batch_size,
+        sleep=sleep,
+        progress=job.report_progress,
+    )
+    return {"deleted": deleted}
+
+
+EXPORT_FIELDS = [
+    "id",
+    "name",
+    "node_type",
+    "email",
+    "country",
+    "city",
+    "street",
+    "house_number",
+    "supplier_id",
+    "debt",
+    "created_at",
+]
+
+
+@job_handler("export_nodes")
+def export_nodes_job(job, filters=None, chunk_size=2000):
+    """Выгружает узлы сети в CSV-файл, читая с реплик."""
+
+    path = get_export_path(job)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with replica_reads():
+        queryset = filter_nodes(filters=filters).order_by("pk")
+        job.report_progress(0, queryset.count())
+        rows = 0
+        with open(path, "w", newline="", encoding="utf-8") as export_file:
+            writer = csv.writer(export_file)
+            writer.writerow(EXPORT_FIELDS)
+            for values in queryset.values_list(*EXPORT_FIELDS).iterator(
+                chunk_size=chunk_size
+            ):
+                writer.writerow(values)
+                rows += 1
+                if rows % chunk_size == 0:
+                    job.report_progress(rows)
+    job.report_progress(rows)
+    return {"rows": rows, "file": path.name}
@@ -0,0 +1,59 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from networknode.filters import filter_nodes
+
+
+class NodeSelectionCommand(BaseCommand):
+    """
+    Базовая команда для массовых операций над выборкой узлов сети.
+
+    Выборка задается теми же параметрами, что и фильтры API,
+    а операция выполняется пакетами с паузами между ними.
+    """
+
+    def add_arguments(self, parser):
+        """Добавляет аргументы выборки и пакетной обработки."""
+
+        parser.add_argument("--ids", nargs="+", type=int, help="id узлов")
+        parser.add_argument("--country", help="Фильтр по стране")
+        parser.add_argument("--city", help="Фильтр по городу")
+        parser.add_argument("--node-type", help="Фильтр по типу узла")
+        parser.add_argument(
+            "--all", action="store_true", help="Обработать все узлы сети"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Размер пакета (по умолчанию MASS_UPDATE_BATCH_SIZE)",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            help="Пауза между пакетами в секундах (по умолчанию MASS_UPDATE_SLEEP)",
+        )
+
+    def get_queryset(self, options):
+        """Строит выборку узлов по аргументам командной строки."""
+
+        filters = {
+            name: options[name]
+            for name in ("country", "city", "node_type")
+            if options[name]
+        }
+        if options["ids"] is None and not filters and not options["all"]:
+            raise CommandError("Укажите --ids, фильтры или --all")
+        try:
+            return filter_nodes(options["ids"], filters)
+        except ValidationError as exc:
+            raise CommandError(
+                "; ".join(
+                    f"{name}: {' '.join(messages)}"
+                    for name, messages in exc.message_dict.items()
+                )
+            )
+
+    def report_progress(self, done, total):
+        """Выводит прогресс обработки."""
+
+        self.stdout.write(f"Обработано {done} из {total}")
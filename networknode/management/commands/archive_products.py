@@ -0,0 +1,77 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from networknode.archive import archive_products
+from networknode.models import Product
+
+
+class Command(BaseCommand):
+    """Команда для переноса старых продуктов в архив."""
+
+    help = (
+        "Переносит продукты с release_date раньше заданной даты в таблицу "
+        "ArchivedProduct пакетами по первичному ключу"
+    )
+
+    def add_arguments(self, parser):
+        """Добавляет аргументы командной строки."""
+
+        parser.add_argument(
+            "--before",
+            type=datetime.date.fromisoformat,
+            help="Архивировать продукты, вышедшие раньше даты (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=settings.PRODUCT_ARCHIVE_AFTER_DAYS,
+            help="Архивировать продукты старше N дней (если не задан --before)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Размер пакета (по умолчанию MASS_UPDATE_BATCH_SIZE)",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            help="Пауза между пакетами в секундах (по умолчанию MASS_UPDATE_SLEEP)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать количество продуктов для архивации",
+        )
+
+    def handle(self, *args, **options):
+        """Архивирует продукты пакетами с отчетом о прогрессе."""
+
+        cutoff = options["before"]
+        if cutoff is None:
+            if options["older_than_days"] < 0:
+                raise CommandError("--older-than-days должен быть неотрицательным")
+            cutoff = timezone.localdate() - datetime.timedelta(
+                days=options["older_than_days"]
+            )
+
+        queryset = Product.objects.filter(release_date__lt=cutoff)
+        if options["dry_run"]:
+            self.stdout.write(
+                f"Будет архивировано продуктов до {cutoff}: {queryset.count()}"
+            )
+            return
+
+        archived = archive_products(
+            queryset,
+            batch_size=options["batch_size"],
+            sleep=options["sleep"],
+            progress=lambda done, total: self.stdout.write(
+                f"Обработано {done} из {total}"
+            ),
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Архивировано продуктов до {cutoff}: {archived}")
+        )
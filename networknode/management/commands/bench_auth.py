@@ -0,0 +1,110 @@
+import base64
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.request import Request
+
+from networknode.authentication import (
+    SignedTokenAuthentication,
+    clear_user_cache,
+    create_token,
+)
+
+BENCH_USERNAME = "bench-auth-user"
+BENCH_PASSWORD = "bench-auth-password"
+
+
+class Command(BaseCommand):
+    """Бенчмарк накладных расходов аутентификации на один запрос."""
+
+    help = (
+        "Сравнивает время аутентификации запроса: BasicAuthentication "
+        "(хэширование пароля), токен с холодным и с прогретым кэшем "
+        "пользователей. Временный пользователь удаляется откатом транзакции"
+    )
+
+    def add_arguments(self, parser):
+        """Добавляет аргументы командной строки."""
+
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=1000,
+            help="Количество запросов для токена",
+        )
+        parser.add_argument(
+            "--basic-iterations",
+            type=int,
+            default=20,
+            help="Количество запросов для BasicAuthentication",
+        )
+
+    def handle(self, *args, **options):
+        """Выполняет замеры и выводит медиану в микросекундах."""
+
+        if options["iterations"] < 1 or options["basic_iterations"] < 1:
+            raise CommandError("Количество запросов должно быть не меньше 1")
+
+        with transaction.atomic():
+            user = get_user_model()._default_manager.create_user(
+                username=BENCH_USERNAME, password=BENCH_PASSWORD
+            )
+            basic = base64.b64encode(f"{BENCH_USERNAME}:{BENCH_PASSWORD}".encode())
+            bearer = f"Bearer {create_token(user)}"
+            token_auth = SignedTokenAuthentication()
+
+            results = [
+                (
+                    "BasicAuthentication",
+                    self.measure(
+                        BasicAuthentication(),
+                        f"Basic {basic.decode()}",
+                        options["basic_iterations"],
+                    ),
+                ),
+                (
+                    "Токен, холодный кэш",
+                    self.measure(
+                        token_auth,
+                        bearer,
+                        options["iterations"],
+                        before=clear_user_cache,
+                    ),
+                ),
+                (
+                    "Токен, прогретый кэш",
+                    self.measure(token_auth, bearer, options["iterations"]),
+                ),
+            ]
+            transaction.set_rollback(True)
+        clear_user_cache()
+
+        for title, timings in results:
+            self.stdout.write(
+                f"{title:<22} медиана {statistics.median(timings) * 1e6:10.1f} мкс, "
+                f"среднее {statistics.mean(timings) * 1e6:10.1f} мкс "
+                f"({len(timings)} запросов)"
+            )
+
+    def measure(self, authenticator, header, iterations, before=None):
+        """Возвращает длительность authenticate() для каждого запроса."""
+
+        factory = RequestFactory()
+        timings = []
+        for _ in range(iterations):
+            request = Request(factory.get("/api/", HTTP_AUTHORIZATION=header))
+            if before:
+                before()
+            started = time.perf_counter()
+            result = authenticator.authenticate(request)
+            timings.append(time.perf_counter() - started)
+            if result is None:
+                raise CommandError(
+                    f"{type(authenticator).__name__}: не аутентифицирован"
+                )
+        return timings
@@ -0,0 +1,140 @@
+import gc
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from networknode.models import NetworkNode
+from networknode.snapshot import SNAPSHOT_FIELDS, NodeSnapshot, _load
+
+# Размер выборки для замера памяти объектов моделей (экстраполируется)
+MODEL_SAMPLE = 20000
+
+
+def generate_rows(count, seed=0):
+    """
+    Генерирует синтетические строки узлов, упорядоченные по id.
+
+    Около 1000 городов в 50 странах, уровни иерархии 0-2.
+    """
+    rng = random.Random(seed)
+    node_types = [code for code, _ in NetworkNode.NODE_TYPES]
+    for node_id in range(1, count + 1):
+        supplier_id = rng.randrange(1, node_id) if node_id > 1 and node_id % 3 else None
+        city = rng.randrange(1000)
+        yield (
+            node_id,
+            f"Торговая сеть {node_id}",
+            node_types[node_id % len(node_types)],
+            supplier_id,
+            f"Город {city}",
+            f"Страна {city % 50}",
+        )
+
+
+def traced(build):
+    """Возвращает результат build() и прирост выделенной памяти в байтах."""
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        return result, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+class Command(BaseCommand):
+    """Бенчмарк памяти и скорости снимка узлов NodeSnapshot."""
+
+    help = (
+        "Измеряет память снимка узлов (колоночные массивы) на синтетических "
+        "данных или на текущей таблице узлов и сравнивает ее с объектами "
+        "моделей; выводит байты на узел и на миллион узлов"
+    )
+
+    def add_arguments(self, parser):
+        """Добавляет аргументы командной строки."""
+
+        parser.add_argument(
+            "--nodes",
+            type=int,
+            default=1_000_000,
+            help="Количество синтетических узлов",
+        )
+        parser.add_argument(
+            "--from-db",
+            action="store_true",
+            help="Загрузить снимок из БД вместо синтетических данных",
+        )
+        parser.add_argument(
+            "--lookups",
+            type=int,
+            default=100_000,
+            help="Количество чтений для замера скорости",
+        )
+
+    def handle(self, *args, **options):
+        """Выполняет замеры и выводит отчет."""
+
+        if options["nodes"] < 1 or options["lookups"] < 1:
+            raise CommandError("Количество узлов и чтений должно быть не меньше 1")
+
+        def build():
+            snapshot = NodeSnapshot(node_types=NetworkNode.NODE_TYPES)
+            if options["from_db"]:
+                _load(snapshot)
+            else:
+                snapshot.load(generate_rows(options["nodes"]))
+            return snapshot
+
+        # Время загрузки замеряется без tracemalloc, который ее сильно замедляет
+        started = time.perf_counter()
+        build()
+        load_seconds = time.perf_counter() - started
+        snapshot, traced_bytes = traced(build)
+        count = len(snapshot)
+        if not count:
+            raise CommandError("Снимок пуст: нет узлов для замера")
+
+        self.stdout.write(f"Узлов: {count}, загрузка {load_seconds:.2f} с")
+        usage = snapshot.memory_usage()
+        for name, size in sorted(usage.items(), key=lambda item: -item[1]):
+            self.stdout.write(f"  {name:<14} {size / 2**20:10.2f} МБ")
+        self.report("Снимок (tracemalloc)", traced_bytes, count)
+
+        sample = min(count, MODEL_SAMPLE)
+        _, tuples_bytes = traced(lambda: list(generate_rows(sample)))
+        self.report("Кортежи values_list", tuples_bytes, sample)
+        _, models_bytes = traced(
+            lambda: [
+                NetworkNode.from_db("default", SNAPSHOT_FIELDS, row)
+                for row in generate_rows(sample)
+            ]
+        )
+        self.report("Объекты моделей", models_bytes, sample)
+
+        ids = [random.randint(1, count) for _ in range(options["lookups"])]
+        for title, lookup in [
+            ("get_name", snapshot.get_name),
+            ("get_hierarchy_level", snapshot.get_hierarchy_level),
+        ]:
+            started = time.perf_counter()
+            for node_id in ids:
+                lookup(node_id)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{title:<22} {elapsed / len(ids) * 1e6:8.2f} мкс на чтение"
+            )
+
+    def report(self, title, size, count):
+        """Выводит объем памяти, байты на узел и оценку на миллион узлов."""
+
+        per_node = size / count
+        self.stdout.write(
+            f"{title:<22} {size / 2**20:10.2f} МБ, {per_node:7.1f} байт на узел, "
+            f"{per_node * 1_000_000 / 2**20:8.1f} МБ на миллион узлов"
+        )
@@ -0,0 +1,54 @@
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+
+from networknode.startup_profile import measure_first_response
+
+METRICS = [
+    ("load", "загрузка приложения"),
+    ("first_request", "первый запрос"),
+    ("time_to_first_response", "до первого ответа"),
+    ("second_request", "второй запрос"),
+]
+
+
+class Command(BaseCommand):
+    """Бенчмарк времени до первого ответа WSGI-приложения."""
+
+    help = (
+        "Запускает новые процессы, загружает config.wsgi и выполняет запрос, "
+        "сравнивая время до первого ответа с прогревом и без него"
+    )
+
+    def add_arguments(self, parser):
+        """Добавляет аргументы командной строки."""
+
+        parser.add_argument(
+            "--runs", type=int, default=5, help="Количество запусков на вариант"
+        )
+        parser.add_argument(
+            "--path", default="/api/network-nodes/", help="Путь первого запроса"
+        )
+
+    def handle(self, *args, **options):
+        """Выполняет замеры и выводит медианы в миллисекундах."""
+
+        if options["runs"] < 1:
+            raise CommandError("--runs должен быть не меньше 1")
+
+        for warmup in (False, True):
+            try:
+                runs = [
+                    measure_first_response(options["path"], warmup=warmup)
+                    for _ in range(options["runs"])
+                ]
+            except RuntimeError as exc:
+                raise CommandError(f"Ошибка запуска приложения: {exc}")
+            title = "с прогревом" if warmup else "без прогрева"
+            self.stdout.write(
+                f"{title} (GET {options['path']} -> {runs[0]['status']}, "
+                f"медиана из {len(runs)}):"
+            )
+            for key, label in METRICS:
+                median = statistics.median(run[key] for run in runs)
+                self.stdout.write(f"  {label:<22} {median * 1000:8.1f} мс")
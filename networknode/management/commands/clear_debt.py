@@ -0,0 +1,23 @@
+from networknode.batching import batched_update
+
+from ._selection import NodeSelectionCommand
+
+
+class Command(NodeSelectionCommand):
+    """Команда для пакетной очистки задолженности."""
+
+    help = "Очищает задолженность у выбранных узлов пакетами по первичному ключу"
+
+    def handle(self, *args, **options):
+        """Очищает задолженность пакетами с паузами между ними."""
+
+        updated = batched_update(
+            self.get_queryset(options),
+            {"debt": 0},
+            batch_size=options["batch_size"],
+            sleep=options["sleep"],
+            progress=self.report_progress,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Задолженность очищена для {updated} объектов")
+        )
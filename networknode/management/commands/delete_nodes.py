@@ -0,0 +1,38 @@
+from networknode.batching import batched_delete_nodes
+
+from ._selection import NodeSelectionCommand
+
+
+class Command(NodeSelectionCommand):
+    """Команда для пакетного удаления узлов сети."""
+
+    help = (
+        "Удаляет выбранные узлы пакетами: зависимые узлы отвязываются, "
+        "продукты удаляются короткими транзакциями"
+    )
+
+    def add_arguments(self, parser):
+        """Добавляет аргумент пробного запуска."""
+
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать количество узлов для удаления",
+        )
+
+    def handle(self, *args, **options):
+        """Удаляет узлы пакетами с паузами между ними."""
+
+        queryset = self.get_queryset(options)
+        if options["dry_run"]:
+            self.stdout.write(f"Будет удалено узлов: {queryset.count()}")
+            return
+
+        deleted = batched_delete_nodes(
+            queryset,
+            batch_size=options["batch_size"],
+            sleep=options["sleep"],
+            progress=self.report_progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Удалено узлов: {deleted}"))
@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from networknode.webhooks import deliver_pending
+
+
+class Command(BaseCommand):
+    """Команда для доставки событий изменений во внешние webhooks."""
+
+    help = "Отправляет события ChangeEvent зарегистрированным webhooks пакетами"
+
+    def add_arguments(self, parser):
+        """Добавляет аргументы командной строки."""
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=getattr(settings, "WEBHOOK_BATCH_SIZE", 500),
+            help="Количество событий в одном POST-запросе",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=getattr(settings, "WEBHOOK_POLL_INTERVAL", 2.0),
+            help="Пауза между проверками новых событий (секунды)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Доставить накопившиеся события и завершиться",
+        )
+
+    def handle(self, *args, **options):
+        """Доставляет события в цикле или однократно."""
+
+        while True:
+            delivered = deliver_pending(batch_size=options["batch_size"])
+            if delivered:
+                self.stdout.write(f"Доставлено событий: {delivered}")
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from networknode.startup_profile import profile_imports, summarize_by_package
+
+
+class Command(BaseCommand):
+    """Команда для отчета о времени импорта при запуске (python -X importtime)."""
+
+    help = (
+        "Запускает новый процесс с python -X importtime и выводит самые "
+        "медленные импорты при загрузке WSGI/ASGI, django.setup() или команды"
+    )
+
+    def add_arguments(self, parser):
+        """Добавляет аргументы командной строки."""
+
+        parser.add_argument(
+            "--target",
+            default="wsgi",
+            help=(
+                "Что загружать: wsgi, asgi, setup или command:<имя> "
+                "(например command:run_workers)"
+            ),
+        )
+        parser.add_argument(
+            "--limit", type=int, default=20, help="Количество строк отчета"
+        )
+        parser.add_argument(
+            "--sort",
+            choices=["cumulative", "self"],
+            default="cumulative",
+            help="Сортировка модулей: по суммарному или собственному времени",
+        )
+        parser.add_argument(
+            "--by-package",
+            action="store_true",
+            help="Суммировать собственное время по пакетам верхнего уровня",
+        )
+
+    def handle(self, *args, **options):
+        """Профилирует запуск и выводит отчет."""
+
+        target = options["target"]
+        if target not in ("wsgi", "asgi", "setup") and not target.startswith(
+            "command:"
+        ):
+            raise CommandError(
+                "--target: ожидается wsgi, asgi, setup или command:<имя>"
+            )
+        try:
+            rows = profile_imports(target)
+        except RuntimeError as exc:
+            raise CommandError(f"Ошибка загрузки {target}: {exc}")
+
+        total = sum(own for _, own, _, _ in rows)
+        self.stdout.write(
+            f"{target}: импортировано модулей {len(rows)}, всего {total / 1000:.1f} мс"
+        )
+        if options["by_package"]:
+            for package, own in summarize_by_package(rows)[: options["limit"]]:
+                self.stdout.write(f"{own / 1000:10.1f} мс  {package}")
+            return
+
+        column = 2 if options["sort"] == "cumulative" else 1
+        rows = sorted(rows, key=lambda row: row[column], reverse=True)
+        self.stdout.write(f"{'self, мс':>10} {'cumul, мс':>10}  модуль")
+        for module, own, cumulative, _ in rows[: options["limit"]]:
+            self.stdout.write(f"{own / 1000:10.1f} {cumulative / 1000:10.1f}  {module}")
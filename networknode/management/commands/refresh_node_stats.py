@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from networknode.stats import rebuild_node_stats
+
+
+class Command(BaseCommand):
+    """Команда для полного пересчета сводной статистики NodeStats."""
+
+    help = (
+        "Пересчитывает сводную таблицу NodeStats по всем узлам и продуктам "
+        "(первичное заполнение и исправление расхождений)"
+    )
+
+    def handle(self, *args, **options):
+        """Пересчитывает статистику и выводит количество групп."""
+
+        groups = rebuild_node_stats()
+        self.stdout.write(
+            self.style.SUCCESS(f"Статистика пересчитана, групп: {groups}")
+        )
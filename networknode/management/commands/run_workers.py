@@ -0,0 +1,134 @@
+import multiprocessing
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from networknode.jobs import claim_next_job, get_worker_name, run_job
+
+
+class Command(BaseCommand):
+    """Команда для запуска воркеров фоновых задач из таблицы Job."""
+
+    help = "Запускает пул воркеров, выполняющих фоновые задачи из БД"
+
+    def add_arguments(self, parser):
+        """Добавляет аргументы командной строки."""
+
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=getattr(settings, "JOB_WORKER_THREADS", 1),
+            help="Количество потоков в каждом процессе",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=getattr(settings, "JOB_WORKER_PROCESSES", 1),
+            help="Количество процессов воркеров",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=getattr(settings, "JOB_POLL_INTERVAL", 1.0),
+            help="Пауза между опросами пустой очереди (секунды)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Выполнить задачи из очереди и завершиться",
+        )
+
+    def handle(self, *args, **options):
+        """Запускает воркеры в заданном количестве процессов и потоков."""
+
+        processes = max(1, options["processes"])
+        threads = max(1, options["threads"])
+        self.stdout.write(f"Запуск воркеров: процессов {processes}, потоков {threads}")
+        if processes == 1:
+            processed = run_pool(threads, options["poll_interval"], options["once"])
+            self.stdout.write(self.style.SUCCESS(f"Выполнено задач: {processed}"))
+            return
+
+        # Соединения с БД нельзя разделять между процессами после fork
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(
+                target=run_pool,
+                args=(threads, options["poll_interval"], options["once"]),
+            )
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+
+
+def run_worker(stop_event, poll_interval, once, processed, own_thread=True):
+    """
+    Цикл одного воркера: захват и выполнение задач до остановки.
+
+    Воркер в отдельном потоке сам управляет своими соединениями с БД;
+    при запуске в текущем потоке (own_thread=False) соединения не трогаются.
+    """
+
+    worker = get_worker_name()
+    try:
+        while not stop_event.is_set():
+            if own_thread:
+                close_old_connections()
+            job = claim_next_job(worker)
+            if job is None:
+                if once:
+                    break
+                stop_event.wait(poll_interval)
+                continue
+            run_job(job)
+            processed.append(job.pk)
+    finally:
+        if own_thread:
+            connections.close_all()
+
+
+def run_pool(threads, poll_interval, once=False):
+    """
+    Запускает пул потоков-воркеров в текущем процессе.
+
+    Returns:
+        int: Количество выполненных задач
+    """
+    stop_event = threading.Event()
+    processed = []
+    if threads == 1:
+        # Без отдельного потока: удобно для cron и тестов
+        try:
+            run_worker(stop_event, poll_interval, once, processed, own_thread=False)
+        except KeyboardInterrupt:
+            pass
+        return len(processed)
+
+    pool = [
+        threading.Thread(
+            target=run_worker,
+            args=(stop_event, poll_interval, once, processed),
+            daemon=True,
+        )
+        for _ in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in pool):
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        stop_event.set()
+        for thread in pool:
+            thread.join()
+    return len(processed)
@@ -0,0 +1,28 @@
+from rest_framework import permissions
+
+from .db_routers import pin_to_primary
+
+
+class PrimaryPinMiddleware:
+    """
+    Middleware для read-your-writes после изменяющих запросов.
+
+    После успешного небезопасного запроса (POST, PUT, PATCH, DELETE),
+    в том числе из админки, пользователь на короткое время привязывается
+    к основной БД, чтобы не прочитать устаревшие данные с реплики
+    (подписанная cookie primary_pin, см. pin_to_primary). Запросы,
+    помеченные mark_read_only, не привязывают пользователя.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            request.method not in permissions.SAFE_METHODS
+            and not getattr(request, "read_only", False)
+            and response.status_code < 400
+        ):
+            pin_to_primary(request, response)
+        return response
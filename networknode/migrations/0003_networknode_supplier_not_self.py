@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "networknode",
+            "0002_alter_networknode_options_alter_networknode_supplier_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="networknode",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("supplier", models.F("id")), _negated=True),
+                name="networknode_supplier_not_self",
+            ),
+        ),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:21
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("networknode", "0004_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model", models.CharField(max_length=50, verbose_name="Модель")),
+                ("object_id", models.BigIntegerField(verbose_name="ID объекта")),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("create", "Создание"),
+                            ("update", "Изменение"),
+                            ("delete", "Удаление"),
+                        ],
+                        max_length=10,
+                        verbose_name="Действие",
+                    ),
+                ),
+                (
+                    "payload",
+                    models.JSONField(
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                        null=True,
+                        verbose_name="Состояние объекта",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Время события"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Событие изменения",
+                "verbose_name_plural": "События изменений",
+                "ordering": ["id"],
+            },
+        ),
+        migrations.CreateModel(
+            name="Webhook",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("url", models.URLField(verbose_name="URL")),
+                (
+                    "secret",
+                    models.CharField(
+                        blank=True,
+                        max_length=255,
+                        verbose_name="Секрет для подписи HMAC",
+                    ),
+                ),
+                (
+                    "is_active",
+                    models.BooleanField(default=True, verbose_name="Активен"),
+                ),
+                (
+                    "last_event_id",
+                    models.BigIntegerField(
+                        default=0, verbose_name="Последнее доставленное событие"
+                    ),
+                ),
+                (
+                    "last_delivered_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Время последней доставки"
+                    ),
+                ),
+                (
+                    "last_error",
+                    models.TextField(blank=True, verbose_name="Последняя ошибка"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Время создания"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Webhook",
+                "verbose_name_plural": "Webhooks",
+            },
+        ),
+    ]
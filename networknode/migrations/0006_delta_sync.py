@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("networknode", "0005_changeevent_webhook"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NodeTombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "node_id",
+                    models.BigIntegerField(unique=True, verbose_name="ID узла"),
+                ),
+                (
+                    "deleted_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="Время удаления"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Удаленный узел",
+                "verbose_name_plural": "Удаленные узлы",
+            },
+        ),
+        migrations.AddField(
+            model_name="networknode",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="Время изменения"),
+        ),
+        migrations.AddIndex(
+            model_name="networknode",
+            index=models.Index(
+                fields=["updated_at", "id"], name="networknode_updated_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="nodetombstone",
+            index=models.Index(
+                fields=["deleted_at", "node_id"], name="nodetombstone_deleted_idx"
+            ),
+        ),
+    ]
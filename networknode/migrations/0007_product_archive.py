@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("networknode", "0006_delta_sync"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="product",
+            name="release_date",
+            field=models.DateField(db_index=True, verbose_name="Дата выхода на рынок"),
+        ),
+        migrations.CreateModel(
+            name="ArchivedProduct",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "original_id",
+                    models.BigIntegerField(unique=True, verbose_name="ID продукта"),
+                ),
+                ("name", models.CharField(max_length=255, verbose_name="Название")),
+                ("model", models.CharField(max_length=255, verbose_name="Модель")),
+                (
+                    "release_date",
+                    models.DateField(
+                        db_index=True, verbose_name="Дата выхода на рынок"
+                    ),
+                ),
+                (
+                    "archived_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Время архивации"
+                    ),
+                ),
+                (
+                    "network_node",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_products",
+                        to="networknode.networknode",
+                        verbose_name="Звено сети",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Архивный продукт",
+                "verbose_name_plural": "Архивные продукты",
+                "ordering": ["-release_date"],
+            },
+        ),
+    ]
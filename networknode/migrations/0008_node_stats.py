@@ -0,0 +1,107 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:32
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_node_stats(apps, schema_editor):
+    """Заполняет сводную таблицу по уже существующим узлам и продуктам."""
+
+    NetworkNode = apps.get_model("networknode", "NetworkNode")
+    NodeStats = apps.get_model("networknode", "NodeStats")
+    Product = apps.get_model("networknode", "Product")
+    using = schema_editor.connection.alias
+    group = ["country", "city", "node_type"]
+
+    stats = {
+        tuple(row[field] for field in group): NodeStats(
+            **{field: row[field] for field in group},
+            node_count=row["node_count"],
+            total_debt=row["total_debt"] or 0,
+        )
+        for row in NetworkNode.objects.using(using)
+        .values(*group)
+        .annotate(node_count=Count("pk"), total_debt=Sum("debt"))
+        .order_by()
+    }
+    products = (
+        Product.objects.using(using)
+        .values(*[f"network_node__{field}" for field in group])
+        .annotate(product_count=Count("pk"))
+        .order_by()
+    )
+    for row in products:
+        key = tuple(row[f"network_node__{field}"] for field in group)
+        stats[key].product_count = row["product_count"]
+    NodeStats.objects.using(using).bulk_create(stats.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("networknode", "0007_product_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NodeStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("country", models.CharField(max_length=100, verbose_name="Страна")),
+                ("city", models.CharField(max_length=100, verbose_name="Город")),
+                (
+                    "node_type",
+                    models.CharField(
+                        choices=[
+                            ("factory", "Завод"),
+                            ("retail", "Розничная сеть"),
+                            ("entrepreneur", "Индивидуальный предприниматель"),
+                        ],
+                        max_length=20,
+                        verbose_name="Тип звена",
+                    ),
+                ),
+                (
+                    "node_count",
+                    models.IntegerField(default=0, verbose_name="Количество узлов"),
+                ),
+                (
+                    "product_count",
+                    models.IntegerField(default=0, verbose_name="Количество продуктов"),
+                ),
+                (
+                    "total_debt",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=20,
+                        verbose_name="Суммарная задолженность",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Время изменения"),
+                ),
+            ],
+            options={
+                "verbose_name": "Статистика по региону",
+                "verbose_name_plural": "Статистика по регионам",
+                "ordering": ["country", "city", "node_type"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("country", "city", "node_type"),
+                        name="nodestats_group_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_node_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("networknode", "0009_job_lease"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="changeevent",
+            name="action",
+            field=models.CharField(
+                choices=[
+                    ("create", "Создание"),
+                    ("update", "Изменение"),
+                    ("delete", "Удаление"),
+                    ("archive", "Перенос в архив"),
+                    ("restore", "Восстановление из архива"),
+                ],
+                max_length=10,
+                verbose_name="Действие",
+            ),
+        ),
+    ]
@@ -1,9 +1,184 @@
-from django.db import models
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, router, transaction
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 from decimal import Decimal
+from .changes import (
+    DELETE,
+    ChangeTrackedModel,
+    ChangeTrackedQuerySet,
+    get_archive_action,
+    record_changes,
+)
+from .hierarchy import lock_hierarchy, validate_supplier, validate_supplier_changes
+from .stats import (
+    GROUP_FIELDS,
+    STATS_FIELDS,
+    add_delta,
+    apply_deltas,
+    get_node_keys,
+    node_key,
+    node_totals,
+    product_totals,
+    subtract,
+    track_node_changes,
+    track_product_changes,
+)
+
+# Признак того, что выражение для supplier в update() построено bulk_update()
+# после проверки всех объектов набора
+_bulk_update_validated = ContextVar("bulk_update_validated", default=False)
+
+
+class NetworkNodeQuerySet(ChangeTrackedQuerySet):
+    """
+    QuerySet узлов сети с проверкой иерархии при массовых изменениях.
+
+    Массовые изменения полей географии, типа и задолженности
+    переносятся в сводную таблицу NodeStats в той же транзакции.
+    """
+
+    def update(self, **kwargs):
+        """Массовое обновление с проверкой поставщика и обновлением NodeStats."""
+
+        if STATS_FIELDS.isdisjoint(kwargs):
+            return self._update_checked(kwargs)
+
+        with transaction.atomic(using=self.db):
+            return track_node_changes(
+                self,
+                list(self.values_list("pk", flat=True)),
+                lambda: self._update_checked(kwargs),
+                with_products=not set(GROUP_FIELDS).isdisjoint(kwargs),
+            )
+
+    def _update_checked(self, kwargs):
+        """
+        Массовое обновление с проверкой смены поставщика.
+
+        Если меняется supplier, все затрагиваемые узлы проверяются вместе
+        на циклы и глубину иерархии под блокировкой иерархии. Выражение
+        (Case), которое строит bulk_update(), не проверяется повторно:
+        объекты уже проверены в _bulk_update_checked.
+        """
+        supplier = kwargs.get("supplier", kwargs.get("supplier_id"))
+        if hasattr(supplier, "resolve_expression"):
+            if _bulk_update_validated.get():
+                return super().update(**kwargs)
+            raise ValueError(
+                "Смена поставщика выражением не проверяется; используйте "
+                "bulk_update() или конкретное значение"
+            )
+        supplier_id = getattr(supplier, "pk", supplier)
+        if supplier_id is None:
+            # Отвязка от поставщика не может создать цикл или углубить иерархию
+            return super().update(**kwargs)
+
+        with transaction.atomic(using=self.db):
+            lock_hierarchy(self.db)
+            validate_supplier_changes(
+                {node_id: supplier_id for node_id in self.values_list("pk", flat=True)},
+                using=self.db,
+            )
+            return super().update(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Массовое создание с проверкой глубины иерархии."""
+
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            lock_hierarchy(self.db)
+            for obj in objs:
+                validate_supplier(obj.pk, obj.supplier_id, using=self.db)
+            created = super().bulk_create(objs, *args, **kwargs)
+            deltas = {}
+            for obj in objs:
+                add_delta(deltas, node_key(obj), nodes=1, debt=obj.debt)
+            apply_deltas(deltas, self.db)
+            return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        """Массовое обновление объектов с проверкой смены поставщика."""
+
+        objs = list(objs)
+        if STATS_FIELDS.isdisjoint(fields):
+            return self._bulk_update_checked(objs, fields, *args, **kwargs)
+
+        with transaction.atomic(using=self.db):
+            return track_node_changes(
+                self,
+                [obj.pk for obj in objs],
+                lambda: self._bulk_update_checked(objs, fields, *args, **kwargs),
+                with_products=not set(GROUP_FIELDS).isdisjoint(fields),
+            )
+
+    def _bulk_update_checked(self, objs, fields, *args, **kwargs):
+        """
+        Массовое обновление объектов с проверкой смены поставщика.
+
+        Новые поставщики всех объектов проверяются одним набором, поэтому
+        учитываются и изменения внутри него (например, A -> B и B -> A).
+        """
+
+        if "supplier" not in fields and "supplier_id" not in fields:
+            return super().bulk_update(objs, fields, *args, **kwargs)
 
+        with transaction.atomic(using=self.db):
+            lock_hierarchy(self.db)
+            validate_supplier_changes(
+                {obj.pk: obj.supplier_id for obj in objs}, using=self.db
+            )
+            token = _bulk_update_validated.set(True)
+            try:
+                return super().bulk_update(objs, fields, *args, **kwargs)
+            finally:
+                _bulk_update_validated.reset(token)
 
-class NetworkNode(models.Model):
+    def bulk_delete(self):
+        """
+        Удаляет узлы одним DELETE без посигнальной обработки.
+
+        События delete, отметки NodeTombstone и NodeStats записываются
+        здесь же запросами, число которых не зависит от числа узлов.
+        Узлы не должны иметь продуктов и потребителей: их сначала
+        удаляет и отвязывает batched_delete_nodes.
+
+        Returns:
+            int: Количество удаленных узлов
+        """
+        with transaction.atomic(using=self.db):
+            nodes = list(self)
+            if not nodes:
+                return 0
+            pks = [node.pk for node in nodes]
+            related = [
+                NetworkNode._base_manager.filter(supplier_id__in=pks),
+                Product._base_manager.filter(network_node_id__in=pks),
+                ArchivedProduct._base_manager.filter(network_node_id__in=pks),
+            ]
+            if any(queryset.using(self.db).exists() for queryset in related):
+                raise ValueError(
+                    "У узлов есть продукты или потребители; "
+                    "используйте batched_delete_nodes"
+                )
+            rows = NetworkNode._base_manager.using(self.db).filter(pk__in=pks)
+            apply_deltas(subtract({}, node_totals(rows, with_products=False)), self.db)
+            deleted = rows._raw_delete(self.db)
+            record_changes(nodes, DELETE, self.db)
+            now = timezone.now()
+            NodeTombstone.objects.using(self.db).bulk_create(
+                [NodeTombstone(node_id=pk, deleted_at=now) for pk in pks],
+                update_conflicts=True,
+                unique_fields=["node_id"],
+                update_fields=["deleted_at"],
+            )
+        return deleted
+
+
+class NetworkNode(ChangeTrackedModel):
     """Модель для представления звена сети электроники."""
 
     NODE_TYPES = [
@@ -46,37 +221,217 @@ class NetworkNode(models.Model):
     # Время создания
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Время создания")
 
+    # Время последнего изменения (для дельта-синхронизации)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Время изменения")
+
+    objects = NetworkNodeQuerySet.as_manager()
+
     class Meta:
         """Мета-класс для настроек модели."""
 
         verbose_name = "Звено сети"
         verbose_name_plural = "Звенья сети"
         ordering = ["-created_at"]
+        constraints = [
+            models.CheckConstraint(
+                condition=~models.Q(supplier=models.F("id")),
+                name="networknode_supplier_not_self",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["updated_at", "id"], name="networknode_updated_idx"),
+        ]
 
     def __str__(self):
         """Строковое представление объекта."""
 
         return f"{self.get_node_type_display()}: {self.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает исходного поставщика для отслеживания его смены."""
+
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_supplier_id = instance.__dict__.get("supplier_id")
+        return instance
+
+    def supplier_changed(self):
+        """Проверяет, изменился ли поставщик с момента загрузки из БД."""
+
+        if self._state.adding:
+            return self.supplier_id is not None
+        return self.supplier_id != getattr(self, "_loaded_supplier_id", None)
+
+    def clean(self):
+        """Проверяет отсутствие циклов и глубину иерархии (админка, формы)."""
+
+        super().clean()
+        if self.supplier_changed():
+            validate_supplier(self.pk, self.supplier_id)
+
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет узел, проверяя смену поставщика под блокировкой иерархии.
+
+        Повторная проверка внутри транзакции защищает от гонок, когда
+        два параллельных запроса по отдельности допустимы, но вместе
+        образуют цикл.
+        """
+        if not self.supplier_changed():
+            super().save(*args, **kwargs)
+            return
+
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            lock_hierarchy(using)
+            validate_supplier(self.pk, self.supplier_id, using=using)
+            super().save(*args, **kwargs)
+        self._loaded_supplier_id = self.supplier_id
+
     @property
     def hierarchy_level(self):
         """
         Вычисляет уровень иерархии звена в сети.
 
+        Обход итеративный и защищен от циклов, поэтому поврежденные
+        данные не приводят к RecursionError.
+
         Returns:
             int: Уровень иерархии (0 для завода, 1+ для остальных)
         """
-        if self.supplier is None:
-            return 0
-        return self.supplier.hierarchy_level + 1
+        level = 0
+        node = self
+        seen = {self.pk}
+        while node.supplier_id is not None:
+            node = node.supplier
+            if node.pk in seen:
+                break
+            seen.add(node.pk)
+            level += 1
+        return level
+
+
+def touch_nodes(node_ids, using="default"):
+    """
+    Обновляет updated_at узлов, продукты которых изменились.
+
+    Продукты входят в представление узла в API, поэтому клиенты
+    дельта-синхронизации (?modified_since=) должны получить узел повторно.
+    """
+    node_ids = {node_id for node_id in node_ids if node_id is not None}
+    if node_ids:
+        NetworkNode._base_manager.using(using).filter(pk__in=node_ids).update(
+            updated_at=timezone.now()
+        )
+
+
+class ProductQuerySet(ChangeTrackedQuerySet):
+    """
+    QuerySet продуктов, обновляющий NodeStats при массовых изменениях.
+
+    Массовые операции не вызывают сигналы, поэтому updated_at узлов
+    (старых и новых владельцев продуктов) обновляется здесь же, в той же
+    транзакции, как это делает сигнал touch_product_node для одной строки.
+    """
+
+    def _node_ids(self, pks):
+        """Возвращает id узлов, которым принадлежат продукты с данными pk."""
+
+        return set(
+            self.model._base_manager.using(self.db)
+            .filter(pk__in=pks)
+            .values_list("network_node_id", flat=True)
+        )
+
+    def update(self, **kwargs):
+        """Массовое обновление с переносом продуктов между группами NodeStats."""
+
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list("pk", flat=True))
+            node_ids = self._node_ids(pks)
+            if "network_node" not in kwargs and "network_node_id" not in kwargs:
+                updated = super().update(**kwargs)
+            else:
+                updated = track_product_changes(
+                    self,
+                    pks,
+                    lambda: super(ProductQuerySet, self).update(**kwargs),
+                )
+                node_ids |= self._node_ids(pks)
+            touch_nodes(node_ids, self.db)
+            return updated
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Массовое создание с увеличением счетчиков продуктов NodeStats."""
+
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            touch_nodes({obj.network_node_id for obj in objs}, self.db)
+            if get_archive_action():
+                # Восстановленные продукты уже учтены как архивные
+                return created
+            keys = get_node_keys([obj.network_node_id for obj in objs], self.db)
+            deltas = {}
+            for obj in objs:
+                add_delta(deltas, keys[obj.network_node_id], products=1)
+            apply_deltas(deltas, self.db)
+            return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        """Массовое обновление объектов с обновлением NodeStats."""
+
+        objs = list(objs)
+        pks = [obj.pk for obj in objs]
+        with transaction.atomic(using=self.db):
+            node_ids = self._node_ids(pks)
+            if "network_node" not in fields and "network_node_id" not in fields:
+                updated = super().bulk_update(objs, fields, *args, **kwargs)
+            else:
+                updated = track_product_changes(
+                    self,
+                    pks,
+                    lambda: super(ProductQuerySet, self).bulk_update(
+                        objs, fields, *args, **kwargs
+                    ),
+                )
+                node_ids |= {obj.network_node_id for obj in objs}
+            touch_nodes(node_ids, self.db)
+            return updated
+
+    def bulk_delete(self):
+        """
+        Удаляет продукты одним DELETE без посигнальной обработки.
+
+        События delete, NodeStats и updated_at узлов обновляются здесь же
+        запросами, число которых не зависит от числа продуктов (сигналы
+        post_delete выполнили бы их для каждой строки). В блоке
+        archive_action NodeStats не меняется.
+
+        Returns:
+            int: Количество удаленных продуктов
+        """
+        with transaction.atomic(using=self.db):
+            products = list(self)
+            if not products:
+                return 0
+            rows = self.model._base_manager.using(self.db).filter(
+                pk__in=[product.pk for product in products]
+            )
+            if not get_archive_action():
+                apply_deltas(subtract({}, product_totals(rows)), self.db)
+            deleted = rows._raw_delete(self.db)
+            record_changes(products, DELETE, self.db)
+            touch_nodes({product.network_node_id for product in products}, self.db)
+        return deleted
 
 
-class Product(models.Model):
+class Product(ChangeTrackedModel):
     """Модель для представления продукта в сети."""
 
     name = models.CharField(max_length=255, verbose_name="Название")
     model = models.CharField(max_length=255, verbose_name="Модель")
-    release_date = models.DateField(verbose_name="Дата выхода на рынок")
+    release_date = models.DateField(db_index=True, verbose_name="Дата выхода на рынок")
 
     # Связь с узлом сети
     network_node = models.ForeignKey(
@@ -86,6 +441,8 @@ class Product(models.Model):
         verbose_name="Звено сети",
     )
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         """Мета-класс для настроек модели."""
 
@@ -96,3 +453,270 @@ class Product(models.Model):
         """Строковое представление объекта."""
 
         return f"{self.name} ({self.model})"
+
+
+class Job(models.Model):
+    """Модель фоновой задачи для тяжелых операций с узлами сети."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = [
+        (PENDING, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Выполнена"),
+        (FAILED, "Ошибка"),
+    ]
+
+    kind = models.CharField(max_length=50, verbose_name="Тип задачи")
+    params = models.JSONField(default=dict, blank=True, verbose_name="Параметры")
+    status = models.CharField(
+        max_length=20, choices=STATUSES, default=PENDING, verbose_name="Статус"
+    )
+    progress_done = models.PositiveBigIntegerField(default=0, verbose_name="Выполнено")
+    progress_total = models.PositiveBigIntegerField(default=0, verbose_name="Всего")
+    result = models.JSONField(null=True, blank=True, verbose_name="Результат")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    worker = models.CharField(max_length=100, blank=True, verbose_name="Воркер")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток запуска")
+    heartbeat_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Последний сигнал воркера"
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="networknode_jobs",
+        verbose_name="Автор",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Время создания")
+    started_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Время запуска"
+    )
+    finished_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Время завершения"
+    )
+
+    class Meta:
+        """Мета-класс для настроек модели."""
+
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "id"])]
+
+    def __str__(self):
+        """Строковое представление объекта."""
+
+        return f"{self.kind} #{self.pk} ({self.get_status_display()})"
+
+    def report_progress(self, done, total=None):
+        """
+        Сохраняет прогресс выполнения задачи без перезаписи остальных полей.
+
+        Заодно продлевает аренду задачи воркером (heartbeat_at).
+        """
+
+        self.progress_done = done
+        fields = {"progress_done": done, "heartbeat_at": timezone.now()}
+        if total is not None:
+            self.progress_total = total
+            fields["progress_total"] = total
+        Job.objects.filter(pk=self.pk).update(**fields)
+
+
+class NodeStats(models.Model):
+    """
+    Сводная статистика узлов по группам (страна, город, тип звена).
+
+    Обновляется инкрементально в транзакциях изменения узлов и продуктов,
+    поэтому отчеты и фильтры читают готовые агрегаты вместо сканирования
+    таблицы узлов. Полный пересчет: python manage.py refresh_node_stats.
+    """
+
+    country = models.CharField(max_length=100, verbose_name="Страна")
+    city = models.CharField(max_length=100, verbose_name="Город")
+    node_type = models.CharField(
+        max_length=20, choices=NetworkNode.NODE_TYPES, verbose_name="Тип звена"
+    )
+    node_count = models.IntegerField(default=0, verbose_name="Количество узлов")
+    product_count = models.IntegerField(default=0, verbose_name="Количество продуктов")
+    total_debt = models.DecimalField(
+        max_digits=20,
+        decimal_places=2,
+        default=0,
+        verbose_name="Суммарная задолженность",
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Время изменения")
+
+    class Meta:
+        """Мета-класс для настроек модели."""
+
+        verbose_name = "Статистика по региону"
+        verbose_name_plural = "Статистика по регионам"
+        ordering = ["country", "city", "node_type"]
+        constraints = [
+            # Уникальный индекс также служит для детализации country -> city
+            models.UniqueConstraint(
+                fields=["country", "city", "node_type"],
+                name="nodestats_group_unique",
+            ),
+        ]
+
+    def __str__(self):
+        """Строковое представление объекта."""
+
+        return f"{self.country}, {self.city}, {self.node_type}: {self.node_count}"
+
+
+class ArchivedProductQuerySet(models.QuerySet):
+    """QuerySet архивных продуктов с пакетным удалением."""
+
+    def bulk_delete(self):
+        """
+        Удаляет архивные продукты одним DELETE без посигнальной обработки.
+
+        Архивные продукты входят в product_count, поэтому NodeStats
+        уменьшается здесь же (кроме блока archive_action).
+
+        Returns:
+            int: Количество удаленных архивных продуктов
+        """
+        with transaction.atomic(using=self.db):
+            rows = self.model._base_manager.using(self.db).filter(
+                pk__in=list(self.values_list("pk", flat=True))
+            )
+            if not get_archive_action():
+                apply_deltas(subtract({}, product_totals(rows)), self.db)
+            return rows._raw_delete(self.db)
+
+
+class ArchivedProduct(models.Model):
+    """
+    Архивный продукт, вынесенный из рабочей таблицы Product.
+
+    Старые продукты (по release_date) переносятся сюда командой
+    archive_products, чтобы запросы к Product работали с ограниченным
+    рабочим набором. API и админка читают архив только по явному запросу.
+    """
+
+    original_id = models.BigIntegerField(unique=True, verbose_name="ID продукта")
+    name = models.CharField(max_length=255, verbose_name="Название")
+    model = models.CharField(max_length=255, verbose_name="Модель")
+    release_date = models.DateField(db_index=True, verbose_name="Дата выхода на рынок")
+    network_node = models.ForeignKey(
+        NetworkNode,
+        on_delete=models.CASCADE,
+        related_name="archived_products",
+        verbose_name="Звено сети",
+    )
+    archived_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Время архивации"
+    )
+
+    objects = ArchivedProductQuerySet.as_manager()
+
+    class Meta:
+        """Мета-класс для настроек модели."""
+
+        verbose_name = "Архивный продукт"
+        verbose_name_plural = "Архивные продукты"
+        ordering = ["-release_date"]
+
+    def __str__(self):
+        """Строковое представление объекта."""
+
+        return f"{self.name} ({self.model})"
+
+
+class NodeTombstone(models.Model):
+    """Отметка об удалении узла сети для дельта-синхронизации клиентов."""
+
+    node_id = models.BigIntegerField(unique=True, verbose_name="ID узла")
+    deleted_at = models.DateTimeField(
+        default=timezone.now, verbose_name="Время удаления"
+    )
+
+    class Meta:
+        """Мета-класс для настроек модели."""
+
+        verbose_name = "Удаленный узел"
+        verbose_name_plural = "Удаленные узлы"
+        indexes = [
+            models.Index(
+                fields=["deleted_at", "node_id"], name="nodetombstone_deleted_idx"
+            ),
+        ]
+
+    def __str__(self):
+        """Строковое представление объекта."""
+
+        return f"Узел #{self.node_id} удален {self.deleted_at:%Y-%m-%d %H:%M}"
+
+
+class ChangeEvent(models.Model):
+    """
+    Outbox-событие об изменении NetworkNode или Product.
+
+    Пишется в той же транзакции, что и само изменение; id служит
+    курсором для инкрементальной синхронизации потребителей.
+    """
+
+    ACTIONS = [
+        ("create", "Создание"),
+        ("update", "Изменение"),
+        ("delete", "Удаление"),
+        ("archive", "Перенос в архив"),
+        ("restore", "Восстановление из архива"),
+    ]
+
+    model = models.CharField(max_length=50, verbose_name="Модель")
+    object_id = models.BigIntegerField(verbose_name="ID объекта")
+    action = models.CharField(max_length=10, choices=ACTIONS, verbose_name="Действие")
+    payload = models.JSONField(
+        encoder=DjangoJSONEncoder, null=True, verbose_name="Состояние объекта"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Время события")
+
+    class Meta:
+        """Мета-класс для настроек модели."""
+
+        verbose_name = "Событие изменения"
+        verbose_name_plural = "События изменений"
+        ordering = ["id"]
+
+    def __str__(self):
+        """Строковое представление объекта."""
+
+        return f"#{self.pk} {self.action} {self.model}:{self.object_id}"
+
+
+class Webhook(models.Model):
+    """Подписка внешней системы на поток событий ChangeEvent."""
+
+    url = models.URLField(verbose_name="URL")
+    secret = models.CharField(
+        max_length=255, blank=True, verbose_name="Секрет для подписи HMAC"
+    )
+    is_active = models.BooleanField(default=True, verbose_name="Активен")
+    last_event_id = models.BigIntegerField(
+        default=0, verbose_name="Последнее доставленное событие"
+    )
+    last_delivered_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Время последней доставки"
+    )
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Время создания")
+
+    class Meta:
+        """Мета-класс для настроек модели."""
+
+        verbose_name = "Webhook"
+        verbose_name_plural = "Webhooks"
+
+    def __str__(self):
+        """Строковое представление объекта."""
+
+        return self.url
@@ -1,5 +1,11 @@
+from functools import cached_property
+
+from django.conf import settings
+from django.contrib.auth import authenticate
 from rest_framework import serializers
-from .models import NetworkNode, Product
+from .hierarchy import validate_supplier
+from .models import ArchivedProduct, ChangeEvent, Job, NetworkNode, Product
+from .snapshot import get_node_snapshot
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -12,13 +18,44 @@ class ProductSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "model", "release_date"]
 
 
-class NetworkNodeSerializer(serializers.ModelSerializer):
+class ArchivedProductSerializer(serializers.ModelSerializer):
+    """Сериализатор для модели ArchivedProduct."""
+
+    id = serializers.IntegerField(source="original_id", read_only=True)
+
+    class Meta:
+        """Мета-класс для настроек сериализатора ArchivedProduct."""
+
+        model = ArchivedProduct
+        fields = ["id", "name", "model", "release_date", "archived_at"]
+        read_only_fields = fields
+
+
+class SupplierValidationMixin:
+    """Миксин для проверки циклов и глубины иерархии при смене поставщика."""
+
+    def validate(self, attrs):
+        """Проверяет нового поставщика одним рекурсивным запросом к БД."""
+
+        attrs = super().validate(attrs)
+        if "supplier" in attrs:
+            supplier = attrs["supplier"]
+            validate_supplier(
+                self.instance.pk if self.instance is not None else None,
+                supplier.pk if supplier is not None else None,
+            )
+        return attrs
+
+
+class NetworkNodeSerializer(SupplierValidationMixin, serializers.ModelSerializer):
     """Сериализатор для модели NetworkNode с полной информацией."""
 
     products = ProductSerializer(many=True, read_only=True)
-    hierarchy_level = serializers.ReadOnlyField()
-    supplier_name = serializers.CharField(source="supplier.name", read_only=True)
+    archived_products = ArchivedProductSerializer(many=True, read_only=True)
+    hierarchy_level = serializers.SerializerMethodField()
+    supplier_name = serializers.SerializerMethodField()
     dependent_nodes_count = serializers.SerializerMethodField()
+    supply_chain = serializers.SerializerMethodField()
 
     class Meta:
         """Мета-класс для настроек сериализатора NetworkNode."""
@@ -37,19 +74,87 @@ class NetworkNodeSerializer(serializers.ModelSerializer):
             "supplier_name",
             "debt",
             "created_at",
+            "updated_at",
             "hierarchy_level",
             "products",
+            "archived_products",
             "dependent_nodes_count",
+            "supply_chain",
         ]
-        read_only_fields = ["debt", "created_at", "hierarchy_level"]
+        read_only_fields = ["debt", "created_at", "updated_at", "hierarchy_level"]
+
+    def __init__(self, *args, **kwargs):
+        """
+        Оставляет необязательные поля только по запросу через контекст.
+
+        archived_products выводится при include_archived, supply_chain -
+        при include_supply_chain (цепочки передаются в supply_chains).
+        """
+
+        super().__init__(*args, **kwargs)
+        if not self.context.get("include_archived"):
+            self.fields.pop("archived_products")
+        if not self.context.get("include_supply_chain"):
+            self.fields.pop("supply_chain")
 
     def get_dependent_nodes_count(self, obj):
-        """Возвращает количество зависимых узлов."""
+        """
+        Возвращает количество зависимых узлов.
+
+        Использует аннотацию dependent_count, если queryset ее содержит.
+        """
 
+        count = getattr(obj, "dependent_count", None)
+        if count is not None:
+            return count
         return obj.dependent_nodes.count()
 
+    @cached_property
+    def node_snapshot(self):
+        """Снимок узлов процесса (NODE_SNAPSHOT) или None."""
 
-class NetworkNodeUpdateSerializer(serializers.ModelSerializer):
+        return get_node_snapshot()
+
+    def get_supplier_name(self, obj):
+        """
+        Возвращает название поставщика.
+
+        При включенном снимке узлов название берется из него, иначе
+        (и если поставщика еще нет в снимке) - из obj.supplier.
+        """
+
+        if obj.supplier_id is None:
+            return None
+        if self.node_snapshot is not None:
+            name = self.node_snapshot.get_name(obj.supplier_id)
+            if name is not None:
+                return name
+        return obj.supplier.name
+
+    def get_hierarchy_level(self, obj):
+        """
+        Возвращает уровень иерархии узла.
+
+        Если цепочки поставщиков уже загружены, уровень равен длине
+        цепочки и не требует обхода поставщиков по одному; иначе он
+        берется из снимка узлов, а при его отсутствии считается по БД.
+        """
+
+        if "supply_chains" in self.context:
+            return len(self.context["supply_chains"].get(obj.pk, []))
+        if self.node_snapshot is not None:
+            level = self.node_snapshot.get_hierarchy_level(obj.pk)
+            if level is not None:
+                return level
+        return obj.hierarchy_level
+
+    def get_supply_chain(self, obj):
+        """Возвращает цепочку поставщиков от завода до непосредственного поставщика."""
+
+        return self.context["supply_chains"].get(obj.pk, [])
+
+
+class NetworkNodeUpdateSerializer(SupplierValidationMixin, serializers.ModelSerializer):
     """
     Сериализатор для обновления модели NetworkNode.
 
@@ -71,3 +176,108 @@ class NetworkNodeUpdateSerializer(serializers.ModelSerializer):
             "house_number",
             "supplier",
         ]
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Сериализатор для модели Job (статус и прогресс фоновой задачи)."""
+
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        """Мета-класс для настроек сериализатора Job."""
+
+        model = Job
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "progress_done",
+            "progress_total",
+            "progress",
+            "result",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+    def get_progress(self, obj):
+        """Возвращает прогресс выполнения в процентах."""
+
+        if obj.status == Job.DONE:
+            return 100
+        if not obj.progress_total:
+            return 0
+        return round(100 * obj.progress_done / obj.progress_total)
+
+
+class BulkClearDebtSerializer(serializers.Serializer):
+    """Сериализатор параметров массовой очистки задолженности."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        help_text="Список id узлов; без него используются фильтры из query-параметров",
+    )
+
+
+class ChangeEventSerializer(serializers.ModelSerializer):
+    """Сериализатор для модели ChangeEvent (лента изменений и webhooks)."""
+
+    class Meta:
+        """Мета-класс для настроек сериализатора ChangeEvent."""
+
+        model = ChangeEvent
+        fields = ["id", "model", "object_id", "action", "payload", "created_at"]
+        read_only_fields = fields
+
+
+class GeoStatsSerializer(serializers.Serializer):
+    """Сериализатор строки сводной статистики по региону."""
+
+    country = serializers.CharField(required=False)
+    city = serializers.CharField(required=False)
+    node_type = serializers.CharField(required=False)
+    node_count = serializers.IntegerField()
+    product_count = serializers.IntegerField()
+    total_debt = serializers.DecimalField(max_digits=20, decimal_places=2)
+
+
+class TokenObtainSerializer(serializers.Serializer):
+    """Сериализатор получения токена API по логину и паролю."""
+
+    username = serializers.CharField()
+    password = serializers.CharField(style={"input_type": "password"}, write_only=True)
+
+    def validate(self, attrs):
+        """Проверяет логин и пароль (единственная проверка хэша пароля)."""
+
+        user = authenticate(
+            request=self.context.get("request"),
+            username=attrs["username"],
+            password=attrs["password"],
+        )
+        if user is None or not user.is_active:
+            raise serializers.ValidationError("Неверный логин или пароль")
+        attrs["user"] = user
+        return attrs
+
+
+class BatchGetSerializer(serializers.Serializer):
+    """Сериализатор параметров пакетного получения узлов."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        help_text="Список id узлов (не больше BATCH_GET_MAX_IDS)",
+    )
+
+    def validate_ids(self, ids):
+        """Проверяет ограничение на количество id в одном запросе."""
+
+        if len(ids) > settings.BATCH_GET_MAX_IDS:
+            raise serializers.ValidationError(
+                f"Не больше {settings.BATCH_GET_MAX_IDS} id в одном запросе"
+            )
+        return ids
@@ -0,0 +1,187 @@
+from django.conf import settings
+from django.utils import timezone
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_user
+from .changes import DELETE, UPDATE, get_archive_action, record_changes
+from .models import ArchivedProduct, NetworkNode, NodeTombstone, Product, touch_nodes
+from .stats import GROUP_FIELDS, add_delta, apply_deltas, get_node_keys, node_key
+
+
+@receiver(pre_delete, sender=NetworkNode)
+def record_detached_dependents(sender, instance, using, **kwargs):
+    """
+    Пишет события update для узлов, которые потеряют поставщика (SET_NULL).
+
+    Collector выполняет SET_NULL обычным UPDATE без сигналов, поэтому
+    события для зависимых узлов записываются заранее, в той же транзакции.
+    """
+
+    dependents = NetworkNode._base_manager.using(using).filter(supplier_id=instance.pk)
+    dependents.update(updated_at=timezone.now())
+    dependents = list(dependents)
+    for dependent in dependents:
+        dependent.supplier_id = None
+    record_changes(dependents, UPDATE, using)
+
+
+@receiver(post_delete, sender=NetworkNode)
+@receiver(post_delete, sender=Product)
+def record_deletion(sender, instance, using, **kwargs):
+    """Пишет событие delete в транзакции удаления (включая CASCADE)."""
+
+    record_changes([instance], DELETE, using)
+
+
+@receiver(post_delete, sender=NetworkNode)
+def create_tombstone(sender, instance, using, **kwargs):
+    """Оставляет отметку об удалении узла для дельта-синхронизации."""
+
+    NodeTombstone.objects.using(using).update_or_create(
+        node_id=instance.pk, defaults={"deleted_at": timezone.now()}
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def touch_product_node(sender, instance, using, **kwargs):
+    """
+    Обновляет updated_at узла при изменении его продуктов.
+
+    Продукты входят в представление узла в API, поэтому клиенты
+    дельта-синхронизации должны получить узел повторно.
+    """
+
+    touch_nodes([instance.network_node_id], using)
+
+
+@receiver(pre_save, sender=NetworkNode)
+def remember_node_stats(sender, instance, using, **kwargs):
+    """
+    Запоминает группу и задолженность узла в БД перед сохранением.
+
+    Строка читается с блокировкой внутри транзакции save(), поэтому
+    дельта для NodeStats считается от фактического состояния в БД.
+    """
+
+    instance._stats_before = None
+    if not instance._state.adding and instance.pk is not None:
+        instance._stats_before = (
+            NetworkNode._base_manager.using(using)
+            .select_for_update()
+            .filter(pk=instance.pk)
+            .values_list(*GROUP_FIELDS, "debt")
+            .first()
+        )
+
+
+@receiver(post_save, sender=NetworkNode)
+def update_node_stats(sender, instance, using, **kwargs):
+    """Переносит изменение узла в сводную таблицу NodeStats."""
+
+    deltas = add_delta({}, node_key(instance), nodes=1, debt=instance.debt)
+    before = getattr(instance, "_stats_before", None)
+    if before is not None:
+        *old_key, old_debt = before
+        add_delta(deltas, tuple(old_key), nodes=-1, debt=-old_debt)
+        if tuple(old_key) != node_key(instance):
+            # Продукты узла (включая архивные) переходят в новую группу
+            products = sum(
+                model._base_manager.using(using)
+                .filter(network_node_id=instance.pk)
+                .count()
+                for model in (Product, ArchivedProduct)
+            )
+            add_delta(deltas, tuple(old_key), products=-products)
+            add_delta(deltas, node_key(instance), products=products)
+    apply_deltas(deltas, using)
+
+
+@receiver(pre_delete, sender=NetworkNode)
+def remember_deleted_node_stats(sender, instance, using, **kwargs):
+    """Запоминает группу и задолженность удаляемого узла по данным в БД."""
+
+    instance._stats_before = (
+        NetworkNode._base_manager.using(using)
+        .filter(pk=instance.pk)
+        .values_list(*GROUP_FIELDS, "debt")
+        .first()
+    )
+
+
+@receiver(post_delete, sender=NetworkNode)
+def remove_node_stats(sender, instance, using, **kwargs):
+    """Вычитает удаленный узел из NodeStats (продукты вычитаются каскадом)."""
+
+    before = getattr(instance, "_stats_before", None)
+    if before is not None:
+        *key, debt = before
+        apply_deltas(add_delta({}, tuple(key), nodes=-1, debt=-debt), using)
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_node(sender, instance, using, **kwargs):
+    """Запоминает узел продукта в БД перед сохранением."""
+
+    instance._stats_node_id = None
+    if not instance._state.adding and instance.pk is not None:
+        instance._stats_node_id = (
+            Product._base_manager.using(using)
+            .filter(pk=instance.pk)
+            .values_list("network_node_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Product)
+def update_product_stats(sender, instance, using, created, **kwargs):
+    """Учитывает новый или перенесенный в другой узел продукт в NodeStats."""
+
+    old_node_id = getattr(instance, "_stats_node_id", None)
+    if not created and old_node_id in (None, instance.network_node_id):
+        return
+    keys = get_node_keys([old_node_id, instance.network_node_id], using)
+    deltas = add_delta({}, keys[instance.network_node_id], products=1)
+    if old_node_id in keys:
+        add_delta(deltas, keys[old_node_id], products=-1)
+    apply_deltas(deltas, using)
+
+
+@receiver(pre_delete, sender=Product)
+@receiver(pre_delete, sender=ArchivedProduct)
+def remember_deleted_product_group(sender, instance, using, **kwargs):
+    """
+    Запоминает группу узла удаляемого продукта по данным в БД.
+
+    Архивные продукты входят в product_count наравне с рабочими, а
+    перенос между таблицами (archive_action) счетчики не меняет.
+    """
+
+    instance._stats_key = None
+    if get_archive_action():
+        return
+    instance._stats_key = (
+        sender._base_manager.using(using)
+        .filter(pk=instance.pk)
+        .values_list(*[f"network_node__{field}" for field in GROUP_FIELDS])
+        .first()
+    )
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ArchivedProduct)
+def remove_product_stats(sender, instance, using, **kwargs):
+    """Вычитает удаленный продукт из NodeStats."""
+
+    key = getattr(instance, "_stats_key", None)
+    if key is not None:
+        apply_deltas(add_delta({}, tuple(key), products=-1), using)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Сбрасывает пользователя из кэша аутентификации по токену."""
+
+    invalidate_user(instance.pk)
@@ -0,0 +1,443 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+
+from .changes import DELETE, get_settled_cursor, read_model_events
+from .db_routers import PRIMARY_DB_ALIAS
+
+MISSING = -1
+UNKNOWN_NODE_TYPE = 255
+
+# Поля NetworkNode, которые хранит снимок
+SNAPSHOT_FIELDS = ("id", "name", "node_type", "supplier_id", "city", "country")
+
+
+class NodeSnapshot:
+    """
+    Read-only снимок таблицы NetworkNode в памяти процесса.
+
+    Хранит только id, name, node_type, supplier_id, city и country
+    в колоночных массивах (модуль array) вместо объектов моделей:
+    - _ids: отсортированные id узлов (8 байт на узел);
+    - _supplier_ids: id поставщика или 0 (8 байт на узел);
+    - _types: код типа узла (1 байт на узел);
+    - _alive: признак, что узел не удален (1 байт на узел);
+    - _name_starts, _name_lengths: положение названия в общем буфере
+      UTF-8 _name_data (8 + 2 байта на узел плюс байты названия);
+    - _cities, _countries: коды интернированных строк (по 4 байта на узел).
+
+    Города и страны повторяются, поэтому хранятся один раз в таблице
+    строк _strings; для списка городов ведутся счетчики узлов по стране
+    и городу (_city_counts). Снимок загружается целиком и затем дополняется
+    событиями outbox-таблицы ChangeEvent начиная с курсора загрузки.
+    """
+
+    def __init__(self, node_types=None):
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._type_codes = {
+            code: index for index, (code, _) in enumerate(node_types or [])
+        }
+        self._type_names = {index: code for code, index in self._type_codes.items()}
+        self.reset()
+
+    # Атрибуты с данными снимка; load() подменяет их одновременно
+    STATE_FIELDS = (
+        "_ids",
+        "_supplier_ids",
+        "_types",
+        "_alive",
+        "_name_starts",
+        "_name_lengths",
+        "_name_data",
+        "_cities",
+        "_countries",
+        "_strings",
+        "_string_codes",
+        "_city_counts",
+        "_size",
+        "_garbage",
+    )
+
+    def reset(self):
+        """Сбрасывает снимок; при следующем обращении он будет загружен заново."""
+
+        with self._lock:
+            self._ids = array("q")
+            self._supplier_ids = array("q")
+            self._types = bytearray()
+            self._alive = bytearray()
+            self._name_starts = array("q")
+            self._name_lengths = array("H")
+            self._name_data = bytearray()
+            self._cities = array("I")
+            self._countries = array("I")
+            self._strings = []
+            self._string_codes = {}
+            self._city_counts = {}
+            self._size = 0
+            self._garbage = 0
+            self.cursor = 0
+            self._loaded_at = None
+            self._synced_at = None
+
+    @property
+    def is_loaded(self):
+        """Был ли снимок загружен из базы данных."""
+
+        return self._loaded_at is not None
+
+    def __len__(self):
+        return self._size
+
+    # Загрузка и применение изменений
+
+    def load(self, rows, cursor=0):
+        """
+        Строит снимок из итерируемого набора строк SNAPSHOT_FIELDS.
+
+        Строки должны быть упорядочены по id. cursor - id последнего
+        события ChangeEvent, уже отраженного в строках. Колонки строятся
+        в отдельном объекте без блокировки и подменяются под ней, поэтому
+        читатели во время загрузки видят прежнее состояние.
+        """
+        fresh = NodeSnapshot()
+        fresh._type_codes = self._type_codes
+        fresh._fill(rows)
+        with self._lock:
+            for name in self.STATE_FIELDS:
+                setattr(self, name, getattr(fresh, name))
+            self.cursor = cursor
+            self._loaded_at = self._synced_at = time.monotonic()
+
+    def upsert(self, node_id, name, node_type, supplier_id, city, country):
+        """Добавляет узел или заменяет его значения."""
+
+        with self._lock:
+            index = bisect_left(self._ids, node_id)
+            if index == len(self._ids) or self._ids[index] != node_id:
+                # Узлы обычно добавляются в конец; вставка в середину
+                # сдвигает все колонки, но выполняется на уровне C
+                self._ids.insert(index, node_id)
+                self._supplier_ids.insert(index, 0)
+                self._types.insert(index, UNKNOWN_NODE_TYPE)
+                self._alive.insert(index, 0)
+                self._name_starts.insert(index, 0)
+                self._name_lengths.insert(index, 0)
+                self._cities.insert(index, 0)
+                self._countries.insert(index, 0)
+            else:
+                self._garbage += self._name_lengths[index]
+
+            if self._alive[index]:
+                self._count_city(index, -1)
+            else:
+                self._alive[index] = 1
+                self._size += 1
+            self._supplier_ids[index] = supplier_id or 0
+            self._types[index] = self._type_codes.get(node_type, UNKNOWN_NODE_TYPE)
+            encoded = name.encode()
+            self._name_starts[index] = len(self._name_data)
+            self._name_lengths[index] = len(encoded)
+            self._name_data.extend(encoded)
+            self._cities[index] = self._intern(city)
+            self._countries[index] = self._intern(country)
+            self._count_city(index, 1)
+
+    def remove(self, node_id):
+        """
+        Удаляет узел из снимка.
+
+        Ссылки зависимых узлов не меняются: событие об их отвязке
+        (SET_NULL) пишется в outbox отдельно.
+        """
+        with self._lock:
+            index = self._find(node_id)
+            if index != MISSING:
+                self._count_city(index, -1)
+                self._alive[index] = 0
+                self._garbage += self._name_lengths[index]
+                self._size -= 1
+
+    def apply_events(self, events, cursor=None):
+        """
+        Применяет события ChangeEvent узлов и сдвигает курсор.
+
+        cursor - курсор, до которого прочитаны события (в том числе
+        событий других моделей). Payload события содержит полное
+        состояние узла, поэтому повторное применение ничего не меняет.
+        """
+        with self._lock:
+            for event in events:
+                if event.action == DELETE:
+                    self.remove(event.object_id)
+                elif event.payload:
+                    payload = event.payload
+                    self.upsert(
+                        event.object_id,
+                        payload.get("name") or "",
+                        payload.get("node_type"),
+                        payload.get("supplier_id"),
+                        payload.get("city") or "",
+                        payload.get("country") or "",
+                    )
+                self.cursor = max(self.cursor, event.id)
+            if cursor is not None:
+                self.cursor = max(self.cursor, cursor)
+            self._synced_at = time.monotonic()
+
+    def needs_sync(self, max_staleness):
+        """Проверяет, что снимок не загружен или не сверялся max_staleness секунд."""
+
+        if self._synced_at is None:
+            return True
+        return time.monotonic() - self._synced_at > max_staleness
+
+    def needs_rebuild(self, max_age):
+        """
+        Проверяет, что снимок пора загрузить заново.
+
+        Перезагрузка уплотняет буфер названий и подхватывает изменения,
+        записанные в обход outbox.
+        """
+        if self._loaded_at is None:
+            return True
+        if self._garbage > max(1 << 20, len(self._name_data) // 2):
+            return True
+        return max_age is not None and time.monotonic() - self._loaded_at > max_age
+
+    # Чтение
+
+    def contains(self, node_id):
+        """Проверяет наличие узла в снимке."""
+
+        return self._find(node_id) != MISSING
+
+    def get(self, node_id):
+        """Возвращает значения узла словарем или None, если узла нет."""
+
+        with self._lock:
+            index = self._find(node_id)
+            if index == MISSING:
+                return None
+            return {
+                "id": node_id,
+                "name": self._name(index),
+                "node_type": self._type_names.get(self._types[index]),
+                "supplier_id": self._supplier_ids[index] or None,
+                "city": self._strings[self._cities[index]],
+                "country": self._strings[self._countries[index]],
+            }
+
+    def get_name(self, node_id):
+        """Возвращает название узла или None, если узла нет в снимке."""
+
+        with self._lock:
+            index = self._find(node_id)
+            return self._name(index) if index != MISSING else None
+
+    def get_hierarchy_level(self, node_id):
+        """
+        Возвращает уровень иерархии узла (как NetworkNode.hierarchy_level).
+
+        Обход защищен от циклов. Если узла или одного из его поставщиков
+        нет в снимке, возвращается None, и уровень нужно взять из БД.
+        """
+        with self._lock:
+            index = self._find(node_id)
+            level = 0
+            seen = {node_id}
+            while index != MISSING:
+                supplier_id = self._supplier_ids[index]
+                if not supplier_id:
+                    return level
+                index = self._find(supplier_id)
+                if supplier_id in seen:
+                    return level
+                seen.add(supplier_id)
+                level += 1
+            return None
+
+    def get_cities(self, country=None):
+        """
+        Возвращает отсортированный список городов (с учетом страны).
+
+        Читает счетчики узлов по стране и городу, а не все узлы.
+        """
+        with self._lock:
+            if country is None:
+                codes = {
+                    code for cities in self._city_counts.values() for code in cities
+                }
+            else:
+                codes = self._city_counts.get(self._string_codes.get(country), {})
+            return sorted(self._strings[code] for code in codes)
+
+    def memory_usage(self):
+        """
+        Возвращает объем памяти колонок снимка в байтах.
+
+        Учитываются буферы массивов (с запасом роста) и таблица строк.
+        """
+        with self._lock:
+            columns = {
+                "ids": self._ids,
+                "supplier_ids": self._supplier_ids,
+                "types": self._types,
+                "alive": self._alive,
+                "name_starts": self._name_starts,
+                "name_lengths": self._name_lengths,
+                "name_data": self._name_data,
+                "cities": self._cities,
+                "countries": self._countries,
+            }
+            usage = {
+                name: len(column) * getattr(column, "itemsize", 1)
+                for name, column in columns.items()
+            }
+            usage["strings"] = sum(len(value.encode()) for value in self._strings)
+            return usage
+
+    # Внутренние методы
+
+    def _find(self, node_id):
+        """Бинарный поиск индекса живого узла по id."""
+
+        if not node_id:
+            return MISSING
+        index = bisect_left(self._ids, node_id)
+        if index < len(self._ids) and self._ids[index] == node_id:
+            if self._alive[index]:
+                return index
+        return MISSING
+
+    def _fill(self, rows):
+        """Заполняет колонки пустого снимка строками SNAPSHOT_FIELDS."""
+
+        for node_id, name, node_type, supplier_id, city, country in rows:
+            self._ids.append(node_id)
+            self._supplier_ids.append(supplier_id or 0)
+            self._types.append(self._type_codes.get(node_type, UNKNOWN_NODE_TYPE))
+            self._alive.append(1)
+            self._append_name(name)
+            self._cities.append(self._intern(city))
+            self._countries.append(self._intern(country))
+            self._count_city(len(self._ids) - 1, 1)
+        self._size = len(self._ids)
+
+    def _name(self, index):
+        start = self._name_starts[index]
+        return self._name_data[start : start + self._name_lengths[index]].decode()
+
+    def _append_name(self, name):
+        encoded = (name or "").encode()
+        self._name_starts.append(len(self._name_data))
+        self._name_lengths.append(len(encoded))
+        self._name_data.extend(encoded)
+
+    def _count_city(self, index, delta):
+        """Изменяет счетчик узлов города и страны узла index на delta."""
+
+        cities = self._city_counts.setdefault(self._countries[index], {})
+        city = self._cities[index]
+        count = cities.get(city, 0) + delta
+        if count > 0:
+            cities[city] = count
+        else:
+            cities.pop(city, None)
+            if not cities:
+                del self._city_counts[self._countries[index]]
+
+    def _intern(self, value):
+        code = self._string_codes.get(value)
+        if code is None:
+            code = len(self._strings)
+            self._strings.append(value)
+            self._string_codes[value] = code
+        return code
+
+
+def _create_snapshot():
+    from .models import NetworkNode
+
+    return NodeSnapshot(node_types=NetworkNode.NODE_TYPES)
+
+
+def _load(snapshot):
+    """
+    Загружает снимок из основной БД.
+
+    Курсор читается до строк и отстает на CHANGE_FEED_COMMIT_LAG: события,
+    записанные позже или зафиксированные не по порядку id, будут
+    применены повторно, что безопасно. Строки и курсор читаются из одной
+    базы: строки с отстающей реплики не соответствовали бы курсору.
+    """
+    from .models import NetworkNode
+
+    cursor = get_settled_cursor(PRIMARY_DB_ALIAS)
+    snapshot.load(
+        NetworkNode.objects.using(PRIMARY_DB_ALIAS)
+        .order_by("id")
+        .values_list(*SNAPSHOT_FIELDS)
+        .iterator(chunk_size=10000),
+        cursor=cursor,
+    )
+
+
+def _sync(snapshot):
+    """
+    Применяет к снимку новые события узлов из outbox основной БД.
+
+    События читаются до курсора без пропусков (changes.get_safe_cursor)
+    из той же базы, по которой считается курсор, даже если запрос читает
+    с реплики. Если событий узлов больше NODE_SNAPSHOT_PATCH_LIMIT,
+    дешевле загрузить снимок заново.
+    """
+    from .models import NetworkNode
+
+    limit = settings.NODE_SNAPSHOT_PATCH_LIMIT
+    events, safe_cursor = read_model_events(
+        NetworkNode, snapshot.cursor, limit, PRIMARY_DB_ALIAS
+    )
+    if len(events) > limit:
+        _load(snapshot)
+    else:
+        snapshot.apply_events(events, cursor=safe_cursor)
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_node_snapshot():
+    """
+    Возвращает процессный снимок узлов или None, если он отключен.
+
+    Снимок включается NODE_SNAPSHOT=1. Не чаще раза в
+    NODE_SNAPSHOT_MAX_STALENESS секунд он сверяется с outbox ChangeEvent
+    (один запрос), и не реже раза в NODE_SNAPSHOT_MAX_AGE секунд
+    загружается заново. Пока один поток сверяет снимок, остальные
+    читают предыдущее состояние и не ждут его.
+    """
+    global _snapshot
+    if not getattr(settings, "NODE_SNAPSHOT", False):
+        return None
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = _create_snapshot()
+        snapshot = _snapshot
+    if snapshot.needs_sync(settings.NODE_SNAPSHOT_MAX_STALENESS):
+        if snapshot._sync_lock.acquire(blocking=not snapshot.is_loaded):
+            try:
+                if not snapshot.is_loaded or snapshot.needs_rebuild(
+                    settings.NODE_SNAPSHOT_MAX_AGE
+                ):
+                    _load(snapshot)
+                elif snapshot.needs_sync(settings.NODE_SNAPSHOT_MAX_STALENESS):
+                    _sync(snapshot)
+            finally:
+                snapshot._sync_lock.release()
+    return snapshot
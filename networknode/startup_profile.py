@@ -0,0 +1,153 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+
+# Строка отчета python -X importtime: "import time: self | cumulative | module"
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)\s*$")
+
+# Загрузка цели профилирования: setup, wsgi, asgi или command:<имя>
+IMPORT_TARGET_SCRIPT = """
+import sys
+
+target = sys.argv[1]
+if target.startswith("command:"):
+    from config.startup import configure_light_startup
+
+    name = target.split(":", 1)[1]
+    configure_light_startup(["manage.py", name])
+    import django
+
+    django.setup()
+    from django.core.management import get_commands, load_command_class
+
+    load_command_class(get_commands()[name], name)
+elif target == "setup":
+    import django
+
+    django.setup()
+else:
+    import importlib
+
+    importlib.import_module("config." + target)
+"""
+
+# Время до первого ответа WSGI-приложения в свежем процессе
+FIRST_RESPONSE_SCRIPT = """
+import time
+
+started = time.perf_counter()
+
+import json
+import os
+import sys
+from wsgiref.util import setup_testing_defaults
+
+os.environ["STARTUP_WARMUP"] = sys.argv[2]
+from config.wsgi import application
+
+loaded = time.perf_counter()
+
+
+def request(path):
+    environ = {"PATH_INFO": path, "REQUEST_METHOD": "GET"}
+    setup_testing_defaults(environ)
+    statuses = []
+    body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b"".join(body)
+    if hasattr(body, "close"):
+        body.close()
+    return statuses[0]
+
+
+status = request(sys.argv[1])
+first = time.perf_counter()
+request(sys.argv[1])
+second = time.perf_counter()
+print(json.dumps({
+    "status": status,
+    "load": loaded - started,
+    "first_request": first - loaded,
+    "time_to_first_response": first - started,
+    "second_request": second - first,
+}))
+"""
+
+
+def run_python(script, args=(), python_options=(), env=None):
+    """
+    Выполняет скрипт в новом процессе интерпретатора с текущими настройками.
+
+    Процесс запускается из корня проекта с тем же DJANGO_SETTINGS_MODULE.
+
+    Raises:
+        RuntimeError: Если процесс завершился с ошибкой
+
+    Returns:
+        subprocess.CompletedProcess: Результат с захваченными stdout и stderr
+    """
+    result = subprocess.run(
+        [sys.executable, *python_options, "-c", script, *args],
+        capture_output=True,
+        text=True,
+        cwd=settings.BASE_DIR,
+        env={
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE,
+            **(env or {}),
+        },
+    )
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"Код возврата {result.returncode}")
+    return result
+
+
+def parse_importtime(text):
+    """
+    Разбирает вывод python -X importtime.
+
+    Returns:
+        list[tuple[str, int, int, int]]: Модуль, собственное и суммарное
+        время импорта в микросекундах и глубина вложенности
+    """
+    rows = []
+    for line in text.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            rows.append((module, int(own), int(cumulative), len(indent) // 2))
+    return rows
+
+
+def summarize_by_package(rows):
+    """Суммирует собственное время импорта по пакетам верхнего уровня."""
+
+    totals = defaultdict(int)
+    for module, own, _, _ in rows:
+        totals[module.split(".")[0]] += own
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def profile_imports(target):
+    """
+    Профилирует импорт цели в новом процессе с python -X importtime.
+
+    Args:
+        target: setup, wsgi, asgi или command:<имя команды>
+    """
+    result = run_python(
+        IMPORT_TARGET_SCRIPT, [target], python_options=["-X", "importtime"]
+    )
+    return parse_importtime(result.stderr)
+
+
+def measure_first_response(path, warmup=True):
+    """Измеряет время до первого ответа WSGI-приложения в новом процессе."""
+
+    result = run_python(FIRST_RESPONSE_SCRIPT, [path, "1" if warmup else "0"])
+    return json.loads(result.stdout.strip().splitlines()[-1])
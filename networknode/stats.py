@@ -0,0 +1,177 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+# Поля узла, от которых зависят агрегаты NodeStats
+GROUP_FIELDS = ("country", "city", "node_type")
+STATS_FIELDS = {*GROUP_FIELDS, "debt"}
+
+_PRODUCT_GROUP_FIELDS = tuple(f"network_node__{field}" for field in GROUP_FIELDS)
+
+
+def node_key(node):
+    """Возвращает ключ группы (country, city, node_type) узла."""
+
+    return tuple(getattr(node, field) for field in GROUP_FIELDS)
+
+
+def add_delta(deltas, key, nodes=0, products=0, debt=0):
+    """Добавляет изменение счетчиков группы в словарь дельт."""
+
+    delta = deltas.setdefault(key, [0, 0, Decimal("0")])
+    delta[0] += nodes
+    delta[1] += products
+    delta[2] += Decimal(debt or 0)
+    return deltas
+
+
+def subtract(after, before):
+    """Возвращает разность двух словарей агрегатов (after - before)."""
+
+    deltas = {}
+    for key in after.keys() | before.keys():
+        new = after.get(key, (0, 0, 0))
+        old = before.get(key, (0, 0, 0))
+        add_delta(deltas, key, new[0] - old[0], new[1] - old[1], new[2] - old[2])
+    return deltas
+
+
+def node_totals(node_queryset, with_products=True):
+    """
+    Агрегирует число узлов, задолженность и (опционально) число продуктов
+    выборки узлов по группам (country, city, node_type).
+
+    Число продуктов включает архивные: архивация их не удаляет.
+    """
+    from .models import ArchivedProduct, Product
+
+    totals = {}
+    rows = (
+        node_queryset.order_by()
+        .values(*GROUP_FIELDS)
+        .annotate(nodes=Count("pk"), debt=Sum("debt"))
+    )
+    for row in rows:
+        key = tuple(row[field] for field in GROUP_FIELDS)
+        add_delta(totals, key, nodes=row["nodes"], debt=row["debt"])
+    if with_products:
+        for model in (Product, ArchivedProduct):
+            products = model._base_manager.using(node_queryset.db).filter(
+                network_node__in=node_queryset.order_by().values("pk")
+            )
+            for key, count in product_totals(products).items():
+                add_delta(totals, key, products=count[1])
+    return totals
+
+
+def product_totals(product_queryset):
+    """Агрегирует число продуктов выборки по группам их узлов."""
+
+    totals = {}
+    rows = (
+        product_queryset.order_by()
+        .values(*_PRODUCT_GROUP_FIELDS)
+        .annotate(products=Count("pk"))
+    )
+    for row in rows:
+        key = tuple(row[field] for field in _PRODUCT_GROUP_FIELDS)
+        add_delta(totals, key, products=row["products"])
+    return totals
+
+
+def get_node_keys(node_ids, using="default"):
+    """Возвращает ключи групп для набора id узлов одним запросом."""
+
+    from .models import NetworkNode
+
+    rows = (
+        NetworkNode._base_manager.using(using)
+        .filter(pk__in=set(node_ids))
+        .values_list("pk", *GROUP_FIELDS)
+    )
+    return {pk: tuple(key) for pk, *key in rows}
+
+
+def apply_deltas(deltas, using="default"):
+    """
+    Применяет дельты к сводной таблице NodeStats.
+
+    Каждая группа обновляется атомарным UPDATE ... SET x = x + delta,
+    поэтому конкурентные транзакции не теряют изменения друг друга.
+    Группы обрабатываются в фиксированном порядке во избежание deadlock.
+    Вызывается в транзакции, изменяющей данные.
+    """
+    from .models import NodeStats
+
+    manager = NodeStats.objects.using(using)
+    now = timezone.now()
+    for key, (nodes, products, debt) in sorted(deltas.items()):
+        if not nodes and not products and not debt:
+            continue
+        lookup = dict(zip(GROUP_FIELDS, key))
+        values = {
+            "node_count": F("node_count") + nodes,
+            "product_count": F("product_count") + products,
+            "total_debt": F("total_debt") + debt,
+            "updated_at": now,
+        }
+        if not manager.filter(**lookup).update(**values):
+            manager.get_or_create(**lookup)
+            manager.filter(**lookup).update(**values)
+
+
+def track_node_changes(queryset, pks, change, with_products=True):
+    """
+    Выполняет массовое изменение узлов и переносит его результат в NodeStats.
+
+    Агрегаты затронутых узлов считаются до и после изменения в той же
+    транзакции, в сводную таблицу записывается только разность.
+    """
+    nodes = queryset.model._base_manager.using(queryset.db).filter(pk__in=pks)
+    with transaction.atomic(using=queryset.db, savepoint=False):
+        before = node_totals(nodes, with_products)
+        result = change()
+        apply_deltas(subtract(node_totals(nodes, with_products), before), queryset.db)
+    return result
+
+
+def track_product_changes(queryset, pks, change):
+    """Выполняет массовое изменение продуктов с обновлением NodeStats."""
+
+    products = queryset.model._base_manager.using(queryset.db).filter(pk__in=pks)
+    with transaction.atomic(using=queryset.db, savepoint=False):
+        before = product_totals(products)
+        result = change()
+        apply_deltas(subtract(product_totals(products), before), queryset.db)
+    return result
+
+
+def rebuild_node_stats(using="default"):
+    """
+    Полностью пересчитывает сводную таблицу NodeStats.
+
+    Нужна для первичного заполнения и исправления расхождений; в обычной
+    работе таблица обновляется инкрементально при записи.
+
+    Returns:
+        int: Количество групп в сводной таблице
+    """
+    from .models import NetworkNode, NodeStats
+
+    with transaction.atomic(using=using):
+        totals = node_totals(NetworkNode._base_manager.using(using).all())
+        NodeStats.objects.using(using).all().delete()
+        NodeStats.objects.using(using).bulk_create(
+            [
+                NodeStats(
+                    **dict(zip(GROUP_FIELDS, key)),
+                    node_count=nodes,
+                    product_count=products,
+                    total_debt=debt,
+                )
+                for key, (nodes, products, debt) in sorted(totals.items())
+            ]
+        )
+    return len(totals)
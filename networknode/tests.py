@@ -1,10 +1,73 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import StringIO
+from unittest import mock
+from django.test import (
+    RequestFactory,
+    TestCase,
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
 from django.contrib.auth.models import User
-from rest_framework.test import APITestCase, APIClient
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections, models
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import (
+    APITestCase,
+    APIClient,
+    APIRequestFactory,
+    force_authenticate,
+)
 from rest_framework import status
-from datetime import date
-from .models import NetworkNode, Product
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from datetime import date, timedelta
+from decimal import Decimal
+from django.utils import timezone
+from .models import (
+    ArchivedProduct,
+    ChangeEvent,
+    Job,
+    NodeTombstone,
+    NetworkNode,
+    NetworkNodeQuerySet,
+    NodeStats,
+    Product,
+    Webhook,
+)
+from .jobs import claim_next_job, enqueue, requeue_stale_jobs, run_job
+from .archive import archive_products, restore_products
+from .batching import batched_delete_nodes, batched_update, iter_pk_batches
+from .webhooks import deliver_pending, sign_payload
 from .serializer import NetworkNodeSerializer
+from .db_routers import PrimaryReplicaRouter, replica_reads
+from .graph import SupplyGraph, get_supply_graph
+from .hierarchy import get_supply_chains
+from .stats import node_totals, rebuild_node_stats
+from .startup_profile import parse_importtime, run_python, summarize_by_package
+from config import startup
+from config.warmup import warm_up
+from .coalescing import coalesce
+from .throttling import ActionScopedRateThrottle
+from .views import NetworkNodeViewSet
+from .authentication import (
+    SignedTokenAuthentication,
+    clear_user_cache,
+    create_token,
+)
+from .admin import CityFilter, NetworkNodeAdmin
+from .snapshot import NodeSnapshot, get_node_snapshot
+from django.contrib.admin.sites import AdminSite
+
+REPLICA_STUB = "replica_stub"
 
 
 class NetworkNodeModelTest(TestCase):
@@ -233,3 +296,2432 @@ class ProductAPITest(APITestCase):
         self.assertIn("products", response.data)
         self.assertEqual(len(response.data["products"]), 1)
         self.assertEqual(response.data["products"][0]["name"], "Смартфон")
+
+
+class PrimaryReplicaRouterTest(SimpleTestCase):
+    """Тесты выбора базы данных роутером."""
+
+    def setUp(self):
+        """Настройка роутера."""
+        self.router = PrimaryReplicaRouter()
+
+    @override_settings(DATABASE_REPLICAS=["replica_1", "replica_2"])
+    def test_reads_use_primary_outside_replica_context(self):
+        """Тест что без явного разрешения чтение идет в основную БД."""
+        self.assertIsNone(self.router.db_for_read(NetworkNode))
+
+    @override_settings(DATABASE_REPLICAS=["replica_1", "replica_2"])
+    def test_reads_use_replica_inside_context(self):
+        """Тест что внутри replica_reads чтение уходит на реплику."""
+        with replica_reads():
+            self.assertIn(
+                self.router.db_for_read(NetworkNode), ["replica_1", "replica_2"]
+            )
+            # Пользователи и сессии всегда читаются с основной БД
+            self.assertIsNone(self.router.db_for_read(User))
+
+    @override_settings(DATABASE_REPLICAS=["replica_1", "replica_2", "replica_3"])
+    def test_replica_chosen_once_per_context(self):
+        """Тест что все чтения в одном контексте идут на одну реплику."""
+        with replica_reads():
+            alias = self.router.db_for_read(NetworkNode)
+            for _ in range(20):
+                self.assertEqual(self.router.db_for_read(NetworkNode), alias)
+                self.assertEqual(self.router.db_for_read(Product), alias)
+            # Вложенный контекст не перевыбирает реплику
+            with replica_reads():
+                self.assertEqual(self.router.db_for_read(NetworkNode), alias)
+        self.assertIsNone(self.router.db_for_read(NetworkNode))
+
+    @override_settings(DATABASE_REPLICAS=["replica_1"])
+    def test_writes_and_migrations_use_primary(self):
+        """Тест что запись и миграции выполняются только на основной БД."""
+        with replica_reads():
+            self.assertEqual(self.router.db_for_write(NetworkNode), "default")
+        self.assertFalse(self.router.allow_migrate("replica_1", "networknode"))
+        self.assertIsNone(self.router.allow_migrate("default", "networknode"))
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA_STUB])
+class ReplicaRoutingAPITest(APITestCase):
+    """
+    Тесты маршрутизации API между основной БД и репликой.
+
+    В качестве реплики используется отдельная локальная SQLite-база,
+    поэтому видно, из какой базы были прочитаны данные.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Создание SQLite-реплики со схемой приложения."""
+        # Алиас реплики появляется только здесь, поэтому раннер тестов
+        # не пытается создавать для него тестовую базу
+        cls.databases = {"default", REPLICA_STUB}
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.settings[REPLICA_STUB] = connections.configure_settings(
+            {
+                **connections.settings,
+                REPLICA_STUB: {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": f"{cls.replica_dir}/replica.sqlite3",
+                },
+            }
+        )[REPLICA_STUB]
+        with connections[REPLICA_STUB].schema_editor() as editor:
+            editor.create_model(NetworkNode)
+            editor.create_model(Product)
+            editor.create_model(ChangeEvent)
+            editor.create_model(NodeStats)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Удаление SQLite-реплики."""
+        super().tearDownClass()
+        connections[REPLICA_STUB].close()
+        del connections[REPLICA_STUB]
+        del connections.settings[REPLICA_STUB]
+        shutil.rmtree(cls.replica_dir, ignore_errors=True)
+
+    def setUp(self):
+        """Настройка тестовых данных в основной БД и реплике."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_active=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        node_data = {
+            "node_type": "factory",
+            "email": "factory@example.com",
+            "country": "Россия",
+            "city": "Москва",
+            "street": "Ленина",
+            "house_number": "1",
+        }
+        NetworkNode.objects.create(name="Завод в основной БД", **node_data)
+        NetworkNode.objects.using(REPLICA_STUB).create(
+            name="Завод в реплике", **node_data
+        )
+
+    def list_names(self):
+        """Возвращает названия узлов из списка API."""
+        response = self.client.get("/api/network-nodes/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["name"] for item in response.data["results"]]
+
+    def test_list_reads_from_replica(self):
+        """Тест что список узлов читается с реплики."""
+        self.assertEqual(self.list_names(), ["Завод в реплике"])
+
+    def test_create_writes_to_primary_and_pins_reads(self):
+        """Тест записи в основную БД и read-your-writes после нее."""
+        data = {
+            "name": "Новая розничная сеть",
+            "node_type": "retail",
+            "email": "new@example.com",
+            "country": "Россия",
+            "city": "Казань",
+            "street": "Баумана",
+            "house_number": "10",
+        }
+        response = self.client.post("/api/network-nodes/", data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(
+            NetworkNode.objects.using("default").filter(name=data["name"]).exists()
+        )
+        self.assertFalse(
+            NetworkNode.objects.using(REPLICA_STUB).filter(name=data["name"]).exists()
+        )
+
+        # После записи пользователь читает с основной БД, в том числе
+        # в другом воркере (пустой локальный кэш): привязка лежит в cookie
+        self.assertIn("primary_pin", response.cookies)
+        cache.clear()
+        self.assertIn(data["name"], self.list_names())
+
+        # Другой пользователь по-прежнему читает с реплики, даже с чужой cookie
+        other = User.objects.create_user(username="other", password="testpass123")
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.list_names(), ["Завод в реплике"])
+
+    def test_post_batch_get_reads_from_replica_without_pin(self):
+        """Тест что POST batch_get читает с реплики и не привязывает к основной БД."""
+        replica_node = NetworkNode.objects.using(REPLICA_STUB).get()
+        response = self.client.post(
+            "/api/network-nodes/batch_get/", {"ids": [replica_node.pk]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item.get("name") for item in response.data["results"]],
+            ["Завод в реплике"],
+        )
+        self.assertNotIn("primary_pin", response.cookies)
+        self.assertEqual(self.list_names(), ["Завод в реплике"])
+
+    @override_settings(NODE_SNAPSHOT=True)
+    def test_node_snapshot_reads_primary_inside_replica_context(self):
+        """Тест что снимок узлов загружается и сверяется по основной БД."""
+        primary_node = NetworkNode.objects.using("default").get()
+        with mock.patch("networknode.snapshot._snapshot", None):
+            with replica_reads():
+                snapshot = get_node_snapshot()
+                self.assertEqual(
+                    snapshot.get_name(primary_node.pk), "Завод в основной БД"
+                )
+                NetworkNode.objects.filter(pk=primary_node.pk).update(name="Завод 2")
+                with override_settings(
+                    CHANGE_FEED_COMMIT_LAG=0, NODE_SNAPSHOT_MAX_STALENESS=0
+                ):
+                    get_node_snapshot()
+            self.assertEqual(snapshot.get_name(primary_node.pk), "Завод 2")
+            self.assertEqual(
+                snapshot.cursor, ChangeEvent.objects.using("default").latest("id").id
+            )
+
+    def test_forged_pin_cookie_is_ignored(self):
+        """Тест что неподписанная cookie привязки не действует."""
+        self.client.cookies["primary_pin"] = str(self.user.pk)
+        self.assertEqual(self.list_names(), ["Завод в реплике"])
+
+
+class SupplyGraphTest(SimpleTestCase):
+    """Тесты in-memory индекса графа поставок."""
+
+    def setUp(self):
+        """Граф: 1 -> 2 -> 4, 1 -> 3, 5 (отдельный корень)."""
+        self.graph = SupplyGraph(node_types=NetworkNode.NODE_TYPES)
+        self.graph.load(
+            [
+                (1, None, "factory"),
+                (2, 1, "retail"),
+                (3, 1, "retail"),
+                (4, 2, "entrepreneur"),
+                (5, None, "factory"),
+            ]
+        )
+
+    def test_bfs_with_depth_and_type(self):
+        """Тест обхода в ширину с ограничением глубины и типа."""
+        self.assertEqual(self.graph.bfs(1), [(2, 1), (3, 1), (4, 2)])
+        self.assertEqual(self.graph.bfs(1, max_depth=1), [(2, 1), (3, 1)])
+        self.assertEqual(self.graph.bfs(1, node_type="entrepreneur"), [(4, 2)])
+
+    def test_dfs_and_ancestors(self):
+        """Тест обхода в глубину и списка поставщиков."""
+        self.assertEqual(self.graph.dfs(1), [2, 4, 3])
+        self.assertEqual(self.graph.ancestors(4), [2, 1])
+
+    def test_aggregates(self):
+        """Тест глубин, размеров поддеревьев и самых длинных цепочек."""
+        self.assertEqual(self.graph.depth(4), 2)
+        self.assertEqual(self.graph.subtree_size(1), 3)
+        self.assertEqual(self.graph.depth_histogram(), {0: 2, 1: 2, 2: 1})
+        self.assertEqual(self.graph.longest_chains(limit=1), [[1, 2, 4]])
+        self.assertEqual(self.graph.find_cycles(), [])
+
+    def test_incremental_updates(self):
+        """Тест инкрементального добавления, перемещения и удаления узлов."""
+        self.graph.bfs(1)  # построить CSR до изменений
+        self.graph.upsert(6, 4, "entrepreneur")
+        self.graph.upsert(3, 5)
+        self.assertEqual(self.graph.bfs(1), [(2, 1), (4, 2), (6, 3)])
+        self.assertEqual(self.graph.bfs(5), [(3, 1)])
+
+        # Удаление поставщика делает зависимые узлы корнями (SET_NULL)
+        self.graph.remove(2)
+        self.assertEqual(self.graph.bfs(1), [])
+        self.assertEqual(self.graph.depth(4), 0)
+        self.assertEqual(len(self.graph), 5)
+
+    def test_stats_maintained_incrementally(self):
+        """Тест что агрегаты после изменений совпадают с полным пересчетом."""
+        self.graph.summary()
+        with mock.patch.object(
+            self.graph, "_compute_stats", wraps=self.graph._compute_stats
+        ) as compute_stats:
+            self.graph.upsert(6, 4, "entrepreneur")
+            self.graph.upsert(2, 5)
+            self.graph.upsert(3, None)
+            self.graph.remove(4)
+            self.graph.upsert(4, 3)
+            summary = self.graph.summary()
+        compute_stats.assert_not_called()
+
+        fresh = SupplyGraph(node_types=NetworkNode.NODE_TYPES)
+        fresh.load([(1, None, "factory")])
+        for node_id in [2, 3, 4, 5, 6]:
+            fresh.upsert(node_id, None)
+        for node_id, supplier_id in [(2, 5), (4, 3), (6, None)]:
+            fresh.upsert(node_id, supplier_id)
+        self.assertEqual(summary, fresh.summary())
+        for node_id in [1, 2, 3, 4, 5, 6]:
+            self.assertEqual(
+                self.graph.subtree_size(node_id), fresh.subtree_size(node_id)
+            )
+            self.assertEqual(self.graph.depth(node_id), fresh.depth(node_id))
+
+    def test_out_of_order_ids_are_appended(self):
+        """Тест что id не по порядку дописываются без перестройки индекса."""
+        self.graph.upsert(10, 1)
+        with mock.patch.object(self.graph, "load") as load:
+            self.graph.upsert(7, 10)
+            self.graph.upsert(8, None)
+        load.assert_not_called()
+        self.assertTrue(self.graph.contains(7))
+        self.assertEqual(self.graph.ancestors(7), [10, 1])
+        self.assertEqual(self.graph.bfs(10), [(7, 1)])
+        self.assertIn([1, 10, 7], self.graph.longest_chains(limit=2))
+
+    def test_cycle_detection(self):
+        """Тест обнаружения циклов поставщиков."""
+        self.graph.upsert(1, 4)
+        self.assertEqual(sorted(self.graph.find_cycles()[0]), [1, 2, 4])
+        self.assertEqual(self.graph.depth(3), -1)
+        # Обход не зацикливается
+        self.assertEqual(self.graph.bfs(1), [(2, 1), (3, 1), (4, 2)])
+
+
+class SupplyGraphAPITest(APITestCase):
+    """Тесты аналитических endpoints графа поставок."""
+
+    def setUp(self):
+        """Настройка тестовых данных."""
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_active=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        node_data = {
+            "email": "node@example.com",
+            "country": "Россия",
+            "city": "Москва",
+            "street": "Ленина",
+            "house_number": "1",
+        }
+        self.factory = NetworkNode.objects.create(
+            name="Завод", node_type="factory", **node_data
+        )
+        self.retail = NetworkNode.objects.create(
+            name="Сеть", node_type="retail", supplier=self.factory, **node_data
+        )
+        self.entrepreneur = NetworkNode.objects.create(
+            name="ИП", node_type="entrepreneur", supplier=self.retail, **node_data
+        )
+        get_supply_graph().reset()
+
+    def test_descendants_endpoint(self):
+        """Тест получения потребителей узла с фильтром по типу."""
+        response = self.client.get(
+            f"/api/network-nodes/{self.factory.id}/descendants/?max_depth=3"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item["name"], item["depth"]) for item in response.data["results"]],
+            [("Сеть", 1), ("ИП", 2)],
+        )
+
+        response = self.client.get(
+            f"/api/network-nodes/{self.factory.id}/descendants/?descendant_type=retail"
+        )
+        self.assertEqual([item["name"] for item in response.data["results"]], ["Сеть"])
+
+    def test_descendants_invalid_depth(self):
+        """Тест валидации параметра max_depth."""
+        response = self.client.get(
+            f"/api/network-nodes/{self.factory.id}/descendants/?max_depth=abc"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_graph_stats_endpoint(self):
+        """Тест сводной аналитики графа."""
+        response = self.client.get("/api/network-nodes/graph-stats/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["nodes"], 3)
+        self.assertEqual(response.data["max_depth"], 2)
+        self.assertEqual(
+            response.data["longest_chains"][0],
+            [self.factory.id, self.retail.id, self.entrepreneur.id],
+        )
+
+    @override_settings(SUPPLY_GRAPH_MAX_STALENESS=0)
+    def test_graph_refreshed_from_change_events(self):
+        """Тест обновления загруженного индекса событиями outbox."""
+        graph = get_supply_graph()
+        self.entrepreneur.supplier = self.factory
+        self.entrepreneur.save()
+        self.assertIs(get_supply_graph(), graph)
+        self.assertEqual(graph.depth(self.entrepreneur.id), 1)
+
+        # Массовые изменения не вызывают сигналы, но пишут события
+        NetworkNode.objects.filter(pk=self.entrepreneur.pk).update(supplier=None)
+        get_supply_graph()
+        self.assertEqual(graph.depth(self.entrepreneur.id), 0)
+
+        batched_delete_nodes(NetworkNode.objects.filter(pk=self.retail.pk), sleep=0)
+        get_supply_graph()
+        self.assertFalse(graph.contains(self.retail.id))
+        self.assertEqual(graph.cursor, ChangeEvent.objects.latest("id").id)
+
+    def test_readers_not_blocked_during_load(self):
+        """Тест что обходы во время загрузки работают с прежним индексом."""
+        graph = get_supply_graph()
+        seen = []
+
+        def rows():
+            reader = threading.Thread(
+                target=lambda: seen.append(graph.bfs(self.factory.id))
+            )
+            reader.start()
+            reader.join(timeout=5)
+            self.assertFalse(reader.is_alive())
+            yield (self.factory.id, None, "factory")
+
+        graph.load(rows())
+        self.assertEqual(seen, [[(self.retail.id, 1), (self.entrepreneur.id, 2)]])
+        self.assertEqual(len(graph), 1)
+
+    @override_settings(SUPPLY_GRAPH_MAX_STALENESS=0, SUPPLY_GRAPH_MAX_AGE=0)
+    def test_stale_graph_reloaded_in_background(self):
+        """Тест что периодическая перезагрузка не выполняется в запросе."""
+        graph = get_supply_graph()
+        with mock.patch("networknode.graph._reload_in_background") as reload:
+            with self.assertNumQueries(0):
+                self.assertIs(get_supply_graph(), graph)
+        reload.assert_called_once_with(graph)
+        graph._sync_lock.release()
+
+
+class SupplierHierarchyValidationTest(APITestCase):
+    """Тесты защиты от циклов поставщиков и ограничения глубины иерархии."""
+
+    def setUp(self):
+        """Цепочка: завод -> сеть -> ИП, плюс отдельный завод."""
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_active=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        node_data = {
+            "email": "node@example.com",
+            "country": "Россия",
+            "city": "Москва",
+            "street": "Ленина",
+            "house_number": "1",
+        }
+        self.factory = NetworkNode.objects.create(
+            name="Завод", node_type="factory", **node_data
+        )
+        self.retail = NetworkNode.objects.create(
+            name="Сеть", node_type="retail", supplier=self.factory, **node_data
+        )
+        self.entrepreneur = NetworkNode.objects.create(
+            name="ИП", node_type="entrepreneur", supplier=self.retail, **node_data
+        )
+        self.other_factory = NetworkNode.objects.create(
+            name="Другой завод", node_type="factory", **node_data
+        )
+
+    def test_api_rejects_descendant_as_supplier(self):
+        """Тест что API не позволяет сделать потребителя поставщиком."""
+        response = self.client.patch(
+            f"/api/network-nodes/{self.factory.id}/",
+            {"supplier": self.entrepreneur.id},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("supplier", response.data)
+        self.factory.refresh_from_db()
+        self.assertIsNone(self.factory.supplier_id)
+
+    def test_api_rejects_self_as_supplier(self):
+        """Тест что узел не может быть поставщиком самому себе."""
+        response = self.client.patch(
+            f"/api/network-nodes/{self.retail.id}/", {"supplier": self.retail.id}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_api_rejects_too_deep_hierarchy(self):
+        """Тест ограничения иерархии тремя уровнями."""
+        response = self.client.post(
+            "/api/network-nodes/",
+            {
+                "name": "Четвертый уровень",
+                "node_type": "entrepreneur",
+                "email": "deep@example.com",
+                "country": "Россия",
+                "city": "Казань",
+                "street": "Баумана",
+                "house_number": "10",
+                "supplier": self.entrepreneur.id,
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Перенос сети с потребителем под другую сеть тоже дает 4 уровня
+        response = self.client.patch(
+            f"/api/network-nodes/{self.other_factory.id}/",
+            {"supplier": self.entrepreneur.id},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_api_allows_valid_supplier_change(self):
+        """Тест допустимой смены поставщика."""
+        response = self.client.patch(
+            f"/api/network-nodes/{self.retail.id}/",
+            {"supplier": self.other_factory.id},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.retail.refresh_from_db()
+        self.assertEqual(self.retail.supplier, self.other_factory)
+
+    def test_model_save_validates_supplier(self):
+        """Тест проверки при прямом сохранении модели."""
+        self.factory.supplier = self.entrepreneur
+        with self.assertRaises(ValidationError):
+            self.factory.save()
+
+    def test_admin_form_validates_supplier(self):
+        """Тест проверки при сохранении через форму админки."""
+        model_admin = NetworkNodeAdmin(NetworkNode, AdminSite())
+        form_class = model_admin.get_form(None, self.factory)
+        form = form_class(
+            instance=self.factory,
+            data={
+                "name": self.factory.name,
+                "node_type": self.factory.node_type,
+                "email": self.factory.email,
+                "country": self.factory.country,
+                "city": self.factory.city,
+                "street": self.factory.street,
+                "house_number": self.factory.house_number,
+                "supplier": self.entrepreneur.id,
+                "debt": "0",
+            },
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("supplier", form.errors)
+
+    def test_bulk_update_validates_supplier(self):
+        """Тест проверки при массовом обновлении queryset."""
+        with self.assertRaises(ValidationError):
+            NetworkNode.objects.filter(pk=self.factory.pk).update(
+                supplier=self.entrepreneur
+            )
+        self.factory.supplier = self.retail
+        with self.assertRaises(ValidationError):
+            NetworkNode.objects.bulk_update([self.factory], ["supplier"])
+
+    def test_valid_bulk_update_changes_supplier(self):
+        """Тест что корректный bulk_update поставщиков выполняется."""
+        self.entrepreneur.supplier = self.factory
+        self.retail.supplier = self.other_factory
+        NetworkNode.objects.bulk_update([self.entrepreneur, self.retail], ["supplier"])
+
+        self.entrepreneur.refresh_from_db()
+        self.retail.refresh_from_db()
+        self.assertEqual(self.entrepreneur.supplier_id, self.factory.pk)
+        self.assertEqual(self.retail.supplier_id, self.other_factory.pk)
+
+    def test_bulk_update_rejects_cycle_within_batch(self):
+        """Тест что цикл из изменений одного набора отклоняется."""
+        self.factory.supplier = self.other_factory
+        self.other_factory.supplier = self.factory
+        with self.assertRaises(ValidationError):
+            NetworkNode.objects.bulk_update(
+                [self.factory, self.other_factory], ["supplier"]
+            )
+
+        self.factory.refresh_from_db()
+        self.other_factory.refresh_from_db()
+        self.assertIsNone(self.factory.supplier_id)
+        self.assertIsNone(self.other_factory.supplier_id)
+
+    def test_bulk_update_rejects_depth_within_batch(self):
+        """Тест что глубина считается с учетом других изменений набора."""
+        # По отдельности каждый перенос допустим, вместе - 4 уровня
+        self.other_factory.supplier = self.entrepreneur
+        self.factory.supplier = None
+        leaf = NetworkNode.objects.create(
+            name="Новый ИП",
+            node_type="entrepreneur",
+            email="leaf@example.com",
+            country="Россия",
+            city="Москва",
+            street="Ленина",
+            house_number="2",
+        )
+        leaf.supplier = self.other_factory
+        with self.assertRaises(ValidationError):
+            NetworkNode.objects.bulk_update([self.other_factory, leaf], ["supplier"])
+
+    def test_update_with_expression_is_rejected(self):
+        """Тест что непроверяемое выражение для supplier не принимается."""
+        with self.assertRaises(ValueError):
+            NetworkNode.objects.filter(pk=self.retail.pk).update(
+                supplier=models.F("id")
+            )
+
+    def test_hierarchy_level_survives_existing_cycle(self):
+        """Тест что поврежденные данные с циклом не вызывают RecursionError."""
+        # Обходим проверки, имитируя данные, созданные до их появления
+        super(
+            NetworkNodeQuerySet, NetworkNode.objects.filter(pk=self.factory.pk)
+        ).update(supplier=self.entrepreneur)
+        node = NetworkNode.objects.get(pk=self.retail.pk)
+        self.assertEqual(node.hierarchy_level, 2)
+
+
+class JobQueueTest(APITestCase):
+    """Тесты очереди фоновых задач и команды run_workers."""
+
+    def setUp(self):
+        """Настройка тестовых данных."""
+        self.export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.export_dir, ignore_errors=True)
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_active=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        node_data = {
+            "node_type": "retail",
+            "email": "node@example.com",
+            "country": "Россия",
+            "street": "Ленина",
+            "house_number": "1",
+            "debt": 100,
+        }
+        self.moscow = NetworkNode.objects.create(
+            name="Москва 1", city="Москва", **node_data
+        )
+        self.kazan = NetworkNode.objects.create(
+            name="Казань 1", city="Казань", **node_data
+        )
+
+    def run_workers(self):
+        """Выполняет все задачи из очереди в текущем потоке."""
+        call_command("run_workers", "--once", stdout=StringIO())
+
+    def test_bulk_clear_debt_is_enqueued_and_processed(self):
+        """Тест что массовая очистка выполняется воркером, а не в запросе."""
+        response = self.client.post(
+            "/api/network-nodes/bulk_clear_debt/",
+            {"ids": [self.moscow.id]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], Job.PENDING)
+        self.moscow.refresh_from_db()
+        self.assertEqual(self.moscow.debt, 100)
+
+        self.run_workers()
+
+        self.moscow.refresh_from_db()
+        self.kazan.refresh_from_db()
+        self.assertEqual(self.moscow.debt, 0)
+        self.assertEqual(self.kazan.debt, 100)
+
+        response = self.client.get(f"/api/jobs/{response.data['id']}/")
+        self.assertEqual(response.data["status"], Job.DONE)
+        self.assertEqual(response.data["progress"], 100)
+        self.assertEqual(response.data["result"], {"updated": 1})
+
+    def test_bulk_clear_debt_requires_selection(self):
+        """Тест что очистка без ids и фильтров отклоняется."""
+        response = self.client.post("/api/network-nodes/bulk_clear_debt/", {})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_clear_debt_rejects_bad_filters(self):
+        """Тест что пустой, некорректный и неизвестный фильтр отклоняются."""
+        for query in ["country=", "node_type=bogus", "contry=X"]:
+            with self.subTest(query=query):
+                response = self.client.post(
+                    f"/api/network-nodes/bulk_clear_debt/?{query}", {}
+                )
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                response = self.client.post(f"/api/network-nodes/export/?{query}")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
+
+    def test_stored_job_with_bad_filters_fails(self):
+        """Тест что задача с некорректными фильтрами не обрабатывает все узлы."""
+        job = enqueue("clear_debt", {"filters": {"node_type": "bogus"}}, self.user)
+        self.run_workers()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.moscow.refresh_from_db()
+        self.assertEqual(self.moscow.debt, 100)
+
+    def test_export_with_filters_and_download(self):
+        """Тест выгрузки узлов в CSV с учетом фильтров."""
+        with override_settings(JOB_EXPORT_DIR=self.export_dir):
+            response = self.client.post("/api/network-nodes/export/?city=Казань")
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            job_id = response.data["id"]
+            self.run_workers()
+
+            response = self.client.get(f"/api/jobs/{job_id}/")
+            self.assertEqual(response.data["result"]["rows"], 1)
+
+            response = self.client.get(f"/api/jobs/{job_id}/download/")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            content = b"".join(response.streaming_content).decode("utf-8")
+            self.assertIn("Казань 1", content)
+            self.assertNotIn("Москва 1", content)
+
+    def test_jobs_are_visible_only_to_author(self):
+        """Тест что сотрудник не видит чужие задачи."""
+        job = enqueue("clear_debt", {"ids": [self.moscow.id]}, self.user)
+        other = User.objects.create_user(username="other", password="testpass123")
+        self.client.force_authenticate(user=other)
+        response = self.client.get(f"/api/jobs/{job.id}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_failed_job_records_error(self):
+        """Тест что ошибка обработчика сохраняется в задаче."""
+        job = enqueue("clear_debt", {"ids": [self.moscow.id]}, self.user)
+        with mock.patch.dict(
+            "networknode.jobs.JOB_HANDLERS",
+            {"clear_debt": mock.Mock(side_effect=RuntimeError("сбой"))},
+        ):
+            self.run_workers()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn("сбой", job.error)
+
+    @override_settings(JOBS_SYNC_LIMIT=1)
+    def test_admin_clear_debt_enqueues_large_selection(self):
+        """Тест что действие админки ставит в очередь фильтр, а не список id."""
+        NetworkNode.objects.create(
+            name="Москва 2",
+            city="Москва",
+            node_type="retail",
+            email="node@example.com",
+            country="Россия",
+            street="Ленина",
+            house_number="2",
+            debt=100,
+        )
+        model_admin = NetworkNodeAdmin(NetworkNode, AdminSite())
+        request = RequestFactory().post(
+            "/admin/networknode/networknode/?city=Москва&q=Москва&o=1"
+        )
+        request.user = self.user
+        with mock.patch.object(model_admin, "message_user"):
+            model_admin.clear_debt(request, NetworkNode.objects.filter(city="Москва"))
+
+        job = Job.objects.get()
+        self.assertEqual(job.kind, "clear_debt")
+        self.assertNotIn("ids", job.params)
+        self.assertEqual(job.params["lookups"], {"city": ["Москва"]})
+        self.assertEqual(job.params["search"]["term"], "Москва")
+
+        self.run_workers()
+        self.assertEqual(
+            sorted(NetworkNode.objects.values_list("city", "debt")),
+            [("Казань", 100), ("Москва", 0), ("Москва", 0)],
+        )
+
+    def test_stale_running_job_is_requeued(self):
+        """Тест что задача упавшего воркера возвращается в очередь."""
+        job = enqueue("clear_debt", {"ids": [self.moscow.id]}, self.user)
+        self.assertEqual(claim_next_job("dead-worker").pk, job.pk)
+        Job.objects.filter(pk=job.pk).update(
+            heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.run_workers()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 2)
+        self.moscow.refresh_from_db()
+        self.assertEqual(self.moscow.debt, 0)
+
+    @override_settings(JOB_MAX_ATTEMPTS=1)
+    def test_stale_job_fails_after_max_attempts(self):
+        """Тест что задача, ронявшая воркер, не перезапускается бесконечно."""
+        job = enqueue("clear_debt", {"ids": [self.moscow.id]}, self.user)
+        claim_next_job("dead-worker")
+        Job.objects.filter(pk=job.pk).update(
+            heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertEqual(requeue_stale_jobs(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_requeued_job_result_is_not_overwritten(self):
+        """Тест что воркер с истекшей арендой не записывает итог задачи."""
+        job = enqueue("clear_debt", {"ids": [self.moscow.id]}, self.user)
+        claimed = claim_next_job("slow-worker")
+        Job.objects.filter(pk=job.pk).update(
+            heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+        requeue_stale_jobs()
+
+        run_job(claimed)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+
+    def test_progress_extends_lease(self):
+        """Тест что отчет о прогрессе продлевает аренду задачи."""
+        job = enqueue("clear_debt", {"ids": [self.moscow.id]}, self.user)
+        job = claim_next_job("worker")
+        Job.objects.filter(pk=job.pk).update(
+            heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+        job.report_progress(1, 2)
+
+        self.assertEqual(requeue_stale_jobs(), (0, 0))
+
+
+class BatchedMassOperationsTest(TestCase):
+    """Тесты пакетных массовых изменений и удалений."""
+
+    def setUp(self):
+        """Завод с тремя зависимыми сетями и продуктами."""
+        node_data = {
+            "email": "node@example.com",
+            "country": "Россия",
+            "city": "Москва",
+            "street": "Ленина",
+            "house_number": "1",
+            "debt": 100,
+        }
+        self.factory = NetworkNode.objects.create(
+            name="Завод", node_type="factory", **node_data
+        )
+        self.retails = [
+            NetworkNode.objects.create(
+                name=f"Сеть {index}",
+                node_type="retail",
+                supplier=self.factory,
+                **node_data,
+            )
+            for index in range(3)
+        ]
+        for index in range(3):
+            Product.objects.create(
+                name=f"Продукт {index}",
+                model="X",
+                release_date=date(2023, 1, 1),
+                network_node=self.factory,
+            )
+
+    def test_iter_pk_batches(self):
+        """Тест keyset-итерации по первичному ключу."""
+        batches = list(iter_pk_batches(NetworkNode.objects.all(), 3))
+        self.assertEqual([len(batch) for batch in batches], [3, 1])
+        self.assertEqual(
+            sorted(pk for batch in batches for pk in batch),
+            sorted(NetworkNode.objects.values_list("pk", flat=True)),
+        )
+
+    def test_batched_update_reports_progress(self):
+        """Тест пакетного обновления с отчетом о прогрессе."""
+        progress = []
+        updated = batched_update(
+            NetworkNode.objects.filter(debt__gt=0),
+            {"debt": 0},
+            batch_size=2,
+            sleep=0,
+            progress=lambda done, total: progress.append((done, total)),
+        )
+        self.assertEqual(updated, 4)
+        self.assertEqual(progress, [(0, 4), (2, 4), (4, 4)])
+        self.assertFalse(NetworkNode.objects.filter(debt__gt=0).exists())
+
+    def test_batched_delete_detaches_dependents_and_products(self):
+        """Тест пакетного удаления поставщика с зависимыми узлами и продуктами."""
+        deleted = batched_delete_nodes(
+            NetworkNode.objects.filter(pk=self.factory.pk), batch_size=2, sleep=0
+        )
+        self.assertEqual(deleted, 1)
+        self.assertFalse(Product.objects.exists())
+        self.assertEqual(NetworkNode.objects.filter(supplier__isnull=True).count(), 3)
+
+    def test_batched_delete_is_resumable(self):
+        """Тест что прерванное удаление дочищается повторным запуском."""
+        archive_products(Product.objects.filter(name="Продукт 0"))
+        with mock.patch.object(
+            NetworkNodeQuerySet, "bulk_delete", side_effect=RuntimeError("сбой")
+        ):
+            with self.assertRaises(RuntimeError):
+                batched_delete_nodes(
+                    NetworkNode.objects.filter(pk=self.factory.pk),
+                    batch_size=2,
+                    sleep=0,
+                )
+        # Шаги до сбоя зафиксированы, узел остался
+        self.assertTrue(NetworkNode.objects.filter(pk=self.factory.pk).exists())
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(NetworkNode.objects.filter(supplier=self.factory).exists())
+
+        batched_delete_nodes(
+            NetworkNode.objects.filter(pk=self.factory.pk), batch_size=2, sleep=0
+        )
+        self.assertFalse(NetworkNode.objects.filter(pk=self.factory.pk).exists())
+        self.assertFalse(ArchivedProduct.objects.exists())
+        self.assertTrue(NodeTombstone.objects.filter(node_id=self.factory.pk).exists())
+        self.assertEqual(
+            ChangeEvent.objects.filter(
+                model="networknode", object_id=self.factory.pk, action="delete"
+            ).count(),
+            1,
+        )
+        stats = NodeStats.objects.get(
+            country="Россия", city="Москва", node_type="factory"
+        )
+        self.assertEqual((stats.node_count, stats.product_count), (0, 0))
+
+    def test_batched_delete_queries_do_not_grow_with_products(self):
+        """Тест что число запросов удаления не зависит от числа продуктов."""
+
+        def delete_with_products(count):
+            node = NetworkNode.objects.create(
+                name="Завод",
+                node_type="factory",
+                email="f@example.com",
+                country="Россия",
+                city="Тверь",
+                street="Ленина",
+                house_number="1",
+            )
+            Product.objects.bulk_create(
+                Product(
+                    name=f"Продукт {index}",
+                    model="X",
+                    release_date=date(2023, 1, 1),
+                    network_node=node,
+                )
+                for index in range(count)
+            )
+            with CaptureQueriesContext(connection) as queries:
+                batched_delete_nodes(
+                    NetworkNode.objects.filter(pk=node.pk), batch_size=1000, sleep=0
+                )
+            self.assertFalse(Product.objects.filter(network_node_id=node.pk).exists())
+            return len(queries)
+
+        self.assertEqual(delete_with_products(2), delete_with_products(50))
+
+    def test_admin_delete_selected_is_disabled(self):
+        """Тест что встроенное delete_selected убрано, а удаление пакетное."""
+        model_admin = NetworkNodeAdmin(NetworkNode, AdminSite())
+        request = RequestFactory().get("/admin/networknode/networknode/")
+        request.user = User.objects.create_superuser("admin", "a@example.com", "x")
+        actions = model_admin.get_actions(request)
+        self.assertNotIn("delete_selected", actions)
+        self.assertIn("delete_in_batches", actions)
+
+        with mock.patch(
+            "networknode.admin.batched_delete_nodes", wraps=batched_delete_nodes
+        ) as batched:
+            model_admin.delete_queryset(request, NetworkNode.objects.all())
+        batched.assert_called_once()
+        self.assertFalse(NetworkNode.objects.exists())
+
+    def test_clear_debt_command(self):
+        """Тест команды пакетной очистки задолженности."""
+        out = StringIO()
+        call_command(
+            "clear_debt", "--node-type", "retail", "--batch-size", "2", stdout=out
+        )
+        self.assertIn("Обработано 3 из 3", out.getvalue())
+        self.assertEqual(NetworkNode.objects.filter(debt=0).count(), 3)
+        self.factory.refresh_from_db()
+        self.assertEqual(self.factory.debt, 100)
+
+    def test_delete_nodes_command(self):
+        """Тест команды пакетного удаления узлов."""
+        out = StringIO()
+        call_command(
+            "delete_nodes", "--ids", str(self.factory.pk), "--dry-run", stdout=out
+        )
+        self.assertIn("Будет удалено узлов: 1", out.getvalue())
+        self.assertTrue(NetworkNode.objects.filter(pk=self.factory.pk).exists())
+
+        call_command("delete_nodes", "--ids", str(self.factory.pk), stdout=StringIO())
+        self.assertFalse(NetworkNode.objects.filter(pk=self.factory.pk).exists())
+        self.assertEqual(NetworkNode.objects.count(), 3)
+
+    def test_commands_require_selection(self):
+        """Тест что команды не обрабатывают все узлы без явного --all."""
+        with self.assertRaises(CommandError):
+            call_command("delete_nodes", stdout=StringIO())
+
+    def test_admin_delete_in_batches_action(self):
+        """Тест действия админки для пакетного удаления."""
+        model_admin = NetworkNodeAdmin(NetworkNode, AdminSite())
+        request = mock.Mock()
+        with mock.patch.object(model_admin, "message_user") as message_user:
+            model_admin.delete_in_batches(
+                request, NetworkNode.objects.filter(node_type="retail")
+            )
+        message_user.assert_called_once_with(request, "Удалено узлов: 3")
+        self.assertEqual(NetworkNode.objects.count(), 1)
+
+
+class ChangeFeedTest(APITestCase):
+    """Тесты outbox-ленты изменений NetworkNode и Product."""
+
+    def setUp(self):
+        """Настройка тестовых данных."""
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_active=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        node_data = {
+            "email": "node@example.com",
+            "country": "Россия",
+            "city": "Москва",
+            "street": "Ленина",
+            "house_number": "1",
+            "debt": 100,
+        }
+        self.factory = NetworkNode.objects.create(
+            name="Завод", node_type="factory", **node_data
+        )
+        self.retail = NetworkNode.objects.create(
+            name="Сеть", node_type="retail", supplier=self.factory, **node_data
+        )
+        self.product = Product.objects.create(
+            name="Смартфон",
+            model="X100",
+            release_date=date(2023, 1, 1),
+            network_node=self.factory,
+        )
+        self.cursor = ChangeEvent.objects.latest("id").id
+
+    def events_after_cursor(self):
+        """Возвращает (model, object_id, action) событий после курсора."""
+        return list(
+            ChangeEvent.objects.filter(id__gt=self.cursor).values_list(
+                "model", "object_id", "action"
+            )
+        )
+
+    def test_save_records_create_and_update(self):
+        """Тест событий create/update при save()."""
+        events = ChangeEvent.objects.values_list("model", "object_id", "action")
+        self.assertEqual(
+            list(events),
+            [
+                ("networknode", self.factory.id, "create"),
+                ("networknode", self.retail.id, "create"),
+                ("product", self.product.id, "create"),
+            ],
+        )
+        self.retail.name = "Новая сеть"
+        self.retail.save()
+        event = ChangeEvent.objects.latest("id")
+        self.assertEqual(event.action, "update")
+        self.assertEqual(event.payload["name"], "Новая сеть")
+
+    def test_queryset_update_records_events(self):
+        """Тест событий для массового update (clear_debt)."""
+        response = self.client.post(f"/api/network-nodes/{self.factory.id}/clear_debt/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        NetworkNode.objects.filter(pk=self.retail.pk).update(debt=0)
+        self.assertEqual(
+            self.events_after_cursor(),
+            [
+                ("networknode", self.factory.id, "update"),
+                ("networknode", self.retail.id, "update"),
+            ],
+        )
+        self.assertEqual(ChangeEvent.objects.latest("id").payload["debt"], "0.00")
+
+    def test_delete_records_cascades(self):
+        """Тест событий для удаления с SET_NULL и CASCADE."""
+        NetworkNode.objects.filter(pk=self.factory.pk).delete()
+        self.assertCountEqual(
+            self.events_after_cursor(),
+            [
+                ("networknode", self.retail.id, "update"),
+                ("product", self.product.id, "delete"),
+                ("networknode", self.factory.id, "delete"),
+            ],
+        )
+        detached = ChangeEvent.objects.get(
+            id__gt=self.cursor, object_id=self.retail.id, model="networknode"
+        )
+        self.assertIsNone(detached.payload["supplier_id"])
+
+    def test_rejected_change_has_no_event(self):
+        """Тест что отклоненное изменение не создает событие."""
+        self.factory.supplier = self.retail
+        with self.assertRaises(ValidationError):
+            self.factory.save()
+        self.assertEqual(self.events_after_cursor(), [])
+
+    def test_changes_endpoint_paginates_by_cursor(self):
+        """Тест курсорной выдачи /api/changes/."""
+        response = self.client.get("/api/changes/?since=0&limit=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertTrue(response.data["has_more"])
+
+        response = self.client.get(
+            f"/api/changes/?since={response.data['next_cursor']}&limit=2"
+        )
+        self.assertEqual(
+            [item["object_id"] for item in response.data["results"]],
+            [self.product.id],
+        )
+        self.assertFalse(response.data["has_more"])
+        self.assertEqual(response.data["next_cursor"], self.cursor)
+
+    def simulate_in_flight_event(self):
+        """
+        Имитирует событие незафиксированной транзакции.
+
+        Возвращает удаленное событие с меньшим id, чем последующее
+        видимое; его повторное сохранение имитирует позднюю фиксацию.
+        """
+        in_flight = ChangeEvent.objects.latest("id")
+        ChangeEvent.objects.filter(pk=in_flight.pk).delete()
+        self.retail.name = "Сеть 2"
+        self.retail.save()
+        return in_flight
+
+    def test_changes_endpoint_waits_for_out_of_order_commit(self):
+        """Тест что лента не пропускает событие, зафиксированное позже."""
+        in_flight = self.simulate_in_flight_event()
+        latest = ChangeEvent.objects.latest("id").id
+        since = self.cursor - 1
+
+        response = self.client.get(f"/api/changes/?since={since}")
+        self.assertEqual(response.data["results"], [])
+        self.assertEqual(response.data["next_cursor"], since)
+
+        in_flight.save()
+        response = self.client.get(f"/api/changes/?since={since}")
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [self.cursor, latest],
+        )
+        self.assertEqual(response.data["next_cursor"], latest)
+
+    def test_changes_endpoint_skips_old_gap(self):
+        """Тест что пропуск старше CHANGE_FEED_COMMIT_LAG считается откатом."""
+        self.simulate_in_flight_event()
+        latest = ChangeEvent.objects.latest("id").id
+        with override_settings(CHANGE_FEED_COMMIT_LAG=0):
+            response = self.client.get(f"/api/changes/?since={self.cursor - 1}")
+        self.assertEqual([item["id"] for item in response.data["results"]], [latest])
+        self.assertEqual(response.data["next_cursor"], latest)
+
+    def test_changes_endpoint_validates_cursor(self):
+        """Тест валидации курсора."""
+        response = self.client.get("/api/changes/?since=abc")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class WebhookStubHandler(BaseHTTPRequestHandler):
+    """Локальная заглушка webhook, сохраняющая полученные запросы."""
+
+    received = []
+    status_code = 200
+
+    def do_POST(self):
+        """Принимает POST-запрос с пакетом событий."""
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        type(self).received.append((dict(self.headers), body))
+        self.send_response(type(self).status_code)
+        self.end_headers()
+
+    def log_message(self, *args):
+        """Отключает логирование запросов заглушки."""
+
+
+class WebhookDeliveryTest(TestCase):
+    """Тесты пакетной доставки событий во внешние webhooks."""
+
+    def setUp(self):
+        """Запуск локального HTTP-сервера и создание данных."""
+        WebhookStubHandler.received = []
+        WebhookStubHandler.status_code = 200
+        self.server = HTTPServer(("127.0.0.1", 0), WebhookStubHandler)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.webhook = Webhook.objects.create(
+            url=f"http://127.0.0.1:{self.server.server_port}/hook", secret="s3cret"
+        )
+        for index in range(3):
+            NetworkNode.objects.create(
+                name=f"Завод {index}",
+                node_type="factory",
+                email="factory@example.com",
+                country="Россия",
+                city="Москва",
+                street="Ленина",
+                house_number="1",
+            )
+
+    def test_delivers_events_in_batches(self):
+        """Тест доставки событий пакетами с подписью и сдвигом курсора."""
+        delivered = deliver_pending(batch_size=2)
+        self.assertEqual(delivered, 3)
+        self.assertEqual(len(WebhookStubHandler.received), 2)
+
+        headers, body = WebhookStubHandler.received[0]
+        self.assertEqual(
+            headers["X-Signature"], f"sha256={sign_payload('s3cret', body)}"
+        )
+        events = json.loads(body)["events"]
+        self.assertEqual([event["action"] for event in events], ["create", "create"])
+
+        self.webhook.refresh_from_db()
+        self.assertEqual(
+            self.webhook.last_event_id, ChangeEvent.objects.latest("id").id
+        )
+        self.assertEqual(deliver_pending(), 0)
+
+    def test_waits_for_out_of_order_commit(self):
+        """Тест что доставка не перескакивает событие, зафиксированное позже."""
+        in_flight = ChangeEvent.objects.order_by("id")[1]
+        ChangeEvent.objects.filter(pk=in_flight.pk).delete()
+        self.assertEqual(deliver_pending(), 1)
+        self.webhook.refresh_from_db()
+        self.assertEqual(self.webhook.last_event_id, in_flight.id - 1)
+
+        in_flight.save()
+        self.assertEqual(deliver_pending(), 2)
+        events = json.loads(WebhookStubHandler.received[-1][1])["events"]
+        self.assertEqual(events[0]["id"], in_flight.id)
+
+    def test_failed_delivery_keeps_cursor(self):
+        """Тест что при ошибке курсор не сдвигается."""
+        WebhookStubHandler.status_code = 500
+        self.assertEqual(deliver_pending(), 0)
+        self.webhook.refresh_from_db()
+        self.assertEqual(self.webhook.last_event_id, 0)
+        self.assertIn("500", self.webhook.last_error)
+
+
+@override_settings(CHANGE_FEED_COMMIT_LAG=0)
+class DeltaSyncTest(APITestCase):
+    """Тесты режима дельта-синхронизации ?modified_since=."""
+
+    def setUp(self):
+        """Настройка тестовых данных."""
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_active=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        node_data = {
+            "email": "node@example.com",
+            "country": "Россия",
+            "street": "Ленина",
+            "house_number": "1",
+        }
+        self.factory = NetworkNode.objects.create(
+            name="Завод", node_type="factory", city="Москва", **node_data
+        )
+        self.retail = NetworkNode.objects.create(
+            name="Сеть",
+            node_type="retail",
+            city="Казань",
+            supplier=self.factory,
+            **node_data,
+        )
+        self.old = NetworkNode.objects.create(
+            name="Старый узел", node_type="factory", city="Москва", **node_data
+        )
+        self.since = timezone.now() - timedelta(minutes=5)
+        NetworkNode.objects.filter(pk=self.old.pk).update(
+            updated_at=self.since - timedelta(days=1)
+        )
+
+    def sync(self, **params):
+        """Выполняет запрос синхронизации."""
+        params.setdefault("modified_since", self.since.isoformat())
+        response = self.client.get("/api/network-nodes/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_returns_only_changed_nodes(self):
+        """Тест что возвращаются только узлы, измененные после метки."""
+        data = self.sync()
+        self.assertEqual(
+            [node["id"] for node in data["changed"]],
+            [self.factory.id, self.retail.id],
+        )
+        self.assertEqual(data["deleted"], [])
+        self.assertFalse(data["has_more"])
+
+        # Повторная синхронизация по курсору ничего не возвращает
+        data = self.sync(**data["next"])
+        self.assertEqual(data["changed"], [])
+
+    def test_returns_tombstones_and_set_null_updates(self):
+        """Тест отметок об удалении и обновления узлов, потерявших поставщика."""
+        cursor = self.sync()["next"]
+        factory_id = self.factory.id
+        self.factory.delete()
+        data = self.sync(**cursor)
+        self.assertEqual([node["id"] for node in data["changed"]], [self.retail.id])
+        self.assertIsNone(data["changed"][0]["supplier"])
+        self.assertEqual(data["deleted"], [factory_id])
+        self.assertTrue(NodeTombstone.objects.filter(node_id=factory_id).exists())
+
+    def test_keyset_pagination(self):
+        """Тест постраничной выдачи в keyset-порядке."""
+        data = self.sync(limit=1)
+        self.assertEqual([node["id"] for node in data["changed"]], [self.factory.id])
+        self.assertTrue(data["has_more"])
+        data = self.sync(limit=1, **data["next"])
+        self.assertEqual([node["id"] for node in data["changed"]], [self.retail.id])
+
+    def test_bulk_update_and_products_bump_updated_at(self):
+        """Тест что массовый update и изменение продуктов обновляют updated_at."""
+        cursor = self.sync()["next"]
+        NetworkNode.objects.filter(pk=self.old.pk).update(debt=0)
+        Product.objects.create(
+            name="Смартфон",
+            model="X100",
+            release_date=date(2023, 1, 1),
+            network_node=self.factory,
+        )
+        data = self.sync(**cursor)
+        self.assertCountEqual(
+            [node["id"] for node in data["changed"]], [self.old.id, self.factory.id]
+        )
+
+    def test_bulk_product_changes_bump_updated_at(self):
+        """Тест что массовые изменения продуктов попадают в дельту узлов."""
+        cursor = self.sync()["next"]
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name="Смартфон",
+                    model="X100",
+                    release_date=date(2023, 1, 1),
+                    network_node=self.old,
+                )
+            ]
+        )
+        data = self.sync(**cursor)
+        self.assertEqual([node["id"] for node in data["changed"]], [self.old.id])
+
+        # Перенос продуктов обновляет и прежний, и новый узел
+        Product.objects.filter(network_node=self.old).update(network_node=self.retail)
+        data = self.sync(**data["next"])
+        self.assertCountEqual(
+            [node["id"] for node in data["changed"]], [self.old.id, self.retail.id]
+        )
+
+        products = list(Product.objects.filter(network_node=self.retail))
+        for product in products:
+            product.name = "Планшет"
+        Product.objects.bulk_update(products, ["name"])
+        data = self.sync(**data["next"])
+        self.assertEqual([node["id"] for node in data["changed"]], [self.retail.id])
+
+    def test_sync_respects_filters(self):
+        """Тест что фильтры списка применяются к измененным узлам."""
+        data = self.sync(city="Казань")
+        self.assertEqual([node["id"] for node in data["changed"]], [self.retail.id])
+        self.assertEqual(data["deleted"], [self.factory.id])
+
+    def test_node_leaving_filter_is_reported_deleted(self):
+        """Тест что узел, переставший подходить под фильтр, выдается в deleted."""
+        cursor = self.sync(city="Казань")["next"]
+        self.retail.city = "Москва"
+        self.retail.save()
+        data = self.sync(city="Казань", **cursor)
+        self.assertEqual(data["changed"], [])
+        self.assertEqual(data["deleted"], [self.retail.id])
+
+    def test_recent_changes_are_held_back(self):
+        """Тест что next не обгоняет окно CHANGE_FEED_COMMIT_LAG."""
+        with override_settings(CHANGE_FEED_COMMIT_LAG=3600):
+            data = self.sync()
+        self.assertEqual(data["changed"], [])
+        self.assertEqual(data["next"]["modified_since"], self.since.isoformat())
+
+    def test_invalid_timestamp(self):
+        """Тест валидации метки времени."""
+        for value in ["вчера", "", "2025-13-45T00:00:00"]:
+            with self.subTest(value=value):
+                response = self.client.get(
+                    "/api/network-nodes/", {"modified_since": value}
+                )
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductArchiveTest(APITestCase):
+    """Тесты архивации старых продуктов."""
+
+    def setUp(self):
+        """Настройка тестовых данных."""
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_active=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.node = NetworkNode.objects.create(
+            name="Завод",
+            node_type="factory",
+            email="factory@example.com",
+            country="Россия",
+            city="Москва",
+            street="Ленина",
+            house_number="1",
+        )
+        self.old_products = [
+            Product.objects.create(
+                name=f"Старый {i}",
+                model="A1",
+                release_date=date(2010, 1, 1) + timedelta(days=i),
+                network_node=self.node,
+            )
+            for i in range(5)
+        ]
+        self.fresh = Product.objects.create(
+            name="Новый",
+            model="X100",
+            release_date=date(2024, 1, 1),
+            network_node=self.node,
+        )
+
+    def test_archive_moves_old_products_in_batches(self):
+        """Тест что старые продукты переносятся в архив пакетами."""
+        progress = []
+        archived = archive_products(
+            Product.objects.filter(release_date__lt=date(2020, 1, 1)),
+            batch_size=2,
+            progress=lambda done, total: progress.append((done, total)),
+        )
+        self.assertEqual(archived, 5)
+        self.assertEqual(progress, [(0, 5), (2, 5), (4, 5), (5, 5)])
+        self.assertEqual(list(Product.objects.all()), [self.fresh])
+        self.assertCountEqual(
+            ArchivedProduct.objects.values_list("original_id", flat=True),
+            [product.id for product in self.old_products],
+        )
+
+    def test_command_archives_before_date(self):
+        """Тест команды archive_products с --before и --dry-run."""
+        out = StringIO()
+        call_command(
+            "archive_products", "--before", "2020-01-01", "--dry-run", stdout=out
+        )
+        self.assertIn("5", out.getvalue())
+        self.assertEqual(ArchivedProduct.objects.count(), 0)
+
+        call_command(
+            "archive_products",
+            "--before",
+            "2020-01-01",
+            "--batch-size",
+            "3",
+            stdout=out,
+        )
+        self.assertEqual(ArchivedProduct.objects.count(), 5)
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_api_returns_hot_set_by_default(self):
+        """Тест что API по умолчанию не читает архив, а по запросу включает его."""
+        archive_products(Product.objects.filter(release_date__lt=date(2020, 1, 1)))
+        url = f"/api/network-nodes/{self.node.id}/"
+
+        response = self.client.get(url)
+        self.assertEqual([p["id"] for p in response.data["products"]], [self.fresh.id])
+        self.assertNotIn("archived_products", response.data)
+
+        response = self.client.get(url, {"include_archived": "1"})
+        self.assertCountEqual(
+            [p["id"] for p in response.data["archived_products"]],
+            [product.id for product in self.old_products],
+        )
+
+    def test_list_query_count_does_not_grow_with_archive(self):
+        """Тест что список узлов с архивом загружается фиксированным числом запросов."""
+        archive_products(Product.objects.filter(release_date__lt=date(2020, 1, 1)))
+        with self.assertNumQueries(5):
+            response = self.client.get("/api/network-nodes/", {"include_archived": "1"})
+        self.assertEqual(len(response.data["results"][0]["archived_products"]), 5)
+
+    def test_restore_returns_products_with_same_ids(self):
+        """Тест восстановления продуктов из архива."""
+        archive_products(Product.objects.filter(release_date__lt=date(2020, 1, 1)))
+        restored = restore_products(ArchivedProduct.objects.all())
+        self.assertEqual(restored, 5)
+        self.assertEqual(ArchivedProduct.objects.count(), 0)
+        self.assertCountEqual(
+            Product.objects.values_list("id", flat=True),
+            [product.id for product in self.old_products] + [self.fresh.id],
+        )
+
+    def product_count(self):
+        """Возвращает product_count группы узла в NodeStats."""
+        return NodeStats.objects.get(
+            country="Россия", city="Москва", node_type="factory"
+        ).product_count
+
+    def test_archive_and_restore_record_move_events(self):
+        """Тест что перенос в архив и обратно пишет archive/restore и не меняет NodeStats."""
+        cursor = ChangeEvent.objects.latest("id").id
+        archive_products(Product.objects.filter(release_date__lt=date(2020, 1, 1)))
+        events = ChangeEvent.objects.filter(id__gt=cursor, model="product")
+        self.assertCountEqual(
+            events.values_list("object_id", "action"),
+            [(product.id, "archive") for product in self.old_products],
+        )
+        self.assertEqual(self.product_count(), 6)
+
+        cursor = ChangeEvent.objects.latest("id").id
+        restore_products(ArchivedProduct.objects.all())
+        events = ChangeEvent.objects.filter(id__gt=cursor, model="product")
+        self.assertCountEqual(
+            events.values_list("object_id", "action"),
+            [(product.id, "restore") for product in self.old_products],
+        )
+        self.assertEqual(self.product_count(), 6)
+
+    def test_archived_products_follow_node_in_stats(self):
+        """Тест что архивные продукты учитываются при смене группы и удалении узла."""
+        archive_products(Product.objects.filter(release_date__lt=date(2020, 1, 1)))
+        self.node.city = "Тверь"
+        self.node.save()
+        self.assertEqual(
+            NodeStats.objects.get(city="Тверь", node_type="factory").product_count, 6
+        )
+        self.assertEqual(self.product_count(), 0)
+
+        batched_delete_nodes(NetworkNode.objects.filter(pk=self.node.pk), sleep=0)
+        self.assertFalse(NodeStats.objects.filter(product_count__gt=0).exists())
+
+
+class SupplyChainFieldTest(APITestCase):
+    """Тесты необязательного поля supply_chain."""
+
+    def setUp(self):
+        """Настройка тестовых данных."""
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_active=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        node_data = {
+            "email": "node@example.com",
+            "country": "Россия",
+            "city": "Москва",
+            "street": "Ленина",
+            "house_number": "1",
+        }
+        self.factory = NetworkNode.objects.create(
+            name="Завод", node_type="factory", **node_data
+        )
+        self.retail = NetworkNode.objects.create(
+            name="Сеть", node_type="retail", supplier=self.factory, **node_data
+        )
+        self.entrepreneurs = [
+            NetworkNode.objects.create(
+                name=f"ИП {i}",
+                node_type="entrepreneur",
+                supplier=self.retail,
+                **node_data,
+            )
+            for i in range(3)
+        ]
+
+    def test_chains_are_ordered_from_factory(self):
+        """Тест что цепочка идет от завода к непосредственному поставщику."""
+        chains = get_supply_chains(
+            [self.factory.id, self.retail.id, self.entrepreneurs[0].id]
+        )
+        self.assertNotIn(self.factory.id, chains)
+        self.assertEqual(
+            chains[self.retail.id],
+            [{"id": self.factory.id, "name": "Завод", "node_type": "factory"}],
+        )
+        self.assertEqual(
+            [item["id"] for item in chains[self.entrepreneurs[0].id]],
+            [self.factory.id, self.retail.id],
+        )
+
+    def test_field_is_opt_in(self):
+        """Тест что supply_chain выводится только при ?include=supply_chain."""
+        url = f"/api/network-nodes/{self.entrepreneurs[0].id}/"
+        self.assertNotIn("supply_chain", self.client.get(url).data)
+
+        response = self.client.get(url, {"include": "supply_chain"})
+        self.assertEqual(
+            [item["name"] for item in response.data["supply_chain"]],
+            ["Завод", "Сеть"],
+        )
+
+    def test_page_is_resolved_with_one_query(self):
+        """Тест что цепочки всей страницы загружаются одним запросом."""
+        # count, узлы с поставщиками, продукты, цепочки и счетчики потребителей
+        with self.assertNumQueries(4 + 5):
+            response = self.client.get(
+                "/api/network-nodes/", {"include": "supply_chain"}
+            )
+        nodes = {node["id"]: node for node in response.data["results"]}
+        self.assertEqual(nodes[self.factory.id]["supply_chain"], [])
+        self.assertEqual(
+            [item["id"] for item in nodes[self.entrepreneurs[2].id]["supply_chain"]],
+            [self.factory.id, self.retail.id],
+        )
+        self.assertEqual(nodes[self.entrepreneurs[2].id]["hierarchy_level"], 2)
+
+    def test_cycle_in_existing_data_is_cut(self):
+        """Тест что цикл в уже существующих данных не зацикливает цепочку."""
+        NetworkNode._base_manager.filter(pk=self.factory.pk).update(
+            supplier=self.entrepreneurs[0]
+        )
+        chains = get_supply_chains([self.retail.id])
+        self.assertEqual(
+            [item["id"] for item in chains[self.retail.id]],
+            [self.entrepreneurs[0].id, self.factory.id],
+        )
+
+
+class NodeStatsTest(APITestCase):
+    """Тесты сводной статистики NodeStats и endpoint /api/stats/geo/."""
+
+    def setUp(self):
+        """Настройка тестовых данных."""
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_active=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        node_data = {
+            "email": "node@example.com",
+            "street": "Ленина",
+            "house_number": "1",
+        }
+        self.factory = NetworkNode.objects.create(
+            name="Завод",
+            node_type="factory",
+            country="Россия",
+            city="Москва",
+            debt=Decimal("100.00"),
+            **node_data,
+        )
+        self.retail = NetworkNode.objects.create(
+            name="Сеть",
+            node_type="retail",
+            country="Россия",
+            city="Казань",
+            supplier=self.factory,
+            debt=Decimal("50.50"),
+            **node_data,
+        )
+        self.foreign = NetworkNode.objects.create(
+            name="ИП",
+            node_type="entrepreneur",
+            country="Беларусь",
+            city="Минск",
+            debt=Decimal("10.00"),
+            **node_data,
+        )
+        Product.objects.create(
+            name="Смартфон",
+            model="X100",
+            release_date=date(2023, 1, 1),
+            network_node=self.retail,
+        )
+
+    def assertStatsConsistent(self):
+        """Проверяет, что инкрементальная статистика совпадает с пересчетом."""
+        expected = {
+            key: (nodes, products, debt)
+            for key, (nodes, products, debt) in node_totals(
+                NetworkNode.objects.all()
+            ).items()
+        }
+        actual = {
+            (row.country, row.city, row.node_type): (
+                row.node_count,
+                row.product_count,
+                row.total_debt,
+            )
+            for row in NodeStats.objects.all()
+            if row.node_count or row.product_count or row.total_debt
+        }
+        self.assertEqual(actual, expected)
+
+    def test_incremental_updates_match_rebuild(self):
+        """Тест что сохранения, удаления и массовые изменения обновляют статистику."""
+        self.assertStatsConsistent()
+
+        self.retail.city = "Самара"
+        self.retail.save()
+        self.assertStatsConsistent()
+
+        NetworkNode.objects.filter(country="Россия").update(debt=0)
+        self.assertStatsConsistent()
+
+        NetworkNode.objects.filter(pk=self.foreign.pk).update(country="Россия")
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name=f"Ноутбук {i}",
+                    model="L1",
+                    release_date=date(2024, 1, 1),
+                    network_node=self.foreign,
+                )
+                for i in range(3)
+            ]
+        )
+        self.assertStatsConsistent()
+
+        Product.objects.filter(network_node=self.foreign).update(
+            network_node=self.factory
+        )
+        self.assertStatsConsistent()
+
+        self.factory.delete()
+        self.assertStatsConsistent()
+
+    def test_rebuild_command(self):
+        """Тест полного пересчета командой refresh_node_stats."""
+        NodeStats.objects.all().delete()
+        out = StringIO()
+        call_command("refresh_node_stats", stdout=out)
+        self.assertIn("групп: 3", out.getvalue())
+        self.assertStatsConsistent()
+        self.assertEqual(rebuild_node_stats(), 3)
+
+    def test_geo_endpoint_drill_down(self):
+        """Тест детализации страна -> город -> тип звена."""
+        response = self.client.get("/api/stats/geo/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["group_by"], "country")
+        self.assertEqual(response.data["totals"]["node_count"], 3)
+        russia = next(
+            row for row in response.data["results"] if row["country"] == "Россия"
+        )
+        self.assertEqual(russia["node_count"], 2)
+        self.assertEqual(russia["product_count"], 1)
+        self.assertEqual(russia["total_debt"], "150.50")
+
+        response = self.client.get("/api/stats/geo/", {"country": "Россия"})
+        self.assertEqual(response.data["group_by"], "city")
+        self.assertEqual(
+            [row["city"] for row in response.data["results"]], ["Казань", "Москва"]
+        )
+
+        response = self.client.get(
+            "/api/stats/geo/", {"country": "Россия", "city": "Казань"}
+        )
+        self.assertEqual(response.data["group_by"], "node_type")
+        self.assertEqual(
+            [row["node_type"] for row in response.data["results"]], ["retail"]
+        )
+
+    def test_geo_endpoint_reads_only_summary_table(self):
+        """Тест что endpoint не обращается к таблице узлов."""
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/stats/geo/", {"node_type": "factory"})
+        self.assertEqual(response.data["totals"]["node_count"], 1)
+
+    def test_invalid_group_by(self):
+        """Тест валидации параметра group_by."""
+        response = self.client.get("/api/stats/geo/", {"group_by": "street"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_city_filter_uses_summary_table(self):
+        """Тест что фильтр городов в админке читает NodeStats с учетом страны."""
+        city_filter, _ = get_admin_city_filter(self.client, "Россия")
+        self.assertEqual(
+            city_filter.lookup_choices, [("Казань", "Казань"), ("Москва", "Москва")]
+        )
+
+
+def get_admin_city_filter(client, country):
+    """
+    Открывает список узлов в админке с фильтром по стране.
+
+    Возвращает экземпляр CityFilter из changelist и запрос страницы.
+    """
+    User.objects.create_superuser("admin", "admin@example.com", "adminpass")
+    client.login(username="admin", password="adminpass")
+    response = client.get("/admin/networknode/networknode/", {"country": country})
+    city_filter = next(
+        spec
+        for spec in response.context["cl"].filter_specs
+        if isinstance(spec, CityFilter)
+    )
+    return city_filter, response.wsgi_request
+
+
+class StartupTest(SimpleTestCase):
+    """Тесты облегченного запуска, прогрева и профилирования импорта."""
+
+    def test_parse_importtime(self):
+        """Тест разбора вывода python -X importtime."""
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     encodings.utf_8\n"
+            "import time:      1500 |       1620 |   encodings\n"
+            "import time:       300 |        300 | django\n"
+        )
+        rows = parse_importtime(output)
+        self.assertEqual(
+            rows,
+            [
+                ("encodings.utf_8", 120, 120, 2),
+                ("encodings", 1500, 1620, 1),
+                ("django", 300, 300, 0),
+            ],
+        )
+        self.assertEqual(
+            summarize_by_package(rows), [("encodings", 1620), ("django", 300)]
+        )
+
+    def test_light_startup_only_for_background_commands(self):
+        """Тест что облегченный запуск включается только для фоновых команд."""
+        with mock.patch.dict("os.environ", clear=False) as environ:
+            environ.pop(startup.LIGHT_STARTUP_ENV, None)
+            startup.configure_light_startup(["manage.py", "migrate"])
+            self.assertFalse(startup.is_light_startup())
+            startup.configure_light_startup(["manage.py", "run_workers"])
+            self.assertTrue(startup.is_light_startup())
+
+    def test_light_startup_skips_web_apps(self):
+        """Тест что при облегченном запуске админка и статика не загружаются."""
+        result = run_python(
+            "import django\n"
+            "django.setup()\n"
+            "import sys\n"
+            "from django.apps import apps\n"
+            "print(apps.is_installed('django.contrib.admin'),"
+            " 'django.contrib.admin.sites' in sys.modules)\n",
+            env={startup.LIGHT_STARTUP_ENV: "1"},
+        )
+        self.assertEqual(result.stdout.split(), ["False", "False"])
+
+    def test_warm_up(self):
+        """Тест что прогрев выполняет все шаги."""
+        with self.assertNoLogs("config.warmup", level="WARNING"):
+            timings = warm_up()
+        self.assertEqual(
+            list(timings), ["urls", "serializers", "querysets", "node_snapshot"]
+        )
+
+    def test_importtime_report_command(self):
+        """Тест команды importtime_report."""
+        out = StringIO()
+        call_command(
+            "importtime_report", "--target", "setup", "--by-package", stdout=out
+        )
+        self.assertIn("django", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command("importtime_report", "--target", "unknown")
+
+
+class ThrottlingTest(APITestCase):
+    """Тесты квот запросов NetworkNodeViewSet по actions."""
+
+    def setUp(self):
+        """Настройка тестовых данных."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_active=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.node = NetworkNode.objects.create(
+            name="Завод",
+            node_type="factory",
+            email="factory@example.com",
+            country="Россия",
+            city="Москва",
+            street="Ленина",
+            house_number="1",
+        )
+
+    @mock.patch.object(
+        ActionScopedRateThrottle,
+        "THROTTLE_RATES",
+        {"network_nodes": "100/min", "network_nodes_heavy": "2/min"},
+    )
+    def test_heavy_actions_have_separate_quota(self):
+        """Тест что тяжелые actions ограничиваются отдельно от списка."""
+        url = f"/api/network-nodes/{self.node.id}/dependent_nodes/"
+        for _ in range(2):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        # Квота списка не израсходована, у другого пользователя своя квота
+        self.assertEqual(
+            self.client.get("/api/network-nodes/").status_code, status.HTTP_200_OK
+        )
+        other = User.objects.create_user(username="other", password="testpass123")
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+
+class RequestCoalescingTest(TransactionTestCase):
+    """Тесты объединения одновременных одинаковых GET-запросов."""
+
+    HERD_SIZE = 8
+
+    def setUp(self):
+        """Настройка тестовых данных."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_active=True
+        )
+        factory = NetworkNode.objects.create(
+            name="Завод",
+            node_type="factory",
+            email="factory@example.com",
+            country="Россия",
+            city="Москва",
+            street="Ленина",
+            house_number="1",
+        )
+        for i in range(3):
+            NetworkNode.objects.create(
+                name=f"Сеть {i}",
+                node_type="retail",
+                email="retail@example.com",
+                country="Россия",
+                city="Казань",
+                street="Баумана",
+                house_number="2",
+                supplier=factory,
+            )
+
+    def run_herd(self, size, path="/api/network-nodes/?country=Россия"):
+        """
+        Одновременно выполняет size одинаковых запросов в разных потоках.
+
+        Returns:
+            tuple[int, list[int]]: Число SQL-запросов всех потоков и статусы
+        """
+        view = NetworkNodeViewSet.as_view({"get": "list"})
+        barrier = threading.Barrier(size)
+        lock = threading.Lock()
+        queries = []
+        statuses = []
+
+        def count_query(execute, sql, params, many, context):
+            with lock:
+                queries.append(sql)
+            return execute(sql, params, many, context)
+
+        def worker():
+            request = APIRequestFactory().get(path)
+            force_authenticate(request, user=self.user)
+            try:
+                with connection.execute_wrapper(count_query):
+                    barrier.wait()
+                    response = view(request)
+                with lock:
+                    statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(size)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(queries), statuses
+
+    def test_thundering_herd_runs_one_computation(self):
+        """Тест что под одновременной нагрузкой запросы к БД не растут."""
+        with override_settings(REQUEST_COALESCING=False):
+            single, _ = self.run_herd(1)
+            uncoalesced, _ = self.run_herd(self.HERD_SIZE)
+        self.assertGreater(single, 0)
+        self.assertEqual(uncoalesced, single * self.HERD_SIZE)
+
+        coalesced, statuses = self.run_herd(self.HERD_SIZE)
+        self.assertEqual(statuses, [status.HTTP_200_OK] * self.HERD_SIZE)
+        self.assertEqual(coalesced, single)
+
+    def test_followers_wait_for_leader(self):
+        """Тест что ожидающие запросы получают результат лидера."""
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return "результат"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(coalesce("k", compute)))
+        leader.start()
+        started.wait()
+        followers = [
+            threading.Thread(target=lambda: results.append(coalesce("k", compute)))
+            for _ in range(5)
+        ]
+        for thread in followers:
+            thread.start()
+        for thread in [leader, *followers]:
+            thread.join()
+        self.assertEqual(results, ["результат"] * 6)
+        self.assertEqual(len(calls), 1)
+
+    def test_write_invalidates_shared_result(self):
+        """Тест что после записи запрос вычисляется заново."""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        self.assertEqual(client.get("/api/network-nodes/").data["count"], 4)
+        NetworkNode.objects.filter(node_type="retail").delete()
+        self.assertEqual(client.get("/api/network-nodes/").data["count"], 1)
+
+
+class SignedTokenAuthenticationTest(APITestCase):
+    """Тесты аутентификации по подписанному токену."""
+
+    def setUp(self):
+        """Настройка тестовых данных."""
+        cache.clear()
+        clear_user_cache()
+        self.user = User.objects.create_user(
+            username="service", password="testpass123", is_active=True
+        )
+        self.client = APIClient()
+
+    def authenticate(self, token):
+        """Аутентифицирует запрос с токеном напрямую через класс аутентификации."""
+        request = APIRequestFactory().get(
+            "/api/network-nodes/", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        return SignedTokenAuthentication().authenticate(Request(request))
+
+    def test_obtain_token_and_call_api(self):
+        """Тест получения токена и доступа к API по нему."""
+        response = self.client.post(
+            "/api/auth/token/", {"username": "service", "password": "testpass123"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['token']}")
+        response = self.client.get("/api/network-nodes/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_wrong_password(self):
+        """Тест что токен не выдается при неверном пароле."""
+        response = self.client.post(
+            "/api/auth/token/", {"username": "service", "password": "wrong"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cached_user_needs_no_queries(self):
+        """Тест что повторная проверка токена не обращается к БД."""
+        token = create_token(self.user)
+        with self.assertNumQueries(1):
+            self.authenticate(token)
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(token)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_invalid_and_expired_tokens(self):
+        """Тест отказа для поддельного и просроченного токена."""
+        token = create_token(self.user)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token[:-1] + ("A" if token[-1] != "A" else "B"))
+        with override_settings(API_TOKEN_MAX_AGE=-1):
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate(token)
+
+    def test_user_change_invalidates_cache(self):
+        """Тест что деактивация и смена пароля сразу действуют на токены."""
+        token = create_token(self.user)
+        self.authenticate(token)
+
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+        self.user.is_active = True
+        self.user.set_password("newpass123")
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+        self.assertEqual(self.authenticate(create_token(self.user))[0], self.user)
+
+    def test_bench_auth_command(self):
+        """Тест команды bench_auth."""
+        out = StringIO()
+        call_command(
+            "bench_auth", "--iterations", "3", "--basic-iterations", "1", stdout=out
+        )
+        self.assertIn("прогретый кэш", out.getvalue())
+        self.assertFalse(User.objects.filter(username="bench-auth-user").exists())
+
+
+class BatchGetTest(APITestCase):
+    """Тесты пакетного получения узлов /api/network-nodes/batch_get/."""
+
+    def setUp(self):
+        """Настройка тестовых данных."""
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_active=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/network-nodes/batch_get/"
+
+        node_data = {
+            "email": "node@example.com",
+            "country": "Россия",
+            "city": "Москва",
+            "street": "Ленина",
+            "house_number": "1",
+        }
+        # Цепочка 0 -> 1 -> 2 и еще два прямых потребителя завода 0
+        self.nodes = []
+        for index, supplier_index in enumerate([None, 0, 1, 0, 0]):
+            node = NetworkNode.objects.create(
+                name=f"Узел {index}",
+                node_type="factory" if supplier_index is None else "retail",
+                supplier=None if supplier_index is None else self.nodes[supplier_index],
+                **node_data,
+            )
+            Product.objects.create(
+                name="Смартфон",
+                model=f"X{index}",
+                release_date=date(2023, 1, 1),
+                network_node=node,
+            )
+            self.nodes.append(node)
+
+    def test_results_in_request_order_with_not_found(self):
+        """Результаты идут в порядке запроса, отсутствующие id помечены."""
+        ids = [self.nodes[2].pk, 999999, self.nodes[0].pk]
+        response = self.client.get(
+            self.url, {"ids": ",".join(str(node_id) for node_id in ids)}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual([item["id"] for item in results], ids)
+        self.assertEqual(results[1], {"id": 999999, "not_found": True})
+        self.assertEqual(response.data["not_found"], [999999])
+        self.assertEqual(results[0]["hierarchy_level"], 2)
+        self.assertEqual(results[0]["supplier_name"], "Узел 1")
+        self.assertEqual(results[2]["hierarchy_level"], 0)
+        self.assertEqual(results[2]["dependent_nodes_count"], 3)
+        self.assertEqual(len(results[0]["products"]), 1)
+        self.assertNotIn("supply_chain", results[0])
+
+    def test_post_body(self):
+        """POST принимает id в теле запроса."""
+        ids = [self.nodes[4].pk, self.nodes[1].pk]
+        response = self.client.post(self.url, {"ids": ids}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["id"] for item in response.data["results"]], ids)
+        self.assertEqual(response.data["not_found"], [])
+
+    def test_constant_number_of_queries(self):
+        """Число запросов к БД не зависит от размера пакета."""
+        ids = [node.pk for node in self.nodes]
+
+        with self.assertNumQueries(3):
+            self.client.post(self.url, {"ids": ids[:1]}, format="json")
+        with self.assertNumQueries(3):
+            self.client.post(self.url, {"ids": ids}, format="json")
+
+    def test_include_supply_chain(self):
+        """?include=supply_chain добавляет цепочку поставщиков."""
+        response = self.client.get(
+            self.url, {"ids": str(self.nodes[2].pk), "include": "supply_chain"}
+        )
+
+        chain = response.data["results"][0]["supply_chain"]
+        self.assertEqual(
+            [item["id"] for item in chain], [self.nodes[0].pk, self.nodes[1].pk]
+        )
+
+    @override_settings(BATCH_GET_MAX_IDS=2)
+    def test_invalid_ids(self):
+        """Некорректные и слишком длинные списки id отклоняются."""
+        for params in [{}, {"ids": "1,abc"}, {"ids": "1,2,3"}]:
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(
+    NODE_SNAPSHOT=True, NODE_SNAPSHOT_MAX_STALENESS=0, NODE_SNAPSHOT_PATCH_LIMIT=100
+)
+class NodeSnapshotTest(APITestCase):
+    """Тесты снимка узлов NodeSnapshot в памяти процесса."""
+
+    def setUp(self):
+        """Настройка тестовых данных."""
+        patcher = mock.patch("networknode.snapshot._snapshot", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_active=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        node_data = {
+            "email": "node@example.com",
+            "street": "Ленина",
+            "house_number": "1",
+        }
+        self.factory = NetworkNode.objects.create(
+            name="Завод",
+            node_type="factory",
+            country="Россия",
+            city="Москва",
+            **node_data,
+        )
+        self.retail = NetworkNode.objects.create(
+            name="Сеть",
+            node_type="retail",
+            country="Россия",
+            city="Казань",
+            supplier=self.factory,
+            **node_data,
+        )
+        self.entrepreneur = NetworkNode.objects.create(
+            name="ИП",
+            node_type="entrepreneur",
+            country="Беларусь",
+            city="Минск",
+            supplier=self.retail,
+            **node_data,
+        )
+
+    def test_lookups(self):
+        """Тест чтения названий, уровней и городов из снимка."""
+        snapshot = get_node_snapshot()
+
+        self.assertEqual(len(snapshot), 3)
+        self.assertEqual(snapshot.get_name(self.retail.pk), "Сеть")
+        self.assertEqual(snapshot.get_hierarchy_level(self.factory.pk), 0)
+        self.assertEqual(snapshot.get_hierarchy_level(self.entrepreneur.pk), 2)
+        self.assertIsNone(snapshot.get_hierarchy_level(999999))
+        self.assertEqual(snapshot.get_cities(), ["Казань", "Минск", "Москва"])
+        self.assertEqual(snapshot.get_cities("Россия"), ["Казань", "Москва"])
+        self.assertEqual(snapshot.get_cities("Франция"), [])
+        self.assertEqual(
+            snapshot.get(self.entrepreneur.pk),
+            {
+                "id": self.entrepreneur.pk,
+                "name": "ИП",
+                "node_type": "entrepreneur",
+                "supplier_id": self.retail.pk,
+                "city": "Минск",
+                "country": "Беларусь",
+            },
+        )
+
+    def test_patched_from_change_events(self):
+        """Тест применения событий outbox после загрузки снимка."""
+        snapshot = get_node_snapshot()
+        self.retail.name = "Новая сеть"
+        self.retail.save()
+        created = NetworkNode.objects.create(
+            name="Магазин",
+            node_type="retail",
+            country="Франция",
+            city="Париж",
+            supplier=self.factory,
+            email="shop@example.com",
+            street="Rivoli",
+            house_number="2",
+        )
+        self.entrepreneur.delete()
+
+        self.assertIs(get_node_snapshot(), snapshot)
+        self.assertEqual(snapshot.get_name(self.retail.pk), "Новая сеть")
+        self.assertEqual(snapshot.get_hierarchy_level(created.pk), 1)
+        self.assertFalse(snapshot.contains(self.entrepreneur.pk))
+        self.assertEqual(len(snapshot), 3)
+        self.assertIn("Париж", snapshot.get_cities())
+        self.assertEqual(snapshot.cursor, ChangeEvent.objects.latest("id").id)
+
+    def test_sync_waits_for_out_of_order_commit(self):
+        """Тест что снимок не пропускает событие, зафиксированное позже."""
+        snapshot = get_node_snapshot()
+        self.retail.name = "Новая сеть"
+        self.retail.save()
+        in_flight = ChangeEvent.objects.latest("id")
+        ChangeEvent.objects.filter(pk=in_flight.pk).delete()
+        self.factory.name = "Новый завод"
+        self.factory.save()
+
+        get_node_snapshot()
+        self.assertEqual(snapshot.cursor, in_flight.id - 1)
+        self.assertEqual(snapshot.get_name(self.factory.pk), "Завод")
+
+        in_flight.save()
+        get_node_snapshot()
+        self.assertEqual(snapshot.get_name(self.retail.pk), "Новая сеть")
+        self.assertEqual(snapshot.get_name(self.factory.pk), "Новый завод")
+        self.assertEqual(snapshot.cursor, ChangeEvent.objects.latest("id").id)
+
+    def test_cities_follow_changes(self):
+        """Тест что список городов обновляется при переезде и удалении узлов."""
+        snapshot = get_node_snapshot()
+        self.retail.city = "Тверь"
+        self.retail.save()
+        self.entrepreneur.delete()
+
+        get_node_snapshot()
+        self.assertEqual(snapshot.get_cities("Россия"), ["Москва", "Тверь"])
+        self.assertEqual(snapshot.get_cities("Беларусь"), [])
+        self.assertEqual(snapshot.get_cities(), ["Москва", "Тверь"])
+
+    def test_list_skips_supplier_join(self):
+        """Тест что со снимком список узлов не соединяется с поставщиком."""
+        get_node_snapshot()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/network-nodes/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            any('JOIN "networknode_networknode"' in query["sql"] for query in queries)
+        )
+        names = {
+            item["name"]: item["supplier_name"] for item in response.data["results"]
+        }
+        self.assertEqual(names["ИП"], "Сеть")
+
+    def test_readers_not_blocked_during_reload(self):
+        """Тест что чтения во время перезагрузки видят прежнее состояние."""
+        snapshot = get_node_snapshot()
+        seen = []
+
+        def rows():
+            reader = threading.Thread(
+                target=lambda: seen.append(snapshot.get_name(self.retail.pk))
+            )
+            reader.start()
+            reader.join(timeout=5)
+            self.assertFalse(reader.is_alive())
+            yield (self.retail.pk, "Новая сеть", "retail", None, "Казань", "Россия")
+
+        snapshot.load(rows())
+        self.assertEqual(seen, ["Сеть"])
+        self.assertEqual(snapshot.get_name(self.retail.pk), "Новая сеть")
+        self.assertEqual(len(snapshot), 1)
+        self.assertEqual(snapshot.get_cities(), ["Казань"])
+
+    def test_staleness_window(self):
+        """Тест что снимок сверяется с outbox не чаще MAX_STALENESS."""
+        snapshot = get_node_snapshot()
+        NetworkNode.objects.filter(pk=self.retail.pk).update(name="Сеть 2")
+
+        with override_settings(NODE_SNAPSHOT_MAX_STALENESS=3600):
+            with self.assertNumQueries(0):
+                get_node_snapshot()
+            self.assertEqual(snapshot.get_name(self.retail.pk), "Сеть")
+        get_node_snapshot()
+        self.assertEqual(snapshot.get_name(self.retail.pk), "Сеть 2")
+
+    def test_reload_when_too_many_events(self):
+        """Тест полной перезагрузки при большом числе событий."""
+        snapshot = get_node_snapshot()
+        with override_settings(NODE_SNAPSHOT_PATCH_LIMIT=1):
+            NetworkNode.objects.filter(pk__in=[self.factory.pk, self.retail.pk]).update(
+                city="Тверь"
+            )
+            with mock.patch.object(
+                snapshot, "apply_events", wraps=snapshot.apply_events
+            ) as apply_events:
+                get_node_snapshot()
+        apply_events.assert_not_called()
+        self.assertEqual(snapshot.get_cities("Россия"), ["Тверь"])
+
+    def test_insert_in_middle_and_restore(self):
+        """Тест вставки узла с id меньше последнего и повторной вставки."""
+        snapshot = NodeSnapshot(node_types=NetworkNode.NODE_TYPES)
+        snapshot.load(
+            [
+                (1, "А", "factory", None, "Москва", "Россия"),
+                (5, "Б", "retail", 1, "Москва", "Россия"),
+            ]
+        )
+        snapshot.upsert(3, "В", "retail", 5, "Тверь", "Россия")
+        snapshot.remove(1)
+        snapshot.upsert(1, "Г", "factory", None, "Москва", "Россия")
+
+        self.assertEqual(len(snapshot), 3)
+        self.assertEqual(snapshot.get_name(1), "Г")
+        self.assertEqual(snapshot.get_hierarchy_level(3), 2)
+        self.assertEqual(snapshot.memory_usage()["ids"], 3 * 8)
+
+    def test_cycle_does_not_hang(self):
+        """Тест защиты от циклов при вычислении уровня."""
+        snapshot = NodeSnapshot()
+        snapshot.load([(1, "А", "retail", 2, "", ""), (2, "Б", "retail", 1, "", "")])
+        self.assertEqual(snapshot.get_hierarchy_level(1), 1)
+
+    def test_serializer_resolves_from_snapshot(self):
+        """Тест что сериализатор берет supplier_name и уровень из снимка."""
+        get_node_snapshot()
+        node = NetworkNode.objects.get(pk=self.entrepreneur.pk)
+
+        # Продукты и число зависимых узлов; поставщик и его цепочка не читаются
+        with override_settings(NODE_SNAPSHOT_MAX_STALENESS=3600):
+            with self.assertNumQueries(2):
+                data = NetworkNodeSerializer(node).data
+        self.assertEqual(data["supplier_name"], "Сеть")
+        self.assertEqual(data["hierarchy_level"], 2)
+
+    def test_api_response_unchanged(self):
+        """Тест что ответ API со снимком совпадает с ответом без него."""
+        url = f"/api/network-nodes/{self.entrepreneur.pk}/"
+        with_snapshot = self.client.get(url).data
+        with override_settings(NODE_SNAPSHOT=False):
+            without_snapshot = self.client.get(url).data
+        self.assertEqual(with_snapshot, without_snapshot)
+
+    def test_admin_uses_snapshot(self):
+        """Тест что админка берет города, поставщика и уровень из снимка."""
+        get_node_snapshot()
+        city_filter, request = get_admin_city_filter(self.client, "Россия")
+        model_admin = NetworkNodeAdmin(NetworkNode, AdminSite())
+        node = NetworkNode.objects.get(pk=self.entrepreneur.pk)
+
+        with override_settings(NODE_SNAPSHOT_MAX_STALENESS=3600):
+            with self.assertNumQueries(0):
+                lookups = city_filter.lookups(request, None)
+                link = model_admin.supplier_link(node)
+                level = model_admin.hierarchy_level_display(node)
+        self.assertEqual(lookups, [("Казань", "Казань"), ("Москва", "Москва")])
+        self.assertIn("Сеть", link)
+        self.assertEqual(level, 2)
+
+    @override_settings(NODE_SNAPSHOT=False)
+    def test_disabled(self):
+        """Тест что без NODE_SNAPSHOT снимок не создается."""
+        self.assertIsNone(get_node_snapshot())
+
+    def test_bench_snapshot_command(self):
+        """Тест команды бенчмарка снимка."""
+        out = StringIO()
+        call_command("bench_snapshot", nodes=200, lookups=10, stdout=out)
+        self.assertIn("Узлов: 200", out.getvalue())
+        self.assertIn("МБ на миллион узлов", out.getvalue())
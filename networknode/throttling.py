@@ -0,0 +1,25 @@
+from rest_framework.throttling import ScopedRateThrottle, SimpleRateThrottle
+
+
+class ActionScopedRateThrottle(ScopedRateThrottle):
+    """
+    Ограничение частоты запросов пользователя с отдельной квотой на action.
+
+    Scope берется из словаря throttle_scopes ViewSet по имени action,
+    иначе из throttle_scope. Частоты задаются в DEFAULT_THROTTLE_RATES;
+    счетчик ведется по пользователю (для анонимных - по IP).
+    """
+
+    def allow_request(self, request, view):
+        """Выбирает scope текущего action и проверяет его квоту."""
+
+        scopes = getattr(view, "throttle_scopes", {})
+        self.scope = scopes.get(getattr(view, "action", None)) or getattr(
+            view, self.scope_attr, None
+        )
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return SimpleRateThrottle.allow_request(self, request, view)
@@ -1,6 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import NetworkNodeViewSet
+from .views import (
+    ChangeFeedViewSet,
+    GeoStatsViewSet,
+    JobViewSet,
+    NetworkNodeViewSet,
+    ObtainTokenView,
+)
 
 # Создание router для автоматической генерации URL patterns
 router = DefaultRouter()
@@ -12,9 +18,18 @@ router = DefaultRouter()
 - GET/POST /api/network-nodes/
 - GET/PUT/PATCH/DELETE /api/network-nodes/{id}/
 - POST /api/network-nodes/{id}/clear_debt/
+- POST /api/network-nodes/export/, /api/network-nodes/bulk_clear_debt/
+- GET /api/jobs/, /api/jobs/{id}/, /api/jobs/{id}/download/
+- GET /api/changes/?since=<cursor>
+- GET /api/stats/geo/?country=<country>&city=<city>
+- POST /api/auth/token/
 """
 router.register(r"network-nodes", NetworkNodeViewSet)
+router.register(r"jobs", JobViewSet, basename="job")
+router.register(r"changes", ChangeFeedViewSet, basename="change")
+router.register(r"stats/geo", GeoStatsViewSet, basename="geo-stats")
 
 urlpatterns = [
+    path("auth/token/", ObtainTokenView.as_view(), name="api-token"),
     path("", include(router.urls)),
 ]
@@ -1,10 +1,115 @@
-from rest_framework import viewsets, permissions
+import datetime
+from functools import partial
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, Q, Sum
+from django.http import FileResponse, Http404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.throttling import ScopedRateThrottle
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import NetworkNode
-from .serializer import NetworkNodeSerializer, NetworkNodeUpdateSerializer
-from .filters import NetworkNodeFilter
+from .models import ChangeEvent, Job, NetworkNode, NodeStats, NodeTombstone
+from .serializer import (
+    BatchGetSerializer,
+    BulkClearDebtSerializer,
+    ChangeEventSerializer,
+    GeoStatsSerializer,
+    JobSerializer,
+    NetworkNodeSerializer,
+    NetworkNodeUpdateSerializer,
+    TokenObtainSerializer,
+)
+from .jobs import enqueue, get_export_path
+from .batching import batched_delete_nodes
+from .changes import get_commit_lag_start, get_safe_cursor
+from .snapshot import get_node_snapshot
+from .filters import NetworkNodeFilter, validate_node_filters
+from .graph import get_supply_graph
+from .hierarchy import get_supply_chains
+from .coalescing import coalesce, make_key
+from .throttling import ActionScopedRateThrottle
+from .authentication import create_token
+from .db_routers import (
+    activate_replica_reads,
+    deactivate_replica_reads,
+    is_pinned_to_primary,
+    mark_read_only,
+)
+
+
+def get_int_param(request, name, minimum=1):
+    """
+    Читает необязательный целочисленный query-параметр.
+
+    Raises:
+        ValidationError: Если значение не число или меньше minimum
+    """
+
+    value = request.query_params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValidationError({name: "Ожидается целое число"})
+    if value < minimum:
+        raise ValidationError({name: f"Значение должно быть не меньше {minimum}"})
+    return value
+
+
+def get_datetime_param(request, name):
+    """
+    Читает необязательный query-параметр с датой и временем в формате ISO 8601.
+
+    Время без часового пояса считается заданным в UTC.
+    """
+
+    value = request.query_params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        parsed = parse_datetime(value.replace(" ", "+"))
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: "Ожидается дата и время в формате ISO 8601"})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, datetime.timezone.utc)
+    return parsed
+
+
+def get_node_filters(request):
+    """
+    Читает фильтры NetworkNodeFilter из query-параметров для фоновой задачи.
+
+    Неизвестные, пустые и некорректные фильтры дают ответ 400, чтобы
+    выборка задачи не расширилась до всех узлов.
+    """
+
+    try:
+        return validate_node_filters(request.query_params.dict())
+    except DjangoValidationError as exc:
+        raise ValidationError(exc.message_dict)
+
+
+def get_bool_param(request, name):
+    """Читает необязательный логический query-параметр (1/true/yes)."""
+
+    return request.query_params.get(name, "").lower() in ("1", "true", "yes")
+
+
+def get_include_param(request):
+    """Возвращает множество значений ?include=a,b для необязательных полей."""
+
+    value = request.query_params.get("include", "")
+    return {item.strip() for item in value.split(",") if item.strip()}
 
 
 class IsActiveEmployee(permissions.BasePermission):
@@ -16,7 +121,89 @@ class IsActiveEmployee(permissions.BasePermission):
         return request.user and request.user.is_authenticated and request.user.is_active
 
 
-class NetworkNodeViewSet(viewsets.ModelViewSet):
+class ReplicaReadMixin:
+    """
+    Миксин для отправки безопасных запросов ViewSet на реплики БД.
+
+    GET/HEAD/OPTIONS и actions из read_only_actions (чтения через POST)
+    читают с реплик, если пользователь не привязан к основной базе после
+    недавней записи (read-your-writes). Изменяющие действия всегда
+    работают с основной БД.
+    """
+
+    read_only_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        """Включает чтение с реплик после аутентификации и проверки прав."""
+
+        super().initial(request, *args, **kwargs)
+        read_only = request.method in permissions.SAFE_METHODS
+        if self.action in self.read_only_actions:
+            mark_read_only(request._request)
+            read_only = True
+        if read_only and not is_pinned_to_primary(request):
+            self._replica_token = activate_replica_reads()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Отключает чтение с реплик по завершении обработки запроса."""
+
+        token = getattr(self, "_replica_token", None)
+        if token is not None:
+            deactivate_replica_reads(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class CoalescingMixin:
+    """
+    Миксин для объединения одновременных одинаковых GET-запросов.
+
+    Для actions из coalesce_actions запрос с тем же путем, параметрами
+    и источником чтения (реплика или основная БД) не выполняется заново,
+    пока первый такой запрос еще вычисляется: все получают его результат
+    (см. networknode.coalescing). Аутентификация, права и квоты
+    проверяются для каждого запроса до объединения.
+    """
+
+    coalesce_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        """Подменяет обработчик GET на объединяющий после проверки прав."""
+
+        super().initial(request, *args, **kwargs)
+        if (
+            settings.REQUEST_COALESCING
+            and request.method == "GET"
+            and self.action in self.coalesce_actions
+        ):
+            self.get = partial(self.coalesced_get, self.get)
+
+    def get_coalesce_key(self, request):
+        """Строит ключ запроса: путь, отсортированные параметры и источник чтения."""
+
+        return make_key(
+            request.get_host(),
+            request.path,
+            urlencode(sorted(request.query_params.lists()), doseq=True),
+            "replica" if getattr(self, "_replica_token", None) else "primary",
+        )
+
+    def coalesced_get(self, handler, request, *args, **kwargs):
+        """Выполняет handler один раз для группы одинаковых запросов."""
+
+        def compute():
+            response = handler(request, *args, **kwargs)
+            return response.status_code, response.data
+
+        status_code, data = coalesce(
+            self.get_coalesce_key(request),
+            compute,
+            cacheable=lambda result: result[0] < 500,
+        )
+        return Response(data, status=status_code)
+
+
+class NetworkNodeViewSet(CoalescingMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """
     ViewSet для CRUD операций с моделью NetworkNode.
     Предоставляет полный набор действий для работы с узлами сети:
@@ -28,6 +215,30 @@ class NetworkNodeViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_class = NetworkNodeFilter
 
+    # Квоты запросов пользователя (DEFAULT_THROTTLE_RATES) по actions
+    throttle_classes = [ActionScopedRateThrottle]
+    throttle_scope = "network_nodes"
+    throttle_scopes = {
+        "dependent_nodes": "network_nodes_heavy",
+        "descendants": "network_nodes_heavy",
+        "graph_stats": "network_nodes_heavy",
+        "batch_get": "network_nodes_heavy",
+        "export": "network_nodes_jobs",
+        "bulk_clear_debt": "network_nodes_jobs",
+    }
+
+    # POST batch_get только читает: id передаются в теле из-за их числа
+    read_only_actions = ("batch_get",)
+
+    coalesce_actions = (
+        "list",
+        "retrieve",
+        "dependent_nodes",
+        "descendants",
+        "graph_stats",
+        "batch_get",
+    )
+
     def get_serializer_class(self):
         """
         Возвращает соответствующий сериализатор в зависимости от действия.
@@ -38,6 +249,151 @@ class NetworkNodeViewSet(viewsets.ModelViewSet):
             return NetworkNodeUpdateSerializer
         return NetworkNodeSerializer
 
+    def include_archived(self):
+        """Проверяет, запрошены ли архивные продукты (?include_archived=1)."""
+
+        return get_bool_param(self.request, "include_archived")
+
+    def get_queryset(self):
+        """
+        Возвращает узлы с поставщиком и рабочим набором продуктов.
+
+        Архивные продукты подгружаются одним запросом только по явному
+        запросу клиента, по умолчанию архив не читается. Со снимком узлов
+        (NODE_SNAPSHOT) название поставщика берется из него, и JOIN
+        с поставщиком не нужен.
+        """
+
+        queryset = NetworkNode.objects.prefetch_related("products")
+        if get_node_snapshot() is None:
+            queryset = queryset.select_related("supplier")
+        if self.include_archived():
+            queryset = queryset.prefetch_related("archived_products")
+        return queryset
+
+    def get_serializer_context(self):
+        """Добавляет в контекст признак включения архивных продуктов."""
+
+        context = super().get_serializer_context()
+        context["include_archived"] = self.include_archived()
+        return context
+
+    def get_serializer(self, *args, **kwargs):
+        """
+        Создает сериализатор, при ?include=supply_chain передавая ему
+        цепочки поставщиков всех узлов страницы, загруженные одним запросом.
+
+        В batch_get цепочки загружаются всегда: по ним считается
+        hierarchy_level без обхода поставщиков по одному.
+        """
+
+        include_supply_chain = "supply_chain" in get_include_param(self.request)
+        if (
+            args
+            and self.get_serializer_class() is NetworkNodeSerializer
+            and (include_supply_chain or self.action == "batch_get")
+        ):
+            instances = args[0] if kwargs.get("many") else [args[0]]
+            context = kwargs.pop("context", None) or self.get_serializer_context()
+            context["supply_chains"] = get_supply_chains(
+                [node.pk for node in instances], using=NetworkNode.objects.db
+            )
+            context["include_supply_chain"] = include_supply_chain
+            kwargs["context"] = context
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Возвращает список узлов или, при ?modified_since=, дельту изменений.
+        """
+
+        if "modified_since" in request.query_params:
+            return self.sync(request)
+        return super().list(request, *args, **kwargs)
+
+    def sync(self, request):
+        """
+        Режим дельта-синхронизации: узлы, измененные и удаленные после метки.
+
+        Query-параметры:
+        - modified_since: метка времени ISO 8601 (курсор синхронизации)
+        - after_id: id последнего полученного объекта с той же меткой
+        - limit: размер порции (не больше SYNC_MAX_PAGE_SIZE)
+
+        Измененные узлы и отметки об удалении выдаются одним потоком
+        в keyset-порядке (время изменения, id). Следующий запрос (сразу,
+        если has_more=true, или при следующем обновлении) выполняется
+        с параметрами из next.
+
+        Выдаются только изменения старше CHANGE_FEED_COMMIT_LAG секунд:
+        updated_at ставится до фиксации транзакции, и более свежая метка
+        в next могла бы перескочить еще не зафиксированное изменение.
+
+        Фильтры списка применяются к измененным узлам после выборки
+        порции: измененный узел, который не подходит под фильтры (в том
+        числе перестал подходить), выдается в deleted вместе с отметками
+        об удалении. Поэтому deleted может содержать id узлов, которых
+        у клиента нет, и клиенту достаточно удалить их, если они есть.
+        """
+
+        since = get_datetime_param(request, "modified_since")
+        if since is None:
+            raise ValidationError(
+                {"modified_since": "Ожидается дата и время в формате ISO 8601"}
+            )
+        after_id = get_int_param(request, "after_id", minimum=0) or 0
+        max_limit = getattr(settings, "SYNC_MAX_PAGE_SIZE", 1000)
+        limit = min(get_int_param(request, "limit") or max_limit, max_limit)
+        cutoff = get_commit_lag_start()
+
+        changed = (
+            NetworkNode.objects.filter(
+                Q(updated_at__gt=since) | Q(updated_at=since, id__gt=after_id),
+                updated_at__lte=cutoff,
+            )
+            .order_by("updated_at", "id")
+            .values_list("updated_at", "id")[: limit + 1]
+        )
+        deleted = (
+            NodeTombstone.objects.filter(
+                Q(deleted_at__gt=since) | Q(deleted_at=since, node_id__gt=after_id),
+                deleted_at__lte=cutoff,
+            )
+            .order_by("deleted_at", "node_id")
+            .values_list("deleted_at", "node_id")[: limit + 1]
+        )
+        stream = sorted(
+            [(changed_at, node_id, False) for changed_at, node_id in changed]
+            + [(deleted_at, node_id, True) for deleted_at, node_id in deleted]
+        )
+        has_more = len(stream) > limit
+        stream = stream[:limit]
+
+        changed_ids = [node_id for _, node_id, is_deleted in stream if not is_deleted]
+        nodes = (
+            self.filter_queryset(self.get_queryset())
+            .filter(pk__in=changed_ids)
+            .in_bulk()
+        )
+        last_at, last_id = (
+            (stream[-1][0], stream[-1][1]) if stream else (since, after_id)
+        )
+        return Response(
+            {
+                "changed": self.get_serializer(
+                    [nodes[node_id] for node_id in changed_ids if node_id in nodes],
+                    many=True,
+                ).data,
+                "deleted": [
+                    node_id
+                    for _, node_id, is_deleted in stream
+                    if is_deleted or node_id not in nodes
+                ],
+                "has_more": has_more,
+                "next": {"modified_since": last_at.isoformat(), "after_id": last_id},
+            }
+        )
+
     def perform_update(self, serializer):
         """
         Выполняет обновление объекта с дополнительной валидацией.
@@ -48,7 +404,36 @@ class NetworkNodeViewSet(viewsets.ModelViewSet):
             raise serializer.ValidationError(
                 {"debt": "Обновление задолженности через API запрещено"}
             )
-        serializer.save()
+        self._save_with_hierarchy_check(serializer)
+
+    def perform_destroy(self, instance):
+        """
+        Удаляет узел, отвязывая зависимые узлы и продукты пакетами.
+
+        Вместо одного неограниченного SET_NULL/CASCADE выполняются
+        ограниченные по размеру запросы в одной транзакции.
+        """
+
+        batched_delete_nodes(NetworkNode.objects.filter(pk=instance.pk), sleep=0)
+
+    def perform_create(self, serializer):
+        """Создает объект с проверкой иерархии поставщиков."""
+
+        self._save_with_hierarchy_check(serializer)
+
+    @staticmethod
+    def _save_with_hierarchy_check(serializer):
+        """
+        Сохраняет объект, превращая ошибки иерархии модели в ответ 400.
+
+        Модель повторяет проверку под блокировкой, поэтому конкурентная
+        смена поставщика тоже возвращает ошибку валидации, а не 500.
+        """
+
+        try:
+            serializer.save()
+        except DjangoValidationError as exc:
+            raise ValidationError(exc.message_dict)
 
     @action(detail=True, methods=["get"])
     def dependent_nodes(self, request, pk=None):
@@ -67,3 +452,289 @@ class NetworkNodeViewSet(viewsets.ModelViewSet):
         node.debt = 0
         node.save()
         return Response({"status": "Задолженность очищена"})
+
+    @action(detail=False, methods=["post"])
+    def export(self, request):
+        """
+        Ставит в очередь выгрузку узлов в CSV.
+
+        Учитывает те же фильтры, что и список (country, city, node_type);
+        неизвестные, пустые и некорректные фильтры отклоняются.
+        Статус и ссылка на файл доступны через /api/jobs/{id}/.
+        """
+
+        filters = get_node_filters(request)
+        job = enqueue("export_nodes", {"filters": filters}, request.user)
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=["post"])
+    def bulk_clear_debt(self, request):
+        """
+        Ставит в очередь массовую очистку задолженности.
+
+        Узлы задаются списком ids в теле запроса или фильтрами в query-параметрах
+        (хотя бы одним непустым; неизвестные и некорректные отклоняются).
+        """
+
+        serializer = BulkClearDebtSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data.get("ids")
+        filters = get_node_filters(request)
+        if ids is None and not filters:
+            raise ValidationError(
+                {"ids": "Укажите список узлов или фильтры для очистки задолженности"}
+            )
+        job = enqueue("clear_debt", {"ids": ids, "filters": filters}, request.user)
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=["get"])
+    def descendants(self, request, pk=None):
+        """
+        Получает всех потребителей узла по индексу графа поставок.
+
+        Query-параметры:
+        - max_depth: ограничение числа шагов от узла
+        - descendant_type: вернуть только узлы указанного типа
+          (node_type занят фильтром ViewSet и применяется к самому узлу)
+        """
+
+        node = self.get_object()
+        max_depth = get_int_param(request, "max_depth")
+        node_type = request.query_params.get("descendant_type") or None
+
+        graph = get_supply_graph()
+        if not graph.contains(node.pk):
+            # Узел создан в другом процессе после загрузки индекса
+            graph.upsert(node.pk, node.supplier_id, node.node_type)
+        found = graph.bfs(node.pk, max_depth=max_depth, node_type=node_type)
+
+        page = self.paginate_queryset(found)
+        rows = page if page is not None else found
+        nodes = NetworkNode.objects.filter(pk__in=[node_id for node_id, _ in rows])
+        values = {
+            item["id"]: item
+            for item in nodes.values(
+                "id", "name", "node_type", "country", "city", "supplier"
+            )
+        }
+        data = [
+            {**values[node_id], "depth": depth}
+            for node_id, depth in rows
+            if node_id in values
+        ]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    @action(detail=False, methods=["get", "post"])
+    def batch_get(self, request):
+        """
+        Возвращает узлы по списку id за постоянное число запросов к БД.
+
+        id передаются в ?ids=1,2,3 (GET) или в теле {"ids": [...]} (POST),
+        не больше BATCH_GET_MAX_IDS. Поставщики загружаются JOIN, продукты
+        и цепочки поставщиков - по одному запросу на весь пакет, число
+        потребителей - аннотацией. Результаты идут в порядке запроса,
+        для отсутствующих id возвращается {"id": ..., "not_found": true}.
+        """
+
+        if request.method == "GET":
+            raw_ids = request.query_params.get("ids", "")
+            data = {"ids": [item for item in raw_ids.split(",") if item.strip()]}
+        else:
+            data = request.data
+        serializer = BatchGetSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["ids"]
+
+        nodes = (
+            self.get_queryset()
+            .filter(pk__in=set(ids))
+            .annotate(dependent_count=Count("dependent_nodes"))
+            .in_bulk()
+        )
+        data = {
+            item["id"]: item
+            for item in self.get_serializer(list(nodes.values()), many=True).data
+        }
+        return Response(
+            {
+                "results": [
+                    data.get(node_id, {"id": node_id, "not_found": True})
+                    for node_id in ids
+                ],
+                "not_found": [node_id for node_id in ids if node_id not in data],
+            }
+        )
+
+    @action(detail=False, methods=["get"], url_path="graph-stats")
+    def graph_stats(self, request):
+        """
+        Возвращает аналитику графа поставок.
+
+        Распределение узлов по уровням, самые длинные цепочки
+        и обнаруженные циклы поставщиков.
+        """
+
+        limit = get_int_param(request, "chains_limit") or 10
+        return Response(get_supply_graph().summary(chains_limit=limit))
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet для отслеживания фоновых задач.
+
+    Сотрудник видит только свои задачи, администратор - все.
+    """
+
+    serializer_class = JobSerializer
+    permission_classes = [IsActiveEmployee]
+
+    def get_queryset(self):
+        """Возвращает задачи, доступные текущему пользователю."""
+
+        queryset = Job.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        """Отдает файл выгрузки завершенной задачи export_nodes."""
+
+        job = self.get_object()
+        path = get_export_path(job)
+        if job.kind != "export_nodes" or job.status != Job.DONE or not path.exists():
+            raise Http404("Файл выгрузки недоступен")
+        return FileResponse(open(path, "rb"), as_attachment=True, filename=path.name)
+
+
+class ChangeFeedViewSet(viewsets.GenericViewSet):
+    """
+    Лента изменений NetworkNode и Product для инкрементальной синхронизации.
+
+    GET /api/changes/?since=<cursor>&limit=<n> возвращает события с id больше
+    курсора в порядке их записи и next_cursor для следующего запроса.
+
+    События еще не зафиксированных транзакций могут получить меньший id,
+    чем уже видимые, поэтому выдача останавливается перед свежим пропуском
+    в id (см. changes.get_safe_cursor) и продолжается после его заполнения.
+    """
+
+    permission_classes = [IsActiveEmployee]
+    serializer_class = ChangeEventSerializer
+    queryset = ChangeEvent.objects.all()
+
+    def list(self, request):
+        """Возвращает очередную порцию событий после курсора."""
+
+        since = get_int_param(request, "since", minimum=0) or 0
+        max_limit = getattr(settings, "CHANGE_FEED_MAX_PAGE_SIZE", 1000)
+        limit = min(get_int_param(request, "limit") or max_limit, max_limit)
+
+        safe_cursor = get_safe_cursor(since, limit + 1)
+        events = list(
+            ChangeEvent.objects.filter(id__gt=since, id__lte=safe_cursor).order_by(
+                "id"
+            )[: limit + 1]
+        )
+        has_more = len(events) > limit
+        events = events[:limit]
+        return Response(
+            {
+                "results": self.get_serializer(events, many=True).data,
+                "next_cursor": events[-1].id if has_more else safe_cursor,
+                "has_more": has_more,
+            }
+        )
+
+
+class GeoStatsViewSet(ReplicaReadMixin, viewsets.GenericViewSet):
+    """
+    ViewSet сводной статистики по странам, городам и типам звеньев.
+
+    Читает только сводную таблицу NodeStats, поэтому время ответа
+    не зависит от числа узлов и продуктов.
+    """
+
+    permission_classes = [IsActiveEmployee]
+    serializer_class = GeoStatsSerializer
+
+    # Уровень группировки -> поля группировки
+    GROUPINGS = {
+        "country": ["country"],
+        "city": ["country", "city"],
+        "node_type": ["country", "city", "node_type"],
+    }
+
+    def list(self, request):
+        """
+        Возвращает агрегаты с детализацией страна -> город -> тип звена.
+
+        Query-параметры:
+        - country: детализация по городам страны
+        - city: детализация по типам звеньев города (вместе с country)
+        - node_type: учитывать только звенья указанного типа
+        - group_by: явный уровень группировки (country, city, node_type)
+        """
+
+        stats = NodeStats.objects.filter(node_count__gt=0)
+        group_by = "country"
+        for field, level in [("country", "city"), ("city", "node_type")]:
+            value = request.query_params.get(field)
+            if value:
+                stats = stats.filter(**{field: value})
+                group_by = level
+        node_type = request.query_params.get("node_type")
+        if node_type:
+            stats = stats.filter(node_type=node_type)
+        group_by = request.query_params.get("group_by") or group_by
+        if group_by not in self.GROUPINGS:
+            raise ValidationError(
+                {"group_by": f"Допустимые значения: {', '.join(self.GROUPINGS)}"}
+            )
+
+        sums = {
+            "node_count": Sum("node_count"),
+            "product_count": Sum("product_count"),
+            "total_debt": Sum("total_debt"),
+        }
+        fields = self.GROUPINGS[group_by]
+        rows = stats.values(*fields).annotate(**sums).order_by(*fields)
+        totals = stats.aggregate(**sums)
+        totals = {key: value or 0 for key, value in totals.items()}
+        return Response(
+            {
+                "group_by": group_by,
+                "totals": self.get_serializer(totals).data,
+                "results": self.get_serializer(rows, many=True).data,
+            }
+        )
+
+
+class ObtainTokenView(APIView):
+    """
+    Выдает подписанный токен API по логину и паролю.
+
+    Токен передается в заголовке Authorization: Bearer <токен> и действует
+    API_TOKEN_MAX_AGE секунд или до смены пароля пользователя.
+    """
+
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "auth_token"
+
+    def post(self, request):
+        """Проверяет учетные данные и возвращает токен."""
+
+        serializer = TokenObtainSerializer(
+            data=request.data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        return Response(
+            {
+                "token": create_token(serializer.validated_data["user"]),
+                "expires_in": settings.API_TOKEN_MAX_AGE,
+            }
+        )
@@ -0,0 +1,85 @@
+import hashlib
+import hmac
+import json
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .changes import get_safe_cursor
+from .models import ChangeEvent, Webhook
+from .serializer import ChangeEventSerializer
+
+
+def sign_payload(secret, body):
+    """Вычисляет HMAC-SHA256 подпись тела запроса."""
+
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def deliver_batch(webhook, batch_size=None, timeout=None):
+    """
+    Отправляет следующую порцию событий одному webhook.
+
+    События отправляются одним POST-запросом в порядке id. Курсор
+    webhook сдвигается только после ответа 2xx, поэтому доставка
+    выполняется как минимум один раз (at-least-once). Порция не заходит
+    за свежий пропуск в id, чтобы не потерять события транзакций,
+    зафиксированных позже (см. changes.get_safe_cursor).
+
+    Returns:
+        int: Количество доставленных событий (0, если событий нет или ошибка)
+    """
+    batch_size = batch_size or getattr(settings, "WEBHOOK_BATCH_SIZE", 500)
+    timeout = timeout or getattr(settings, "WEBHOOK_TIMEOUT", 10)
+    safe_cursor = get_safe_cursor(webhook.last_event_id, batch_size)
+    events = list(
+        ChangeEvent.objects.filter(
+            id__gt=webhook.last_event_id, id__lte=safe_cursor
+        ).order_by("id")[:batch_size]
+    )
+    if not events:
+        return 0
+
+    body = json.dumps(
+        {"events": ChangeEventSerializer(events, many=True).data},
+        cls=DjangoJSONEncoder,
+    ).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if webhook.secret:
+        headers["X-Signature"] = f"sha256={sign_payload(webhook.secret, body)}"
+    request = urllib.request.Request(
+        webhook.url, data=body, headers=headers, method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+    except (urllib.error.URLError, OSError) as exc:
+        webhook.last_error = str(exc)
+        webhook.save(update_fields=["last_error"])
+        return 0
+
+    webhook.last_event_id = events[-1].id
+    webhook.last_delivered_at = timezone.now()
+    webhook.last_error = ""
+    webhook.save(update_fields=["last_event_id", "last_delivered_at", "last_error"])
+    return len(events)
+
+
+def deliver_pending(batch_size=None, timeout=None):
+    """
+    Доставляет накопившиеся события всем активным webhooks.
+
+    Returns:
+        int: Общее количество доставленных событий
+    """
+    delivered = 0
+    for webhook in Webhook.objects.filter(is_active=True):
+        while True:
+            sent = deliver_batch(webhook, batch_size=batch_size, timeout=timeout)
+            delivered += sent
+            if not sent:
+                break
+    return delivered